@@ -1,9 +1,34 @@
 from langchain_core.messages import HumanMessage
-from src.graphs.deep_research_graph import deep_research_agent
+from src.graphs.deep_research_graph import build_deep_research_agent
+from src.cache.search_cache import get_search_cache
+from src.cache.summary_cache import get_summary_cache
+from src.runtime.instrumentation import RunInstrumentation
+from src.runtime.checkpointing import open_checkpointer, with_checkpointer, resumable_steps
+import argparse
 import asyncio
+import uuid
 
 
-async def main():
+async def stream_research(agent, inputs: dict, config: dict) -> dict:
+    """Runs the agent while printing the final report token by token, and returns the final state."""
+    final_state = {}
+    async for mode, chunk in agent.astream(inputs, config=config, stream_mode=["messages", "custom", "values"], subgraphs=False):
+        if mode == "values":
+            final_state = chunk
+        elif mode == "messages":
+            # We only echo tokens produced by the final writer; every other node's LLM calls stay quiet.
+            message_chunk, metadata = chunk
+            if metadata.get("langgraph_node") == "final_report_generation" and message_chunk.content:
+                print(message_chunk.content, end="", flush=True)
+        elif mode == "custom" and chunk.get("event") == "final_report_metrics":
+            print(
+                f"\n\n[Final report: first token after {chunk['time_to_first_token_seconds']}s, "
+                f"{chunk['output_tokens']} tokens at {chunk['tokens_per_second']} tokens/s]"
+            )
+    return final_state
+
+
+async def main(stream: bool = True, trace_out: str | None = None, resume: str | None = None):
     print("Hello from deep-research-agent!")
 
     # This is our complex, multi-faceted research query.
@@ -14,18 +39,60 @@ async def main():
     """
 
     # We invoke the fully compiled agent with our complex query.
-    # The 'thread_id' ensures that our conversation history is maintained correctly in LangSmith.
+    # The 'thread_id' ensures that our conversation history is maintained correctly in LangSmith,
+    # and identifies the run's checkpoints: every fresh run gets its own thread, and '--resume' continues one.
+    thread_id = resume or f"demo_complex_{uuid.uuid4().hex[:8]}"
 
-    config = {"configurable": {"thread_id": "demo_complex_1"}}
+    # The instrumentation handler records wall time, queue time, tokens and cost for every node, model and tool call.
+    instrumentation = RunInstrumentation()
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": [instrumentation]}
     # NOTE: The following execution assumes valid API keys are set and will take several minutes to run.
     # The output shown below is a formatted representation of a real execution trace.
-    result = await deep_research_agent.ainvoke(
-        {"messages": [HumanMessage(content=complex_query)]}, 
-        config=config
-    )
-    print("=== Final Output ===")
-    print(result["messages"][-1].content)
+    async with open_checkpointer() as checkpointer:
+        # Every completed step is saved to the local checkpointer, so an interrupted run can be resumed.
+        deep_research_agent = with_checkpointer(build_deep_research_agent(), checkpointer)
+        inputs = {"messages": [HumanMessage(content=complex_query)]}
+        if resume:
+            if checkpointer is None or not await resumable_steps(deep_research_agent, config):
+                print(f"Nothing to resume for thread '{thread_id}'.")
+                return
+            # With no input, the agent continues the thread from its last completed step.
+            print(f"Resuming thread '{thread_id}'...")
+            inputs = None
+        else:
+            print(f"Thread: {thread_id} (resume with --resume {thread_id})")
+
+        if stream:
+            # In streaming mode the final report is printed as it is written.
+            print("=== Final Output ===")
+            await stream_research(deep_research_agent, inputs, config)
+        else:
+            result = await deep_research_agent.ainvoke(inputs, config=config)
+            print("=== Final Output ===")
+            print(result["messages"][-1].content)
+
+    # We report where the time and tokens went, per node, model and tool.
+    print("=== Run Profile ===")
+    for name, entry in list(instrumentation.summary().items())[:15]:
+        print(f"{name:<45} calls={entry['calls']:<4} wall={entry['wall_seconds']:.1f}s "
+              f"queued={entry['queue_seconds']:.1f}s tokens={entry['input_tokens']}/{entry['output_tokens']} "
+              f"cost=${entry['cost_usd']:.4f}")
+    if trace_out:
+        instrumentation.write_json(trace_out)
+        print(f"Trace written to {trace_out}")
+
+    # We report how much work the local caches saved during this run.
+    search_cache, summary_cache = get_search_cache(), get_summary_cache()
+    if search_cache is not None:
+        print(f"Search cache: {search_cache.stats()}")
+    if summary_cache is not None:
+        print(f"Summary cache: {summary_cache.stats()}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the deep research agent on the demo query.")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the complete report instead of streaming it.")
+    parser.add_argument("--trace-out", help="Write the span tree, per-node summary and OTLP export to this JSON file.")
+    parser.add_argument("--resume", metavar="THREAD_ID", help="Resume an interrupted run from its last completed step.")
+    args = parser.parse_args()
+    asyncio.run(main(stream=not args.no_stream, trace_out=args.trace_out, resume=args.resume))
\ No newline at end of file
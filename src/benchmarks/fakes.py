@@ -0,0 +1,317 @@
+"""
+Local stand-ins for the LLM and search backends, used by the offline benchmarks.
+
+'FakeChatModel' behaves like the HuggingFace chat models the agents use: it supports
+ainvoke/invoke, streaming, 'bind_tools' and 'with_structured_output', reports token usage,
+and waits according to a configurable latency distribution. Tool-bound models follow a
+script (the supervisor delegates research for a few iterations and then completes; the
+researcher searches for a few rounds and then answers), and structured-output models return
+canned instances of the agents' schemas. 'FakeTavilyClient' does the same for search.
+
+Responses are derived from a hash of the prompt, so runs are deterministic no matter how
+concurrent calls interleave.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, ConfigDict
+
+from src.runtime.rate_limiter import ProviderGuardMixin
+
+
+_WORDS = (
+    "semiconductor supply chain export controls foundry capacity wafer insurance liability tariff "
+    "diversification fabrication node yield subsidy geopolitics logistics packaging demand forecast "
+    "regulation compliance investment market share customer revenue risk resilience"
+).split()
+
+
+@dataclass
+class LatencyDistribution:
+    """A log-normal latency distribution, described by its median and its spread (sigma)."""
+    median_seconds: float = 1.0
+    sigma: float = 0.3
+
+    def sample(self, rng: random.Random, time_scale: float = 1.0) -> float:
+        return max(rng.lognormvariate(0.0, self.sigma) * self.median_seconds * time_scale, 0.0)
+
+
+@dataclass
+class FakeModelProfile:
+    """How a fake model behaves: time to first token, generation speed and response length."""
+    first_token_latency: LatencyDistribution = field(default_factory=lambda: LatencyDistribution(1.0, 0.3))
+    seconds_per_output_token: float = 0.01
+    output_tokens: int = 400
+
+
+@dataclass
+class FakeBackendConfig:
+    """Everything that shapes an offline run: model and search behaviour and the agents' scripts."""
+    models: dict = field(default_factory=dict)  # model name -> FakeModelProfile
+    default_model: FakeModelProfile = field(default_factory=FakeModelProfile)
+    search_latency: LatencyDistribution = field(default_factory=lambda: LatencyDistribution(0.8, 0.4))
+    raw_content_chars: int = 20000
+    url_pool_size: int = 40  # Smaller pools make researchers hit the same pages more often.
+    supervisor_iterations: int = 2
+    researchers_per_iteration: int = 3
+    researcher_search_rounds: int = 2
+    searches_per_turn: int = 2  # Queries per researcher turn: one batch call, or one call each without the batch tool
+    time_scale: float = 1.0  # Multiplies every latency; e.g. 0.01 runs a realistic scenario 100x faster.
+    failure_rate: float = 0.0  # Share of first attempts that fail with a 429, to exercise retries and backoff.
+    attempts: dict = field(default_factory=dict)  # request key -> attempts so far
+
+    def maybe_fail(self, *key: Any) -> None:
+        """Fails the first attempt of a request with probability 'failure_rate' (decided by the request itself)."""
+        attempt = self.attempts[key] = self.attempts.get(key, 0) + 1
+        if attempt == 1 and self.failure_rate and _rng_for("failure", *key).random() < self.failure_rate:
+            raise FakeRateLimitError("429 Too Many Requests")
+
+    def profile(self, model_name: str) -> FakeModelProfile:
+        return self.models.get(model_name, self.default_model)
+
+
+class FakeRateLimitError(Exception):
+    """A stand-in for a provider's HTTP 429 response."""
+    status_code = 429
+
+
+def _rng_for(*parts: Any) -> random.Random:
+    return random.Random(zlib.crc32("|".join(str(p) for p in parts).encode("utf-8")))
+
+
+def _lorem(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+_BOILERPLATE = (
+    "[Home](/) | [News](/news) | [Markets](/markets) | [About](/about)",
+    "We use cookies to improve your experience. Accept all cookies",
+    "Subscribe to our newsletter",
+    "© 2025 Example Media. All rights reserved.",
+)
+
+
+def _page(rng: random.Random, words: int) -> str:
+    """Raw page text shaped like a real scrape: navigation and banners around paragraphs of content."""
+    paragraphs = [_lorem(rng, rng.randint(40, 120)) for _ in range(max(1, words // 80))]
+    return "\n\n".join([_BOILERPLATE[0], _BOILERPLATE[1]] + paragraphs + [_BOILERPLATE[2], _BOILERPLATE[0], _BOILERPLATE[3]])
+
+
+def canned_output(schema: type, prompt: str, rng: random.Random) -> BaseModel:
+    """Builds a plausible instance of one of the agents' structured-output schemas."""
+    name = schema.__name__
+    if name == "ClarifyWithUser":
+        return schema(need_clarification=False, question="", verification="I have enough information and will begin research now.")
+    if name == "ResearchQuestion":
+        return schema(research_brief="Research brief: " + _lorem(rng, 80))
+    if name == "DraftReport":
+        sections = "\n\n".join(f"## Section {i}\n{_lorem(rng, 120)}" for i in range(1, 6))
+        return schema(draft_report=f"# Draft Report\n{_lorem(rng, 60)}\n\n{sections}")
+    if name == "Summary":
+        return schema(summary=_lorem(rng, 120), key_excerpts=_lorem(rng, 40))
+    if name == "EvaluationResult":
+        return schema(
+            comprehensiveness_score=rng.randint(5, 9), accuracy_score=rng.randint(5, 9),
+            coherence_score=rng.randint(6, 9), specific_critique=_lorem(rng, 40),
+        )
+    if name == "FactExtraction":
+        # Facts cite the URLs that appear in the notes, and repeat across iterations, like real extractions do.
+        urls = re.findall(r"URL: (\S+)", prompt) or ["https://example.com/unknown"]
+        facts = [
+            {"content": f"The {rng.choice(_WORDS)} {rng.choice(_WORDS)} reached {rng.randint(1, 40) * 5} units in 2025 "
+                        f"according to {url}", "source_url": url, "confidence_score": rng.randint(40, 95)}
+            for url in urls[:12]
+        ]
+        return schema.model_validate({"new_facts": facts})
+
+    # A generic fallback for any other schema, built from the field types.
+    defaults = {str: _lorem(rng, 20), int: 5, float: 0.5, bool: False, list: [], dict: {}}
+    values = {
+        field_name: defaults.get(getattr(info.annotation, "__origin__", info.annotation), None)
+        for field_name, info in schema.model_fields.items() if info.is_required()
+    }
+    return schema.model_validate(values)
+
+
+class UnguardedFakeChatModel(BaseChatModel):
+    """A chat model with realistic latency, token usage, tool calling and structured output, without a network."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model_name: str
+    backend: FakeBackendConfig
+    max_tokens: Optional[int] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    # --- behaviour ------------------------------------------------------------------------------
+
+    def _respond(self, messages: List[BaseMessage], **kwargs: Any) -> tuple[AIMessage, float]:
+        """Builds the scripted response for a prompt, and how long producing it should take."""
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = _rng_for(self.model_name, prompt)
+        profile = self.backend.profile(self.model_name)
+        output_tokens = profile.output_tokens if self.max_tokens is None else min(profile.output_tokens, self.max_tokens)
+
+        tool_calls = []
+        tools = kwargs.get("tools") or []
+        if "structured_schema" in kwargs:
+            content = canned_output(kwargs["structured_schema"], prompt, rng).model_dump_json()
+        elif "ConductResearch" in tools:
+            # The supervisor delegates research (and refines the draft) for a few turns, then completes.
+            turn = sum(1 for m in messages if isinstance(m, AIMessage) and m.tool_calls)
+            if turn < self.backend.supervisor_iterations:
+                tool_calls = [
+                    {"name": "ConductResearch", "args": {"research_topic": f"Topic {turn}.{i}: {_lorem(rng, 12)}"}}
+                    for i in range(self.backend.researchers_per_iteration)
+                ] + [{"name": "refine_draft_report", "args": {}}]
+            else:
+                tool_calls = [{"name": "ResearchComplete", "args": {}}]
+            content = ""
+        elif tools:
+            # A researcher runs a few rounds of searches (batched when it can), then writes up its findings.
+            rounds = sum(1 for m in messages if isinstance(m, AIMessage) and m.tool_calls)
+            if rounds < self.backend.researcher_search_rounds:
+                queries = [_lorem(rng, 4) for _ in range(self.backend.searches_per_turn)]
+                if "tavily_search_batch" in tools:
+                    tool_calls = [{"name": "tavily_search_batch", "args": {"queries": queries}}]
+                else:
+                    tool_calls = [{"name": "tavily_search", "args": {"query": query}} for query in queries]
+                content = ""
+            else:
+                content = _lorem(rng, output_tokens)
+        elif "<Section To Revise>" in prompt:
+            # A section rewrite keeps its heading and is about as long as one section of a full report.
+            heading = prompt.split("<Section To Revise>")[1].strip().splitlines()[0]
+            content = f"{heading}\n{_lorem(rng, output_tokens // 5)}"
+        elif "## for sections" in prompt:
+            # Report writers return markdown with a title and sections, like the real writer model.
+            sections = "\n\n".join(f"## {_lorem(rng, 2).title()}\n{_lorem(rng, output_tokens // 6)}" for _ in range(5))
+            content = f"# {_lorem(rng, 4).title()}\n{_lorem(rng, output_tokens // 6)}\n\n{sections}"
+        else:
+            content = _lorem(rng, output_tokens)
+
+        message = AIMessage(
+            content=content,
+            tool_calls=[{**tc, "id": f"call_{uuid.UUID(int=rng.getrandbits(128)).hex[:12]}"} for tc in tool_calls],
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": max(len(content.split()), 1),
+                "total_tokens": len(prompt) // 4 + max(len(content.split()), 1),
+            },
+        )
+        latency = (
+            profile.first_token_latency.sample(rng, self.backend.time_scale)
+            + profile.seconds_per_output_token * message.usage_metadata["output_tokens"] * self.backend.time_scale
+        )
+        return message, latency
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message, latency = self._respond(messages, **kwargs)
+        self.backend.maybe_fail(self.model_name, message.content[:64], str(message.tool_calls))
+        time.sleep(latency)  # A synchronous call blocks its thread, just like a real blocking HTTP request.
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message, latency = self._respond(messages, **kwargs)
+        self.backend.maybe_fail(self.model_name, message.content[:64], str(message.tool_calls))
+        await asyncio.sleep(latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message, _ = self._respond(messages, **kwargs)
+        profile = self.backend.profile(self.model_name)
+        rng = _rng_for(self.model_name, "stream", message.content[:64])
+        time.sleep(profile.first_token_latency.sample(rng, self.backend.time_scale))
+        for token in self._tokens(message):
+            time.sleep(profile.seconds_per_output_token * self.backend.time_scale)
+            yield token
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        message, _ = self._respond(messages, **kwargs)
+        self.backend.maybe_fail(self.model_name, message.content[:64], str(message.tool_calls))
+        profile = self.backend.profile(self.model_name)
+        rng = _rng_for(self.model_name, "stream", message.content[:64])
+        await asyncio.sleep(profile.first_token_latency.sample(rng, self.backend.time_scale))
+        for token in self._tokens(message):
+            await asyncio.sleep(profile.seconds_per_output_token * self.backend.time_scale)
+            if run_manager:
+                await run_manager.on_llm_new_token(token.text, chunk=token)
+            yield token
+
+    @staticmethod
+    def _tokens(message: AIMessage) -> Iterator[ChatGenerationChunk]:
+        words = re.findall(r"\S+\s*", message.content)
+        for i, word in enumerate(words):
+            usage = message.usage_metadata if i == len(words) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word, usage_metadata=usage))
+
+    # --- LangChain model interface ------------------------------------------------------------------
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        return self.bind(tools=[getattr(t, "name", None) or getattr(t, "__name__", str(t)) for t in tools], **kwargs)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any):
+        # The structured call still goes through the model (so it is timed and traced), then we parse the JSON.
+        return self.bind(structured_schema=schema) | RunnableLambda(lambda message: schema.model_validate_json(message.content))
+
+
+class FakeChatModel(ProviderGuardMixin, UnguardedFakeChatModel):
+    """The fake chat model, whose calls go through the provider guard just like the real clients' calls."""
+
+
+def fake_model_factory(backend: FakeBackendConfig):
+    """Returns a factory for 'set_model_factory' that builds fake models sharing one backend config."""
+    def factory(model_name: str, **kwargs: Any) -> FakeChatModel:
+        model = FakeChatModel(model_name=model_name, backend=backend, max_tokens=kwargs.get("max_tokens"))
+        model.metadata = {"ls_model_name": model_name}
+        return model
+    return factory
+
+
+class FakeTavilyClient:
+    """An async stand-in for 'AsyncTavilyClient' with configurable latency and page sizes."""
+
+    def __init__(self, backend: FakeBackendConfig):
+        self.backend = backend
+        self.calls = 0
+
+    async def search(self, query: str, max_results: int = 5, include_raw_content: bool = False,
+                     topic: str = "general", **kwargs: Any) -> dict:
+        self.calls += 1
+        self.backend.maybe_fail("tavily", query, topic)
+        rng = _rng_for("search", query, topic)
+        await asyncio.sleep(self.backend.search_latency.sample(rng, self.backend.time_scale))
+
+        results = []
+        for _ in range(max_results):
+            page = rng.randrange(self.backend.url_pool_size)
+            page_rng = _rng_for("page", page)
+            raw_words = self.backend.raw_content_chars // 8
+            results.append({
+                "url": f"https://example.com/research/{page}",
+                "title": f"Page {page}: {_lorem(page_rng, 5)}",
+                "content": _lorem(page_rng, 40),
+                "raw_content": _page(page_rng, raw_words) if include_raw_content else None,
+                "score": round(rng.random(), 3),
+            })
+        return {"query": query, "results": results}
@@ -0,0 +1,293 @@
+"""
+Offline end-to-end benchmark for the deep research agent.
+
+Runs the full graph against local stand-ins for the models and for Tavily (see 'fakes.py'),
+so throughput can be measured deterministically, without API keys or network access. The
+report covers wall time, a per-node breakdown, the concurrency actually achieved and the
+peak memory, and can be checked against a saved baseline to catch regressions before deploy:
+
+    python -m src.benchmarks.harness --scenario smoke --save-baseline .cache/benchmark.json
+    python -m src.benchmarks.harness --scenario smoke --baseline .cache/benchmark.json --tolerance 0.2
+
+'--check-parallelism' additionally fails when the researchers launched together did not
+actually overlap in time, or when something blocked the event loop (a sync call on an
+async path serializes the "parallel" researchers). 'tests/test_parallelism.py' runs the same
+check on every test run.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+
+from src.benchmarks.fakes import FakeBackendConfig, FakeModelProfile, FakeTavilyClient, LatencyDistribution, fake_model_factory
+from src.config import settings
+
+
+BENCHMARK_QUERY = (
+    "Analyse the impact of the 'Splinternet' on global semiconductor supply chains by 2028, contrasting "
+    "TSMC's diversification strategy with Intel's IDM 2.0 model under 2024-2025 US export controls."
+)
+
+# Named scenarios. 'smoke' runs in seconds; 'realistic' uses production-like latencies and takes minutes.
+SCENARIOS = {
+    "smoke": FakeBackendConfig(
+        default_model=FakeModelProfile(LatencyDistribution(1.0, 0.3), 0.01, 300),
+        search_latency=LatencyDistribution(0.8, 0.4),
+        time_scale=0.02,
+    ),
+    # The smoke scenario with 10% of first attempts rate limited, to measure the cost of retries and backoff.
+    "throttled": FakeBackendConfig(
+        default_model=FakeModelProfile(LatencyDistribution(1.0, 0.3), 0.01, 300),
+        search_latency=LatencyDistribution(0.8, 0.4),
+        time_scale=0.02,
+        failure_rate=0.1,
+    ),
+    "realistic": FakeBackendConfig(
+        models={
+            "moonshotai/Kimi-K2-Instruct": FakeModelProfile(LatencyDistribution(2.5, 0.4), 0.02, 800),
+            "Qwen/Qwen3-4B-Instruct-2507": FakeModelProfile(LatencyDistribution(0.8, 0.3), 0.008, 400),
+        },
+        search_latency=LatencyDistribution(1.2, 0.5),
+        supervisor_iterations=3,
+        researchers_per_iteration=3,
+        researcher_search_rounds=3,
+    ),
+}
+
+# The metrics compared against a baseline; for all of them, lower is better.
+REGRESSION_METRICS = ("wall_seconds", "peak_memory_mb", "llm_calls", "search_calls")
+
+# How often the loop monitor wakes up, and the largest delay we tolerate before a wake-up counts as a stall.
+LOOP_MONITOR_INTERVAL_SECONDS = 0.005
+MAX_LOOP_LAG_SECONDS = 0.1
+
+
+@dataclass
+class BenchmarkReport:
+    scenario: str
+    checkpointing: bool
+    wall_seconds: float
+    peak_memory_mb: float
+    llm_calls: int
+    search_calls: int
+    max_concurrent_llm_calls: int
+    max_concurrent_researchers: int
+    researchers_per_iteration: int
+    max_loop_lag_ms: float
+    input_tokens: int
+    output_tokens: int
+    retries: int
+    failed_calls: int
+    nodes: dict = field(default_factory=dict)  # node name -> {"calls", "wall_seconds"}
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@contextmanager
+def offline_backends(backend: FakeBackendConfig, checkpointing: bool = False):
+    """Swaps the model factory and the Tavily client for local fakes, and keeps every on-disk store in a temp dir."""
+    import src.cache.researcher_results as researcher_results
+    import src.cache.search_cache as search_cache
+    import src.cache.summary_cache as summary_cache
+    import src.knowledge.research_memory as research_memory
+    import src.tools.researcher_tools as researcher_tools
+    from src.models.hf_models import set_model_factory
+    from src.runtime.rate_limiter import clear_provider_guards
+    from src.context.retrieval import clear_evidence_indexes
+
+    def reset_stores() -> None:
+        search_cache._search_cache = summary_cache._summary_cache = researcher_results._researcher_results = None
+        research_memory._research_memory = None
+        clear_provider_guards()
+        clear_evidence_indexes()
+
+    timing_fields = ("retry_base_delay_seconds", "retry_max_delay_seconds", "circuit_breaker_cooldown_seconds")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        overrides = {
+            # Caches would make every run after the first one measure the cache, not the agent.
+            "search_cache_enabled": False,
+            "summary_cache_enabled": False,
+            "research_memory_enabled": False,
+            "checkpointing_enabled": checkpointing,
+            "cache_dir": cache_dir,
+            # Rate limits and backoff delays are scaled like every latency, so a sped-up run is throttled proportionally.
+            "provider_rate_limits": {
+                provider: {limit: rate / backend.time_scale for limit, rate in limits.items()}
+                for provider, limits in settings.provider_rate_limits.items()
+            },
+            **{name: getattr(settings, name) * backend.time_scale for name in timing_fields},
+        }
+        saved = {name: getattr(settings, name) for name in overrides}
+        saved_client = researcher_tools.tavily_client
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        reset_stores()
+        tavily = FakeTavilyClient(backend)
+        researcher_tools.tavily_client = tavily
+        set_model_factory(fake_model_factory(backend))
+        try:
+            yield tavily
+        finally:
+            set_model_factory(None)
+            researcher_tools.tavily_client = saved_client
+            for name, value in saved.items():
+                setattr(settings, name, value)
+            reset_stores()
+
+
+async def monitor_event_loop(lags: list[float]) -> None:
+    """Records how late each periodic wake-up is; long delays mean something blocked the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LOOP_MONITOR_INTERVAL_SECONDS
+        await asyncio.sleep(LOOP_MONITOR_INTERVAL_SECONDS)
+        lags.append(loop.time() - expected)
+
+
+def max_overlap(intervals: list[tuple[float, float]]) -> int:
+    """Returns the largest number of intervals open at the same time (a sweep over start/end events)."""
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = best = 0
+    for _, delta in events:
+        current += delta
+        best = max(best, current)
+    return best
+
+
+async def run_benchmark(scenario: str = "smoke", backend: Optional[FakeBackendConfig] = None,
+                        checkpointing: bool = False) -> BenchmarkReport:
+    """Runs the full agent once against the fake backends and measures it, optionally with SQLite checkpointing."""
+    from src.graphs.deep_research_graph import build_deep_research_agent
+    from src.runtime.checkpointing import open_checkpointer, with_checkpointer
+    from src.runtime.instrumentation import RunInstrumentation
+    from src.runtime.rate_limiter import provider_stats
+
+    backend = backend or SCENARIOS[scenario]
+    instrumentation = RunInstrumentation()
+    with offline_backends(backend, checkpointing) as tavily:
+        async with open_checkpointer() as checkpointer:
+            agent = with_checkpointer(build_deep_research_agent(), checkpointer)
+            config = {"configurable": {"thread_id": f"benchmark_{scenario}_{time.time_ns()}"}, "callbacks": [instrumentation]}
+
+            lags: list[float] = []
+            monitor = asyncio.create_task(monitor_event_loop(lags))
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                await agent.ainvoke({"messages": [HumanMessage(content=BENCHMARK_QUERY)]}, config=config)
+            finally:
+                wall_seconds = time.perf_counter() - start
+                _, peak_bytes = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                monitor.cancel()
+            providers = provider_stats()
+
+    spans = list(instrumentation.spans.values())
+    llm_spans = [s for s in spans if s.kind == "llm"]
+    # Each researcher runs as a subgraph launched by the 'supervisor_tools' node.
+    researcher_spans = [
+        s for s in spans if s.kind == "graph" and s.parent_id in instrumentation.spans
+        and instrumentation.spans[s.parent_id].name == "supervisor_tools"
+    ]
+    nodes = {
+        key.split(":", 1)[1]: {"calls": entry["calls"], "wall_seconds": round(entry["wall_seconds"], 3)}
+        for key, entry in instrumentation.summary().items() if key.startswith("node:")
+    }
+    return BenchmarkReport(
+        scenario=scenario,
+        checkpointing=checkpointing,
+        wall_seconds=round(wall_seconds, 3),
+        peak_memory_mb=round(peak_bytes / 1e6, 2),
+        llm_calls=len(llm_spans),
+        search_calls=tavily.calls,
+        max_concurrent_llm_calls=max_overlap([(s.start_time, s.end_time or s.start_time) for s in llm_spans]),
+        max_concurrent_researchers=max_overlap([(s.start_time, s.end_time or s.start_time) for s in researcher_spans]),
+        researchers_per_iteration=backend.researchers_per_iteration,
+        max_loop_lag_ms=round(max(lags, default=0.0) * 1000, 1),
+        input_tokens=sum(s.input_tokens for s in llm_spans),
+        output_tokens=sum(s.output_tokens for s in llm_spans),
+        retries=sum(p["retries"] for p in providers.values()),
+        failed_calls=sum(p["failures"] for p in providers.values()),
+        nodes=nodes,
+    )
+
+
+def check_regressions(report: BenchmarkReport, baseline: dict, tolerance: float) -> list[str]:
+    """Compares a report with a baseline and lists every metric that got worse by more than 'tolerance'."""
+    failures = []
+    current = report.as_dict()
+    for metric in REGRESSION_METRICS:
+        if metric in baseline and current[metric] > baseline[metric] * (1 + tolerance):
+            failures.append(f"{metric} regressed: {current[metric]} vs baseline {baseline[metric]} (+{tolerance:.0%} allowed)")
+    return failures
+
+
+def check_parallelism(report: BenchmarkReport) -> list[str]:
+    """Checks that researchers launched in the same step ran concurrently and that the event loop never stalled."""
+    from src.nodes.supervisor_node import max_concurrent_researchers
+
+    failures = []
+    expected = min(report.researchers_per_iteration, max_concurrent_researchers)
+    if report.max_concurrent_researchers < expected:
+        failures.append(f"only {report.max_concurrent_researchers} researchers overlapped in time, expected {expected}")
+    if report.max_loop_lag_ms > MAX_LOOP_LAG_SECONDS * 1000:
+        failures.append(f"the event loop was blocked for {report.max_loop_lag_ms:.0f}ms")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="smoke")
+    parser.add_argument("--baseline", help="Fail when a metric regresses against this baseline report (JSON).")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against the baseline.")
+    parser.add_argument("--save-baseline", help="Write this run's report as the new baseline.")
+    parser.add_argument("--max-wall-seconds", type=float, help="Fail when the run takes longer than this.")
+    parser.add_argument("--checkpoint", action="store_true", help="Run with SQLite checkpointing, to measure its overhead.")
+    parser.add_argument("--check-parallelism", action="store_true", help="Fail when researchers do not overlap or the event loop stalls.")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args.scenario, checkpointing=args.checkpoint))
+
+    print(f"=== Benchmark: {report.scenario}{' (checkpointing)' if report.checkpointing else ''} ===")
+    print(f"Wall time: {report.wall_seconds:.2f}s | Peak memory: {report.peak_memory_mb:.1f} MB")
+    print(f"LLM calls: {report.llm_calls} (max {report.max_concurrent_llm_calls} concurrent) | "
+          f"Searches: {report.search_calls} | Researchers: max {report.max_concurrent_researchers} concurrent")
+    print(f"Event loop: max lag {report.max_loop_lag_ms:.1f}ms")
+    print(f"Tokens: {report.input_tokens} in / {report.output_tokens} out | "
+          f"Failed calls: {report.failed_calls} ({report.retries} retried)")
+    for name, entry in report.nodes.items():
+        print(f"  {name:<30} calls={entry['calls']:<4} wall={entry['wall_seconds']:.2f}s")
+
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps(report.as_dict(), indent=2))
+        print(f"Baseline written to {args.save_baseline}")
+
+    failures = []
+    if args.baseline:
+        failures += check_regressions(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+    if args.max_wall_seconds is not None and report.wall_seconds > args.max_wall_seconds:
+        failures.append(f"wall time {report.wall_seconds:.2f}s exceeds {args.max_wall_seconds:.2f}s")
+    if args.check_parallelism:
+        failures += check_parallelism(report)
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if not failures and (args.baseline or args.max_wall_seconds is not None or args.check_parallelism):
+        print("✓ No performance regressions")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Cold-import benchmark for the deep research agent.
+
+Workers are spawned per job, so every job pays the cost of importing the agent. This
+benchmark imports the agent module in fresh interpreters, checks that the import has no
+side effects (no model clients, no Tavily client, no compiled graphs) and fails when the
+median import time exceeds the budget:
+
+    python -m src.benchmarks.startup --budget 1.5 --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+# The module whose import cost we guard, and the budget (in seconds) for a cold import.
+TARGET_MODULE = "src.graphs.deep_research_graph"
+DEFAULT_BUDGET_SECONDS = 1.5
+
+# This snippet runs in a fresh interpreter: it times the import and reports any work done at import time.
+PROBE = f"""
+import json, time
+start = time.perf_counter()
+import {TARGET_MODULE} as target
+elapsed = time.perf_counter() - start
+
+import src.models.hf_models as hf_models
+import src.tools.researcher_tools as researcher_tools
+print(json.dumps({{
+    "seconds": elapsed,
+    "model_clients": len(hf_models._model_registry),
+    "tavily_client": researcher_tools.tavily_client is not None,
+    "agent_compiled": target.build_deep_research_agent.cache_info().currsize > 0,
+}}))
+"""
+
+
+def measure_cold_import(runs: int = 5) -> list[dict]:
+    """Imports the agent in 'runs' fresh interpreters and returns one probe report per run."""
+    project_root = Path(__file__).parent.parent.parent
+    reports = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=project_root, capture_output=True, text=True, check=True
+        )
+        reports.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return reports
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Max median import time in seconds.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to sample.")
+    args = parser.parse_args()
+
+    reports = measure_cold_import(args.runs)
+    median = statistics.median(r["seconds"] for r in reports)
+    print(f"Cold import of {TARGET_MODULE}: median {median:.3f}s over {args.runs} runs (budget {args.budget:.3f}s)")
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median import time {median:.3f}s exceeds budget {args.budget:.3f}s")
+    side_effects = {key for r in reports for key in ("model_clients", "tavily_client", "agent_compiled") if r[key]}
+    if side_effects:
+        failures.append(f"import had side effects: {sorted(side_effects)}")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if not failures:
+        print("✓ Startup within budget and side-effect free")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
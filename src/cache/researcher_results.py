@@ -0,0 +1,59 @@
+"""
+A durable store of completed researcher results.
+
+A researcher sub-graph runs inside the 'supervisor_tools' node, so when a run dies
+mid-iteration the checkpointer resumes that node from scratch. We therefore record every
+completed researcher under its thread, iteration and tool call, and on resume replay the
+stored results instead of re-running researchers that already finished.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from src.cache.sqlite_cache import SQLiteCache
+from src.config import settings
+
+
+def researcher_result_key(thread_id: str, iteration: int, tool_call_id: str, research_topic: str) -> str:
+    """Builds the key of one delegated research task. The topic hash guards against providers that reuse call ids."""
+    topic_hash = hashlib.sha256(research_topic.encode("utf-8")).hexdigest()[:16]
+    return f"{thread_id}/{iteration}/{tool_call_id}/{topic_hash}"
+
+
+class ResearcherResultStore:
+    """Stores the output ('compressed_research', 'raw_notes' and 'budget_usage') of completed researchers, by task."""
+
+    def __init__(self, path: str | Path, max_age_seconds: float, max_entries: int = 50000):
+        self.store = SQLiteCache(path, table="researcher_results", max_entries=max_entries)
+        self.max_age_seconds = max_age_seconds
+
+    def get(self, thread_id: str, iteration: int, tool_call_id: str, research_topic: str) -> Optional[dict]:
+        return self.store.get(researcher_result_key(thread_id, iteration, tool_call_id, research_topic))
+
+    def set(self, thread_id: str, iteration: int, tool_call_id: str, research_topic: str, result: dict) -> None:
+        output = {
+            "compressed_research": result.get("compressed_research", ""),
+            "raw_notes": result.get("raw_notes", []),
+            "budget_usage": result.get("budget_usage", {}),
+        }
+        self.store.set(researcher_result_key(thread_id, iteration, tool_call_id, research_topic), output, ttl_seconds=self.max_age_seconds)
+
+    def stats(self) -> dict:
+        return {**self.store.stats.as_dict(), "entries": len(self.store)}
+
+
+_researcher_results: Optional[ResearcherResultStore] = None
+
+
+def get_researcher_result_store() -> Optional[ResearcherResultStore]:
+    """Returns the process-wide researcher result store, or None when checkpointing is disabled."""
+    global _researcher_results
+    if not settings.checkpointing_enabled:
+        return None
+    if _researcher_results is None:
+        _researcher_results = ResearcherResultStore(
+            Path(settings.cache_dir) / "researcher_results.sqlite",
+            max_age_seconds=settings.researcher_results_max_age_seconds,
+        )
+    return _researcher_results
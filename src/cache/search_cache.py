@@ -0,0 +1,78 @@
+"""
+A persistent cache for Tavily search responses.
+
+Researchers frequently issue near-identical queries across iterations and across runs
+on related briefs, so we key responses by the normalized query together with every
+parameter that changes the response. Entries expire per topic: 'news' goes stale quickly,
+while 'general' results stay useful for days.
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+from src.cache.sqlite_cache import SQLiteCache
+from src.config import settings
+
+
+# How long a cached response stays fresh, per Tavily topic.
+SEARCH_CACHE_TTL_SECONDS = {
+    "news": 60 * 60,                # 1 hour
+    "finance": 6 * 60 * 60,         # 6 hours
+    "general": 7 * 24 * 60 * 60,    # 7 days
+}
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a search query so trivially different spellings share one cache entry."""
+    # We fold unicode variants and case, collapse whitespace and drop surrounding punctuation.
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = re.sub(r"\s+", " ", query)
+    return query.strip(" \t\n\"'.,;:!?")
+
+
+def search_cache_key(query: str, topic: str, max_results: int, include_raw_content: bool) -> str:
+    """Builds the content-addressed key for a single search request."""
+    payload = json.dumps([normalize_query(query), topic, max_results, include_raw_content])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """Caches raw Tavily responses on disk, keyed by normalized query, topic and result count."""
+
+    def __init__(self, path: str | Path, max_entries: int = 5000, offline: bool = False):
+        self.store = SQLiteCache(path, table="search_results", max_entries=max_entries)
+        # In offline mode we replay whatever is on disk, stale or not, and never go to the network.
+        self.offline = offline
+
+    def get(self, query: str, topic: str, max_results: int, include_raw_content: bool) -> Optional[dict]:
+        key = search_cache_key(query, topic, max_results, include_raw_content)
+        return self.store.get(key, allow_expired=self.offline)
+
+    def set(self, query: str, topic: str, max_results: int, include_raw_content: bool, response: dict) -> None:
+        key = search_cache_key(query, topic, max_results, include_raw_content)
+        ttl = SEARCH_CACHE_TTL_SECONDS.get(topic, SEARCH_CACHE_TTL_SECONDS["general"])
+        self.store.set(key, response, ttl_seconds=ttl)
+
+    def stats(self) -> dict:
+        return {**self.store.stats.as_dict(), "entries": len(self.store)}
+
+
+_search_cache: Optional[SearchCache] = None
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """Returns the process-wide search cache, or None when caching is disabled."""
+    global _search_cache
+    if not settings.search_cache_enabled:
+        return None
+    if _search_cache is None:
+        _search_cache = SearchCache(
+            Path(settings.cache_dir) / "search_cache.sqlite",
+            max_entries=settings.search_cache_max_entries,
+            offline=settings.search_cache_offline,
+        )
+    return _search_cache
@@ -0,0 +1,169 @@
+"""
+A small persistent key/value store backed by a local SQLite file.
+
+Values are stored as JSON with a per-entry expiry time, and the least recently used
+entries are evicted once the store grows past its size cap. Every cache in the
+system builds on this class so they share one storage format and one stats surface.
+
+The store keeps a running count and byte total, so a write costs a few indexed lookups;
+only a write that takes the store over a cap pays for an eviction, which frees a batch of
+entries at once. Calls block on SQLite, so async code runs them with 'asyncio.to_thread'.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Optional
+
+
+# A store over one of its caps is evicted down to this fraction of the cap, so evictions happen once per batch of writes.
+EVICTION_LOW_WATERMARK = 0.9
+
+@dataclass
+class CacheStats:
+    """Counters describing how a cache has been used since the process started."""
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+class SQLiteCache:
+    """A thread-safe JSON cache in a single SQLite table with TTL expiry and LRU eviction."""
+
+    def __init__(self, path: str | Path, table: str, max_entries: int = 10000, max_bytes: Optional[int] = None):
+        self.path = Path(path)
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+
+        # We share one connection between threads and serialize access to it with a lock.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table} (last_accessed)")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expiry ON {table} (expires_at)")
+        self._conn.commit()
+        self._count, self._bytes = self._totals()
+
+    def _totals(self) -> tuple[int, int]:
+        return self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM {self.table}").fetchone()
+
+    def get(self, key: str, allow_expired: bool = False) -> Optional[Any]:
+        """Returns the cached value for 'key', or None on a miss. Expired entries count as misses."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at < now and not allow_expired:
+                # We drop stale entries lazily, on the lookup that finds them.
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                self._bytes -= len(value)
+                self.stats.misses += 1
+                return None
+
+            self._conn.execute(f"UPDATE {self.table} SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Stores 'value' under 'key', replacing any previous entry, then enforces the size cap."""
+        now = time.time()
+        expires_at = now + ttl_seconds if ttl_seconds is not None else None
+        payload = json.dumps(value)
+        with self._lock:
+            previous = self._conn.execute(f"SELECT LENGTH(value) FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, expires_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, now, expires_at, now),
+            )
+            self._count += previous is None
+            self._bytes += len(payload) - (previous[0] if previous else 0)
+            self.stats.writes += 1
+            if self._over_capacity(self._count, self._bytes):
+                self._evict()
+            self._conn.commit()
+
+    def _over_capacity(self, count: int, size: int, fraction: float = 1.0) -> bool:
+        return count > fraction * self.max_entries or (self.max_bytes is not None and size > fraction * self.max_bytes)
+
+    def _evict(self) -> None:
+        """Removes expired entries, then the least recently used ones, until the store is under its low watermark."""
+        cursor = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+        self.stats.evictions += max(cursor.rowcount, 0)
+        # Other processes may write to the same file, so the eviction starts from the true totals.
+        self._count, self._bytes = self._totals()
+        if not self._over_capacity(self._count, self._bytes):
+            return
+
+        # We walk the LRU index from the oldest entry and stop as soon as enough has been freed.
+        victims, count, size = [], self._count, self._bytes
+        cursor = self._conn.execute(f"SELECT key, LENGTH(value) FROM {self.table} ORDER BY last_accessed ASC")
+        for key, length in cursor:
+            if not self._over_capacity(count, size, EVICTION_LOW_WATERMARK):
+                break
+            victims.append((key,))
+            count, size = count - 1, size - length
+        cursor.close()
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+        self.stats.evictions += len(victims)
+        self._count, self._bytes = count, size
+
+    def items(self) -> list[tuple[str, Any]]:
+        """Returns every unexpired entry, without counting lookups or refreshing their LRU position."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE expires_at IS NULL OR expires_at >= ?", (time.time(),)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def size_bytes(self) -> int:
+        """Returns the total size of the stored values."""
+        with self._lock:
+            (total,) = self._conn.execute(f"SELECT COALESCE(SUM(LENGTH(value)), 0) FROM {self.table}").fetchone()
+        return total
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+            self._count, self._bytes = 0, 0
@@ -0,0 +1,55 @@
+"""
+A persistent cache for webpage summaries.
+
+The same page is often fetched by several researchers, across iterations and across runs.
+Summaries are keyed by URL plus a hash of the raw content that was summarized, so a page
+whose content has not changed is summarized exactly once, while an updated page gets a
+fresh summary automatically.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from src.cache.sqlite_cache import SQLiteCache
+from src.config import settings
+
+
+def summary_cache_key(url: str, webpage_content: str) -> str:
+    """Builds the cache key for a page from its URL and a hash of its content."""
+    content_hash = hashlib.sha256(webpage_content.encode("utf-8")).hexdigest()
+    return f"{url}#{content_hash}"
+
+
+class SummaryCache:
+    """Caches formatted webpage summaries on disk, evicted by total size and by age."""
+
+    def __init__(self, path: str | Path, max_bytes: int, max_age_seconds: float, max_entries: int = 100000):
+        self.store = SQLiteCache(path, table="webpage_summaries", max_entries=max_entries, max_bytes=max_bytes)
+        self.max_age_seconds = max_age_seconds
+
+    def get(self, url: str, webpage_content: str) -> Optional[str]:
+        return self.store.get(summary_cache_key(url, webpage_content))
+
+    def set(self, url: str, webpage_content: str, summary: str) -> None:
+        self.store.set(summary_cache_key(url, webpage_content), summary, ttl_seconds=self.max_age_seconds)
+
+    def stats(self) -> dict:
+        return {**self.store.stats.as_dict(), "entries": len(self.store), "size_bytes": self.store.size_bytes()}
+
+
+_summary_cache: Optional[SummaryCache] = None
+
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    """Returns the process-wide summary cache, or None when caching is disabled."""
+    global _summary_cache
+    if not settings.summary_cache_enabled:
+        return None
+    if _summary_cache is None:
+        _summary_cache = SummaryCache(
+            Path(settings.cache_dir) / "summary_cache.sqlite",
+            max_bytes=settings.summary_cache_max_bytes,
+            max_age_seconds=settings.summary_cache_max_age_seconds,
+        )
+    return _summary_cache
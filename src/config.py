@@ -32,6 +32,80 @@ class Settings(BaseSettings):
     polygon_api_key: Optional[str] = None
     tavily_api_key: Optional[str] = None
     
+    # Research pipeline tuning
+    summarization_max_concurrency: int = 4  # Max webpage summaries in flight per search
+    summarization_timeout_seconds: float = 90.0  # Per-URL summarization timeout
+    prefilter_enabled: bool = True  # Keep only the passages of a page relevant to the query before summarizing it
+    prefilter_max_tokens: int = 4000  # Token budget of the passages kept from one page
+
+    # Provider limits, shared by every concurrent agent in the process (a missing provider or limit means unlimited)
+    provider_rate_limits: dict[str, dict[str, float]] = {
+        "moonshotai/Kimi-K2-Instruct": {"requests_per_minute": 120, "tokens_per_minute": 500_000},
+        "Qwen/Qwen3-4B-Instruct-2507": {"requests_per_minute": 240, "tokens_per_minute": 1_000_000},
+        "tavily": {"requests_per_minute": 300},
+    }
+    retry_max_attempts: int = 4  # Attempts per call, including the first one
+    retry_base_delay_seconds: float = 1.0  # Backoff cap for the first retry; doubles with every attempt
+    retry_max_delay_seconds: float = 30.0
+    retry_budget_ratio: float = 0.2  # Retries earned per call, so retries stay a fraction of the traffic
+    circuit_breaker_failure_threshold: int = 5  # Consecutive transient failures before a provider is cut off
+    circuit_breaker_cooldown_seconds: float = 30.0  # How long to fail fast before trying a provider again
+
+    # Context budgets (in tokens)
+    tokenizer_model: str = "Qwen/Qwen3-4B-Instruct-2507"  # Local tokenizer.json path, or a hub id already in the local HF cache
+    supervisor_context_tokens: int = 64000
+    compress_context_tokens: int = 96000
+    refine_context_tokens: int = 64000
+    section_refine_context_tokens: int = 16000  # Budget of each single-section rewrite
+
+    # Evidence retrieval
+    retrieval_top_k: int = 12  # Passages pulled into a prompt for one section, critique or topic
+    retrieval_max_tokens: int = 3000  # Token cap on the passages pulled for one section
+    final_report_findings_tokens: int = 24000  # Beyond this, the final report retrieves its findings section by section
+    evidence_index_persist: bool = False  # Mirror each run's evidence index to a JSONL file under cache_dir
+
+    # Draft refinement
+    section_refinement_enabled: bool = True  # Rewrite only the sections touched by new facts or critiques
+    section_refinement_max_fraction: float = 0.6  # Above this share of touched sections, one full rewrite is used instead
+    pruning_input_tokens: int = 5000
+
+    # Local caches
+    cache_dir: str = ".cache"  # Directory holding the on-disk SQLite caches
+    search_cache_enabled: bool = True
+    search_cache_max_entries: int = 5000  # LRU cap on cached Tavily responses
+    search_cache_offline: bool = False  # Serve only from the cache (replay runs without calling Tavily)
+    summary_cache_enabled: bool = True
+    summary_cache_max_bytes: int = 200_000_000  # Size cap on cached webpage summaries
+    summary_cache_max_age_seconds: float = 30 * 24 * 60 * 60  # Summaries older than this are re-generated
+
+    # Durable runs
+    checkpointing_enabled: bool = True  # Save graph checkpoints and researcher results so interrupted runs can resume
+    researcher_results_max_age_seconds: float = 7 * 24 * 60 * 60  # How long a thread's researcher results stay resumable
+
+    # Research memory across runs
+    research_memory_enabled: bool = True  # Seed new runs with facts remembered from earlier runs on related briefs
+    research_memory_max_age_seconds: float = 7 * 24 * 60 * 60  # Facts older than this are stale and researched again
+    research_memory_min_similarity: float = 0.55  # Cosine similarity above which an earlier brief is worded alike
+    research_memory_min_overlap: float = 0.7  # Share of the new brief's IDF-weighted terms (names first) a related brief must cover
+    research_memory_max_facts: int = 40  # Remembered facts seeded into one run, the most relevant first
+
+    # Batch mode
+    batch_max_concurrent_runs: int = 4  # Agent runs in flight at once in one batch process
+    batch_token_budget: int = 0  # Model tokens one batch may spend before it stops starting runs (0 disables the limit)
+
+    # Researcher budgets (0 disables a limit)
+    researcher_max_tool_iterations: int = 6  # ReAct rounds of tool calls per researcher
+    researcher_max_searches: int = 15  # Search queries per researcher, batched queries included
+    researcher_max_tokens: int = 300_000  # Model tokens (input + output) per researcher, page summaries included, compression excluded
+    researcher_max_seconds: float = 300.0  # Wall-clock time per researcher before it wraps up
+
+    # Convergence of the supervisor loop
+    convergence_enabled: bool = True  # End the loop early (or skip research waves) once the draft stops improving
+    convergence_window: int = 2  # Number of recent draft scores compared to detect a plateau
+    convergence_min_delta: float = 0.5  # Scores within this range of each other count as a plateau
+    convergence_target_score: float = 7.0  # A draft at or above this score that passed the Red Team is good enough
+    convergence_min_iterations: int = 2  # Never stop before this many supervisor iterations
+
     # LangSmith
     langsmith_tracing: bool = True
     langsmith_endpoint: str = "https://api.smith.langchain.com"
@@ -0,0 +1,178 @@
+"""
+Extractive pre-filtering of raw webpage content.
+
+Search results come with the full raw text of each page (up to 'MAX_CONTEXT_LENGTH' characters),
+and most of it is navigation, footers, cookie banners and passages unrelated to the query. We
+strip the boilerplate, split the page into passages, rank them against the search queries with
+BM25, and keep only the best passages that fit a token budget, in their original order. It all
+runs locally on the CPU, so summarization sees a fraction of the page at no model cost.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Callable, List, Optional, Sequence
+
+from src.context.token_budget import count_tokens
+
+
+# Passages are built from paragraphs up to about this many words; longer paragraphs are split.
+PASSAGE_WORDS = 120
+
+# BM25 parameters (the usual defaults).
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Lines repeated this many times on one page are navigation or template text.
+REPEATED_LINE_THRESHOLD = 3
+
+# Lines longer than this are prose, never boilerplate (even if they mention cookies or subscriptions).
+MAX_BOILERPLATE_CHARS = 120
+
+# Inserted between kept passages that were not adjacent on the page.
+GAP_MARKER = "\n\n[...]\n\n"
+
+_TERM_RE = re.compile(r"[a-z0-9]+")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_BOILERPLATE_RE = re.compile(
+    r"cookie|privacy policy|terms of (use|service)|all rights reserved|©|copyright \d{4}|subscribe|newsletter"
+    r"|sign (in|up)|log ?in|create an account|share (on|this)|follow us|skip to (main )?content|back to top"
+    r"|advertisement|related articles|read more|accept all",
+    re.IGNORECASE,
+)
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it", "its",
+    "of", "on", "or", "that", "the", "this", "to", "was", "were", "which", "with", "will", "what", "how",
+}
+
+
+def bm25_terms(text: str) -> List[str]:
+    """The terms BM25 matches on: lowercase words and numbers, without stopwords."""
+    return [term for term in _TERM_RE.findall(text.lower()) if term not in _STOPWORDS]
+
+
+def _is_boilerplate(line: str) -> bool:
+    stripped = line.strip()
+    # Long lines are prose; boilerplate is short. This check also keeps the common case cheap.
+    if not stripped or len(stripped) > MAX_BOILERPLATE_CHARS:
+        return False
+    # Lines that are mostly links (menus, breadcrumbs, tag lists) carry no content of their own.
+    if "](" in stripped and len(_LINK_RE.sub("", stripped).strip(" |•·-*>")) < 0.3 * len(stripped):
+        return True
+    # Image lines and short lines that match a boilerplate phrase are banners and footers.
+    return stripped.startswith("![") or bool(_BOILERPLATE_RE.search(stripped))
+
+
+def strip_boilerplate(text: str) -> str:
+    """Removes navigation, banners, footers, image lines and repeated template lines from page text."""
+    lines = text.splitlines()
+    counts = Counter(line.strip() for line in lines if line.strip())
+    kept = [
+        line for line in lines
+        if not _is_boilerplate(line) and (counts[line.strip()] < REPEATED_LINE_THRESHOLD or len(line) > MAX_BOILERPLATE_CHARS)
+    ]
+    return "\n".join(kept)
+
+
+def split_passages(text: str, passage_words: int = PASSAGE_WORDS) -> List[str]:
+    """Splits text into passages of about 'passage_words' words: short paragraphs are merged, long ones split."""
+    passages: List[str] = []
+    current: List[str] = []
+    current_words = 0
+
+    def flush() -> None:
+        nonlocal current, current_words
+        if current:
+            passages.append("\n\n".join(current))
+        current, current_words = [], 0
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        words = paragraph.count(" ") + 1
+        if words > passage_words:
+            flush()
+            # We split long paragraphs at sentence ends, and text without sentences into fixed word windows.
+            pieces = _SENTENCE_RE.split(paragraph)
+            if len(pieces) == 1:
+                tokens = paragraph.split()
+                pieces = [" ".join(tokens[i:i + passage_words]) for i in range(0, len(tokens), passage_words)]
+            for piece in pieces:
+                if current_words + len(piece.split()) > passage_words:
+                    flush()
+                current.append(piece)
+                current_words += len(piece.split())
+            flush()
+            continue
+        if current_words + words > passage_words:
+            flush()
+        current.append(paragraph)
+        current_words += words
+    flush()
+    return passages
+
+
+def bm25_scores(query: str, passages: Sequence[str], analyzer: Optional[Callable[[str], List[str]]] = None) -> List[float]:
+    """
+    Scores each passage against the query with BM25, using the passages themselves as the corpus.
+
+    'analyzer' turns a text into its terms (e.g. with stemming); by default the terms are 'bm25_terms'.
+    """
+    query_terms = set((analyzer or bm25_terms)(query))
+    if not passages or not query_terms:
+        return [0.0] * len(passages)
+
+    # Only the query terms are ever scored, so we count just those (plus each passage's length).
+    lengths, documents = [], []
+    for passage in passages:
+        terms = analyzer(passage) if analyzer else _TERM_RE.findall(passage.lower())
+        lengths.append(len(terms))
+        documents.append(Counter(term for term in terms if term in query_terms))
+    average_length = sum(lengths) / len(lengths) or 1.0
+    document_frequency = Counter(term for doc in documents for term in doc)
+    idf = {
+        term: math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+        for term in document_frequency
+    }
+
+    scores = []
+    for doc, length in zip(documents, lengths):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        scores.append(sum(idf[term] * frequency * (BM25_K1 + 1) / (frequency + norm) for term, frequency in doc.items()))
+    return scores
+
+
+def prefilter_content(text: str, query: str, max_tokens: int) -> str:
+    """
+    Keeps the passages of a page most relevant to the query, within 'max_tokens', in their original order.
+
+    Pages that fit the budget once their boilerplate is stripped are returned whole.
+    """
+    cleaned = strip_boilerplate(text)
+    if count_tokens(cleaned) <= max_tokens:
+        return cleaned
+
+    passages = split_passages(cleaned)
+    scores = bm25_scores(query, passages)
+    # The opening passage usually states what the page is about, so it ranks first on ties.
+    ranking = sorted(range(len(passages)), key=lambda i: (-scores[i], i != 0, i))
+
+    selected, used = [], 0
+    for i in ranking:
+        tokens = count_tokens(passages[i])
+        if used + tokens > max_tokens:
+            continue
+        selected.append(i)
+        used += tokens
+
+    parts, previous = [], None
+    for i in sorted(selected):
+        if previous is not None and i != previous + 1:
+            parts.append(GAP_MARKER)
+        elif previous is not None:
+            parts.append("\n\n")
+        parts.append(passages[i])
+        previous = i
+    return "".join(parts)
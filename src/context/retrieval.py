@@ -0,0 +1,186 @@
+"""
+A per-run retrieval index over the evidence collected so far.
+
+Evidence accumulates as flat strings: knowledge base facts, the compressed findings of every
+researcher, and the page summaries inside each researcher's transcript. Handing the whole pile
+to every prompt makes prompt sizes grow with the number of sources. 'EvidenceIndex' is a small,
+incremental BM25 index (in memory, optionally mirrored to a JSONL file), so a prompt can pull
+only the passages relevant to the section, critique or topic it is working on.
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence
+
+from src.config import settings
+from src.context.prefilter import BM25_B, BM25_K1, bm25_terms, split_passages
+from src.context.token_budget import count_tokens
+
+if TYPE_CHECKING:
+    from src.states.supervisor_state import Fact
+
+
+# The markers 'format_search_output' puts around every source of a search result.
+_SOURCE_RE = re.compile(r"\n--- SOURCE \d+: ")
+_URL_RE = re.compile(r"^URL: (\S+)", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class Evidence:
+    """One retrievable passage: a fact, a passage of a researcher's findings, or a passage of a page summary."""
+    id: str
+    kind: str  # "fact", "finding", "page" or "note" (the final notes)
+    text: str
+    source: str = ""
+
+
+def evidence_id(kind: str, text: str) -> str:
+    """Evidence is identified by its content, so adding the same passage twice is a no-op."""
+    return hashlib.sha1(f"{kind}\x1f{text}".encode("utf-8")).hexdigest()[:16]
+
+
+def facts_as_evidence(facts: Iterable["Fact"]) -> List[Evidence]:
+    return [Evidence(evidence_id("fact", f.content), "fact", f.content, f.source_url) for f in facts]
+
+
+def passages_as_evidence(texts: Iterable[str], kind: str, source: str = "") -> List[Evidence]:
+    """Splits longer texts (findings, page summaries) into passages, so retrieval returns focused excerpts."""
+    return [Evidence(evidence_id(kind, p), kind, p, source) for text in texts for p in split_passages(text)]
+
+
+def search_results_as_evidence(texts: Iterable[str]) -> List[Evidence]:
+    """Splits formatted search results into per-source passages that keep their URL as the source."""
+    evidence = []
+    for text in texts:
+        for block in _SOURCE_RE.split(text):
+            url = _URL_RE.search(block)
+            evidence.extend(passages_as_evidence([block], "page", url.group(1) if url else ""))
+    return evidence
+
+
+def format_evidence(evidence: Sequence[Evidence]) -> str:
+    return "\n".join(f"- {e.text}" + (f" (Source: {e.source})" if e.source else "") for e in evidence)
+
+
+class EvidenceIndex:
+    """An incremental BM25 index over evidence passages, optionally persisted to a JSONL file."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self.documents: List[Evidence] = []
+        self._ids: set = set()
+        self._term_counts: List[Counter] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    self._insert(Evidence(**json.loads(line)))
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _insert(self, evidence: Evidence) -> bool:
+        if evidence.id in self._ids or not evidence.text.strip():
+            return False
+        counts = Counter(bm25_terms(evidence.text))
+        index = len(self.documents)
+        self.documents.append(evidence)
+        self._ids.add(evidence.id)
+        self._term_counts.append(counts)
+        self._lengths.append(sum(counts.values()))
+        self._total_length += self._lengths[-1]
+        for term in counts:
+            self._postings.setdefault(term, []).append(index)
+        return True
+
+    def add(self, evidence: Iterable[Evidence]) -> int:
+        """Adds new evidence (already indexed passages are skipped) and returns how many passages were added."""
+        with self._lock:
+            added = [e for e in evidence if self._insert(e)]
+            if added and self.path is not None:
+                # The file is append-only, so persisting costs one write per batch of new evidence.
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(asdict(e)) + "\n" for e in added)
+        return len(added)
+
+    def search(self, query: str, k: int, max_tokens: Optional[int] = None, kinds: Optional[Sequence[str]] = None,
+               exclude: Iterable[str] = ()) -> List[Evidence]:
+        """Returns up to 'k' passages ranked by BM25 against the query, within 'max_tokens' if given."""
+        excluded = set(exclude)
+        with self._lock:
+            query_terms = set(bm25_terms(query))
+            n = len(self.documents)
+            if not n or not query_terms:
+                return []
+            average_length = self._total_length / n or 1.0
+            scores: Dict[int, float] = {}
+            # Only documents that contain a query term can score, so we walk the postings instead of the whole corpus.
+            for term in query_terms:
+                postings = self._postings.get(term, [])
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for i in postings:
+                    frequency = self._term_counts[i][term]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[i] / average_length)
+                    scores[i] = scores.get(i, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            ranked = sorted(scores, key=lambda i: -scores[i])
+            candidates = [self.documents[i] for i in ranked]
+
+        results, used = [], 0
+        for evidence in candidates:
+            if len(results) >= k:
+                break
+            if (kinds and evidence.kind not in kinds) or evidence.id in excluded:
+                continue
+            tokens = count_tokens(evidence.text)
+            if max_tokens is not None and used + tokens > max_tokens:
+                continue
+            results.append(evidence)
+            used += tokens
+        return results
+
+
+# One index per run (thread), shared by every node of that run.
+_indexes: Dict[str, EvidenceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def evidence_run_id(config: Optional[dict], research_brief: str) -> str:
+    """Identifies a run by its thread, or by its research brief when it runs without one."""
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    return thread_id or "brief-" + hashlib.sha1(research_brief.encode("utf-8")).hexdigest()[:16]
+
+
+def get_evidence_index(run_id: str) -> EvidenceIndex:
+    """Returns the evidence index of a run, loading it from disk when persistence is enabled."""
+    with _indexes_lock:
+        if run_id not in _indexes:
+            path = None
+            if settings.evidence_index_persist:
+                safe_name = hashlib.sha1(run_id.encode("utf-8")).hexdigest()[:16]
+                path = Path(settings.cache_dir) / "evidence" / f"{safe_name}.jsonl"
+            _indexes[run_id] = EvidenceIndex(path)
+        return _indexes[run_id]
+
+
+def drop_evidence_index(run_id: str) -> None:
+    """Forgets a finished run's in-memory index (a persisted file is kept)."""
+    with _indexes_lock:
+        _indexes.pop(run_id, None)
+
+
+def clear_evidence_indexes() -> None:
+    """Drops every in-memory index (persisted files are kept)."""
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,200 @@
+"""
+Token-aware context budgeting.
+
+Prompts in the diffusion loop grow with every iteration: the supervisor history, the
+researcher's ReAct transcript and the knowledge base all accumulate. A 'ContextBudget'
+hands out a fixed number of tokens to prompt sections in priority order (system prompt
+first, then critiques and facts, then history), so the lowest-priority content is the
+first to be trimmed and every call stays bounded no matter how long the run gets.
+"""
+
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage
+
+from src.config import settings
+
+
+# Rough characters-per-token ratio used when no local tokenizer is available.
+CHARS_PER_TOKEN = 4
+
+# Per-message overhead of the chat template (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# We never shrink a single message below this many tokens; we drop whole old turns instead.
+MIN_MESSAGE_TOKENS = 256
+
+TRUNCATION_MARKER = "\n[... truncated to fit the context budget ...]"
+
+# Token counts of recently counted texts. The cache is keyed on a digest of each text, so it never keeps
+# whole pages or prompts alive: 4096 entries stay well under a megabyte in a long batch process.
+TOKEN_COUNT_CACHE_SIZE = 4096
+_token_counts: "OrderedDict[bytes, int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """Loads the local tokenizer once, or returns None so that counting falls back to an estimate.
+
+    We never go to the network here: 'tokenizer_model' must be a local tokenizer.json file
+    or a hub model that is already in the local HuggingFace cache.
+    """
+    try:
+        from tokenizers import Tokenizer
+
+        if Path(settings.tokenizer_model).is_file():
+            return Tokenizer.from_file(settings.tokenizer_model)
+
+        from huggingface_hub import hf_hub_download
+        path = hf_hub_download(settings.tokenizer_model, "tokenizer.json", local_files_only=True)
+        return Tokenizer.from_file(path)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens in 'text' with the local tokenizer (or estimates them without one)."""
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _token_counts_lock:
+        if key in _token_counts:
+            _token_counts.move_to_end(key)
+            return _token_counts[key]
+    count = len(tokenizer.encode(text, add_special_tokens=False).ids)
+    with _token_counts_lock:
+        _token_counts[key] = count
+        if len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return count
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """Counts the tokens a single chat message contributes to a prompt."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    tokens = count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += count_tokens(str(message.tool_calls))
+    return tokens
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncates 'text' to at most 'max_tokens' tokens, keeping the beginning."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max(max_tokens - count_tokens(TRUNCATION_MARKER), 0)
+
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[:budget * CHARS_PER_TOKEN] + TRUNCATION_MARKER
+    encoding = tokenizer.encode(text, add_special_tokens=False)
+    if not budget:
+        return TRUNCATION_MARKER
+    # We cut on the character offset of the last kept token so the text itself is never re-encoded.
+    cut = encoding.offsets[budget - 1][1]
+    return text[:cut] + TRUNCATION_MARKER
+
+
+def _group_turns(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """Groups messages into turns: an AI message that calls tools stays together with its tool results."""
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and turns:
+            turns[-1].append(message)
+        else:
+            turns.append([message])
+    return turns
+
+
+def _water_fill_cap(sizes: list[int], budget: int) -> int:
+    """Finds the largest per-message cap such that sum(min(size, cap)) fits in 'budget'."""
+    remaining, count = budget, len(sizes)
+    for size in sorted(sizes):
+        if size * count <= remaining:
+            remaining -= size
+            count -= 1
+        else:
+            return remaining // count
+    return max(sizes, default=0)
+
+
+def fit_messages(messages: Sequence[BaseMessage], max_tokens: int, keep_first: int = 0) -> list[BaseMessage]:
+    """
+    Fits a message history into 'max_tokens'.
+
+    We first shrink the largest messages evenly (so no single search dump crowds out the rest),
+    and if that would cut messages below 'MIN_MESSAGE_TOKENS' we drop the oldest whole turns instead,
+    always keeping the first 'keep_first' messages (e.g. the task description).
+    """
+    messages = list(messages)
+    if sum(count_message_tokens(m) for m in messages) <= max_tokens:
+        return messages
+
+    head, turns = messages[:keep_first], _group_turns(messages[keep_first:])
+    dropped = 0
+    while True:
+        kept = head + [m for turn in turns for m in turn]
+        note = [SystemMessage(content=f"[{dropped} earlier messages omitted to fit the context budget]")] if dropped else []
+        sizes = [count_tokens(m.content if isinstance(m.content, str) else str(m.content)) for m in kept]
+        # Everything but the message contents (template overhead, tool calls, the note) is a fixed cost.
+        overhead = sum(count_message_tokens(m) for m in kept + note) - sum(sizes)
+        cap = _water_fill_cap(sizes, max(max_tokens - overhead, 0))
+        if cap >= MIN_MESSAGE_TOKENS or len(turns) <= 1:
+            break
+        dropped += len(turns.pop(0))
+
+    fitted = []
+    for message, size in zip(kept, sizes):
+        if size > cap:
+            message = message.model_copy(update={"content": truncate_to_tokens(str(message.content), cap)})
+        fitted.append(message)
+    return fitted[:len(head)] + note + fitted[len(head):]
+
+
+class ContextBudget:
+    """
+    A fixed token budget for one prompt, allocated to sections in priority order.
+
+    Callers allocate the highest-priority sections first (system prompt, critiques, facts),
+    optionally capping each one, and give whatever is left to the lowest-priority section,
+    usually the message history.
+    """
+
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+        self.used_tokens = 0
+        self.sections: dict[str, int] = {}
+
+    @property
+    def remaining(self) -> int:
+        return max(self.total_tokens - self.used_tokens, 0)
+
+    def _record(self, name: str, tokens: int) -> None:
+        self.sections[name] = self.sections.get(name, 0) + tokens
+        self.used_tokens += tokens
+
+    def allocate_text(self, name: str, text: str, max_tokens: Optional[int] = None) -> str:
+        """Allocates tokens to a text section, truncating it to its cap or to what is left."""
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        text = truncate_to_tokens(text, limit)
+        self._record(name, count_tokens(text))
+        return text
+
+    def allocate_messages(self, name: str, messages: Sequence[BaseMessage], keep_first: int = 0,
+                          max_tokens: Optional[int] = None) -> list[BaseMessage]:
+        """Allocates tokens to a message history, trimming it to its cap or to what is left."""
+        limit = self.remaining if max_tokens is None else min(max_tokens, self.remaining)
+        messages = fit_messages(messages, limit, keep_first=keep_first)
+        self._record(name, sum(count_message_tokens(m) for m in messages))
+        return messages
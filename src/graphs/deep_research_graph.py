@@ -1,58 +1,60 @@
+from functools import lru_cache
+
 from langgraph.graph import StateGraph, START, END
 from src.states.agent_state import AgentInputState, AgentState
 from src.nodes.intent_clarification import clarify_with_user
 from src.nodes.research_brief import write_research_brief
 from src.nodes.draft_generation import write_draft_report
-from src.graphs.supervisor_graph import supervisor_agent
+from src.graphs.supervisor_graph import build_supervisor_agent
 from src.nodes.final_report_generation import final_report_generation
+from src.context.token_budget import get_tokenizer
 
 
-# We initialize our master StateGraph, using the main AgentState and AgentInputState.
-deep_researcher_builder = StateGraph(AgentState, input_schema=AgentInputState)
-
-# We add our pre-compiled sub-graphs and our individual nodes to the master graph.
-deep_researcher_builder.add_node("clarify_with_user", clarify_with_user)
-deep_researcher_builder.add_node("write_research_brief", write_research_brief)
-deep_researcher_builder.add_node("write_draft_report", write_draft_report)
-deep_researcher_builder.add_node("supervisor_subgraph", supervisor_agent) # Here we add our complex sub-graph as a single node.
-deep_researcher_builder.add_node("final_report_generation", final_report_generation)
+@lru_cache(maxsize=None)
+def build_deep_research_agent():
+    """
+    Builds and compiles the full, end-to-end deep research agent.
 
-# Now, we define the high-level control flow for the entire system.
-# The entry point is the 'clarify_with_user' node.
-deep_researcher_builder.add_edge(START, "clarify_with_user")
+    Nothing is compiled at import time: the graph (and its sub-graphs) is built on the first call,
+    and later calls return the same compiled agent.
+    """
+    # We initialize our master StateGraph, using the main AgentState and AgentInputState.
+    deep_researcher_builder = StateGraph(AgentState, input_schema=AgentInputState)
 
-# The scoping process is a linear sequence.
-deep_researcher_builder.add_edge("write_research_brief", "write_draft_report")
+    # We add our pre-compiled sub-graphs and our individual nodes to the master graph.
+    deep_researcher_builder.add_node("clarify_with_user", clarify_with_user)
+    deep_researcher_builder.add_node("write_research_brief", write_research_brief)
+    deep_researcher_builder.add_node("write_draft_report", write_draft_report)
+    deep_researcher_builder.add_node("supervisor_subgraph", build_supervisor_agent()) # Here we add our complex sub-graph as a single node.
+    deep_researcher_builder.add_node("final_report_generation", final_report_generation)
 
-# After the initial draft is created, we hand off control to the main Supervisor loop.
-deep_researcher_builder.add_edge("write_draft_report", "supervisor_subgraph")
+    # Now, we define the high-level control flow for the entire system.
+    # The entry point is the 'clarify_with_user' node.
+    deep_researcher_builder.add_edge(START, "clarify_with_user")
 
-# Once the Supervisor loop completes (by calling ResearchComplete), its output is passed to the final writer.
-deep_researcher_builder.add_edge("supervisor_subgraph", "final_report_generation")
+    # The scoping process is a linear sequence.
+    deep_researcher_builder.add_edge("write_research_brief", "write_draft_report")
 
-# After the final report is generated, the graph terminates.
-deep_researcher_builder.add_edge("final_report_generation", END)
+    # After the initial draft is created, we hand off control to the main Supervisor loop.
+    deep_researcher_builder.add_edge("write_draft_report", "supervisor_subgraph")
 
-# We compile the full, end-to-end workflow into our final 'agent' object.
-deep_research_agent = deep_researcher_builder.compile()
-print("Advanced Systems Loaded: Red Team, Context Pruner, and Evaluator are online.")
+    # Once the Supervisor loop completes (by calling ResearchComplete), its output is passed to the final writer.
+    deep_researcher_builder.add_edge("supervisor_subgraph", "final_report_generation")
 
+    # After the final report is generated, the graph terminates.
+    deep_researcher_builder.add_edge("final_report_generation", END)
 
-### Graph visualization and saving
-# save the graph for visualization
-import os
-from pathlib import Path
+    # We compile the full, end-to-end workflow into our final 'agent' object.
+    deep_research_agent = deep_researcher_builder.compile()
 
-# save the graph for visualization
-# Use absolute path to ensure consistency regardless of where script runs from
-project_root = Path(__file__).parent.parent.parent  # Navigate from src/graphs/deep_research_graph.py to project root
-figures_dir = project_root / "figures"
-figures_dir.mkdir(parents=True, exist_ok=True)  # Create figures/ if it doesn't exist
+    # We load the tokenizer now, while building, so the first prompt budget of a run does not stall the event loop.
+    get_tokenizer()
+    print("Advanced Systems Loaded: Red Team, Context Pruner, and Evaluator are online.")
+    return deep_research_agent
 
-save_path = str(figures_dir / "deep_research_graph.png")
 
-try:
-    deep_research_agent.get_graph().draw_png(output_file_path=save_path)
-    print(f"✓ Graph saved to {save_path}")
-except Exception as e:
-    print(f"✗ Failed to save graph: {e}")
+def __getattr__(name: str):
+    # We keep 'deep_research_agent' importable, but only compile it when it is first accessed.
+    if name == "deep_research_agent":
+        return build_deep_research_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
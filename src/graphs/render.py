@@ -0,0 +1,35 @@
+"""
+Opt-in graph visualization.
+
+Rendering needs pygraphviz and takes a noticeable amount of time, so it is no longer done
+on import. Run it explicitly when the figure needs refreshing:
+
+    python -m src.graphs.render [output_path]
+"""
+
+import sys
+from pathlib import Path
+
+from src.graphs.deep_research_graph import build_deep_research_agent
+
+
+# Use absolute path to ensure consistency regardless of where script runs from
+project_root = Path(__file__).parent.parent.parent  # Navigate from src/graphs/render.py to project root
+default_save_path = project_root / "figures" / "deep_research_graph.png"
+
+
+def render_deep_research_graph(save_path: str | Path = default_save_path) -> Path:
+    """Draws the compiled deep research agent to a PNG file and returns its path."""
+    save_path = Path(save_path)
+    save_path.parent.mkdir(parents=True, exist_ok=True)  # Create figures/ if it doesn't exist
+    build_deep_research_agent().get_graph().draw_png(output_file_path=str(save_path))
+    return save_path
+
+
+if __name__ == "__main__":
+    try:
+        path = render_deep_research_graph(*sys.argv[1:2])
+        print(f"✓ Graph saved to {path}")
+    except Exception as e:
+        print(f"✗ Failed to save graph: {e}")
+        sys.exit(1)
@@ -4,41 +4,58 @@ Compiling the Denoising Loop
 Now we assemble the most complex part of our system which is the Supervisor main diffusion loop. 
 
 This graph will contain the Supervisor brain, its hands (the tools node), 
-and the parallel self-correction agents (the Red Team and the Context Pruner).
+and the parallel self-correction agents (the Evaluator, the Red Team and the Context Pruner).
 """
 
+from functools import lru_cache
 
 from langgraph.graph import StateGraph, START, END
 
 from src.states.supervisor_state import SupervisorState
 from src.nodes.supervisor_node import supervisor, supervisor_tools
+from src.nodes.evaluator_node import evaluator_node
 from src.nodes.red_team_node import red_team_node
 from src.nodes.context_pruning_node import context_pruning_node
 
 
-# We initialize the StateGraph for our Supervisor.
-supervisor_builder = StateGraph(SupervisorState)
+@lru_cache(maxsize=None)
+def build_supervisor_agent():
+    """Builds and compiles the Supervisor diffusion loop on first use; later calls return the same compiled graph."""
 
-# We add the four key nodes of the main loop.
-supervisor_builder.add_node("supervisor", supervisor)
-supervisor_builder.add_node("supervisor_tools", supervisor_tools)
-supervisor_builder.add_node("red_team", red_team_node)
-supervisor_builder.add_node("context_pruner", context_pruning_node)
+    # We initialize the StateGraph for our Supervisor.
+    supervisor_builder = StateGraph(SupervisorState)
 
-# The entry point of the loop is the 'supervisor' brain.
-supervisor_builder.add_edge(START, "supervisor")
+    # We add the five key nodes of the main loop.
+    supervisor_builder.add_node("supervisor", supervisor)
+    supervisor_builder.add_node("supervisor_tools", supervisor_tools)
+    supervisor_builder.add_node("evaluator", evaluator_node)
+    supervisor_builder.add_node("red_team", red_team_node)
+    supervisor_builder.add_node("context_pruner", context_pruning_node)
 
-# After the brain thinks and plans, it proceeds to the 'supervisor_tools' node to act.
-supervisor_builder.add_edge("supervisor", "supervisor_tools")
+    # The entry point of the loop is the 'supervisor' brain.
+    supervisor_builder.add_edge(START, "supervisor")
 
-# The 'supervisor_tools' node is our parallel fan-out point. Its return Command
-# dynamically directs the graph to run 'red_team' and 'context_pruner' simultaneously.
-# Therefore, we only need to define the edges for the fan-in, which bring the control flow back.
-# After the Red Team runs, control returns to the 'supervisor' for the next iteration.
-supervisor_builder.add_edge("red_team", "supervisor")
+    # After the brain thinks and plans, it proceeds to the 'supervisor_tools' node to act.
+    supervisor_builder.add_edge("supervisor", "supervisor_tools")
 
-# After the Context Pruner runs, control also returns to the 'supervisor'.
-supervisor_builder.add_edge("context_pruner", "supervisor")
+    # The 'supervisor_tools' node is our parallel fan-out point. Its return Command
+    # dynamically directs the graph to run 'evaluator', 'red_team' and 'context_pruner' simultaneously.
+    # Therefore, we only need to define the edges for the fan-in, which bring the control flow back.
+    # All three run in the same step, so the 'supervisor' runs once, after all of their updates are merged.
+    supervisor_builder.add_edge("evaluator", "supervisor")
 
-# We compile this into our main, cyclical 'denoising engine'.
-supervisor_agent = supervisor_builder.compile()
\ No newline at end of file
+    # After the Red Team runs, control returns to the 'supervisor' for the next iteration.
+    supervisor_builder.add_edge("red_team", "supervisor")
+
+    # After the Context Pruner runs, control also returns to the 'supervisor'.
+    supervisor_builder.add_edge("context_pruner", "supervisor")
+
+    # We compile this into our main, cyclical 'denoising engine'.
+    return supervisor_builder.compile()
+
+
+def __getattr__(name: str):
+    # We keep 'supervisor_agent' importable, but only compile it when it is first accessed.
+    if name == "supervisor_agent":
+        return build_supervisor_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,6 +8,8 @@ If the request is clear, it will run through all three nodes, producing the rese
 the initial draft_report needed by the main Supervisor loop.
 """
 
+from functools import lru_cache
+
 from langgraph.graph import StateGraph, START, END
 
 from src.states.agent_state import AgentInputState, AgentState
@@ -16,23 +18,34 @@ from src.nodes.research_brief import write_research_brief
 from src.nodes.draft_generation import write_draft_report
 
 
-# We initialize a new StateGraph, specifying the main AgentState and the initial AgentInputState.
-scope_builder = StateGraph(AgentState, input_schema=AgentInputState)
+@lru_cache(maxsize=None)
+def build_scope_research():
+    """Builds and compiles the scoping sub-graph on first use; later calls return the same compiled graph."""
+
+    # We initialize a new StateGraph, specifying the main AgentState and the initial AgentInputState.
+    scope_builder = StateGraph(AgentState, input_schema=AgentInputState)
+
+    # We add the three nodes that make up our scoping process.
+    scope_builder.add_node("clarify_with_user", clarify_with_user)
+    scope_builder.add_node("write_research_brief", write_research_brief)
+    scope_builder.add_node("write_draft_report", write_draft_report)
+
+    # The entry point is the 'clarify_with_user' node.
+    scope_builder.add_edge(START, "clarify_with_user")
 
-# We add the three nodes that make up our scoping process.
-scope_builder.add_node("clarify_with_user", clarify_with_user)
-scope_builder.add_node("write_research_brief", write_research_brief)
-scope_builder.add_node("write_draft_report", write_draft_report)
+    # We already built the dynamic routing inside the 'clarify_with_user' node.
+    # It will either END the graph or proceed to 'write_research_brief'.
+    scope_builder.add_edge("write_research_brief", "write_draft_report")
 
-# The entry point is the 'clarify_with_user' node.
-scope_builder.add_edge(START, "clarify_with_user")
+    # The 'write_draft_report' node is the final step of this sub-graph.
+    scope_builder.add_edge("write_draft_report", END)
 
-# We already built the dynamic routing inside the 'clarify_with_user' node.
-# It will either END the graph or proceed to 'write_research_brief'.
-scope_builder.add_edge("write_research_brief", "write_draft_report")
+    # We compile this into a runnable sub-graph.
+    return scope_builder.compile()
 
-# The 'write_draft_report' node is the final step of this sub-graph.
-scope_builder.add_edge("write_draft_report", END)
 
-# We compile this into a runnable sub-graph.
-scope_research = scope_builder.compile()
\ No newline at end of file
+def __getattr__(name: str):
+    # We keep 'scope_research' importable, but only compile it when it is first accessed.
+    if name == "scope_research":
+        return build_scope_research()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
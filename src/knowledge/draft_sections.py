@@ -0,0 +1,188 @@
+"""
+Section-addressable drafts for incremental refinement.
+
+Rewriting the whole draft on every refinement makes each iteration cost O(report length),
+although new facts and critiques usually concern a few sections. We parse the markdown
+draft into top-level sections with stable IDs (derived from their headings), route every
+new fact and critique to the sections it is about, and splice the rewritten sections back
+into the untouched rest of the draft. Parsing and rendering are lossless: a draft that is
+parsed and rendered again is unchanged, byte for byte.
+"""
+
+import re
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from src.context.prefilter import bm25_scores, bm25_terms
+
+if TYPE_CHECKING:
+    from src.states.supervisor_state import Critique, Fact
+
+
+# Headings at this level or above start a new section; deeper headings stay inside their section.
+SECTION_LEVEL = 2
+
+# The ID of the text before the first section (usually the '# Title' and the introduction).
+PREAMBLE_ID = "preamble"
+
+# Headings of the bibliography sections. They are never rewritten by the model; new links are appended to them instead.
+SOURCES_HEADINGS = {"sources", "references", "bibliography", "citations"}
+
+# A critique is routed to every section that matches at least this fraction of its best section's score.
+CRITIQUE_MATCH_RATIO = 0.5
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+# Stripped by 'stem', longest first ('-ies' becomes '-y'); a stem keeps at least three letters.
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ed", "es", "s", "e")
+
+
+@dataclass(frozen=True)
+class DraftSection:
+    """One top-level section of a draft: its heading line plus everything up to the next section."""
+    # A stable ID derived from the heading, e.g. 'market-overview' (duplicates get a '-2', '-3', ... suffix).
+    id: str
+    # The heading text without its '#' markers ('' for the preamble).
+    heading: str
+    # The exact markdown of the section, heading line included.
+    text: str
+
+    @property
+    def is_sources(self) -> bool:
+        return self.heading.strip().lower().rstrip(":") in SOURCES_HEADINGS
+
+
+def _slug(heading: str) -> str:
+    return "-".join(_WORD_RE.findall(heading.lower())) or "section"
+
+
+def parse_sections(draft: str) -> List[DraftSection]:
+    """Splits a markdown draft into its preamble and top-level sections, ignoring headings inside code fences."""
+    sections: List[DraftSection] = []
+    seen: Dict[str, int] = {}
+    heading, lines, in_fence = "", [], False
+
+    def flush() -> None:
+        if not lines and not sections and not heading:
+            return
+        base = _slug(heading) if heading else PREAMBLE_ID
+        seen[base] = seen.get(base, 0) + 1
+        section_id = base if seen[base] == 1 else f"{base}-{seen[base]}"
+        sections.append(DraftSection(id=section_id, heading=heading, text="".join(lines)))
+
+    for line in draft.splitlines(keepends=True):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING_RE.match(line)
+        # The '# Title' (level 1) stays in the preamble; every '##' heading starts a new section.
+        if match and 1 < len(match.group(1)) <= SECTION_LEVEL:
+            flush()
+            heading, lines = match.group(2), []
+        lines.append(line)
+    flush()
+
+    # An empty preamble carries no content, so we drop it (rendering stays lossless).
+    return [s for s in sections if s.id != PREAMBLE_ID or s.text]
+
+
+def render_sections(sections: Sequence[DraftSection]) -> str:
+    """Joins sections back into a markdown draft."""
+    return "".join(section.text for section in sections)
+
+
+def stem(word: str) -> str:
+    """A light suffix-stripping stemmer, so 'price', 'prices' and 'pricing' are the same term."""
+    if word.endswith("ies") and len(word) > 5:
+        return word[:-3] + "y"
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _analyze(text: str) -> List[str]:
+    return [stem(word) for word in bm25_terms(text) if len(word) > 2]
+
+
+def _scores(text: str, sections: Sequence[DraftSection]) -> List[float]:
+    # BM25 over the sections down-weights words every section shares (the company, the topic of the whole report),
+    # so the words that tell sections apart decide. Heading words count double: a fact about 'pricing' belongs in
+    # the section called 'Pricing'.
+    return bm25_scores(text, [f"{s.heading}\n{s.text}" for s in sections], analyzer=_analyze)
+
+
+def route_updates(sections: Sequence[DraftSection], facts: Sequence["Fact"],
+                  critiques: Sequence["Critique"]) -> Optional[Dict[str, Tuple[List["Fact"], List["Critique"]]]]:
+    """
+    Maps each section ID to the new facts and critiques that concern it; untouched sections are left out.
+
+    Each fact goes to the single section it matches best. A critique often spans several sections, so it goes to
+    every section that scores close to its best match. Returns None when a fact or critique matches no section at
+    all: it concerns the report as a whole (or something it does not cover yet), which needs a full rewrite.
+    """
+    candidates = [s for s in sections if not s.is_sources]
+    if not candidates:
+        return {}
+    routed: Dict[str, Tuple[List["Fact"], List["Critique"]]] = {}
+
+    for fact in facts:
+        scores = _scores(fact.content, candidates)
+        best = max(range(len(candidates)), key=lambda i: scores[i])
+        if scores[best] <= 0:
+            return None
+        routed.setdefault(candidates[best].id, ([], []))[0].append(fact)
+
+    for critique in critiques:
+        scores = _scores(critique.concern, candidates)
+        best_score = max(scores)
+        if best_score <= 0:
+            return None
+        for section, score in zip(candidates, scores):
+            if score >= CRITIQUE_MATCH_RATIO * best_score:
+                routed.setdefault(section.id, ([], []))[1].append(critique)
+
+    return routed
+
+
+def _normalize_rewrite(section: DraftSection, rewritten: str, last: bool) -> str:
+    """Keeps the section's original heading line, and the blank line that separates it from the next section."""
+    body = rewritten.strip()
+    heading_line = section.text.splitlines()[0] if section.heading else ""
+    if heading_line:
+        first_line, _, rest = body.partition("\n")
+        match = _HEADING_RE.match(first_line)
+        if match and len(match.group(1)) <= SECTION_LEVEL:
+            body = rest.lstrip("\n")
+        body = f"{heading_line.rstrip()}\n{body}" if body else heading_line.rstrip()
+    return body + ("\n" if last else "\n\n")
+
+
+def splice_sections(sections: Sequence[DraftSection], rewrites: Dict[str, str]) -> List[DraftSection]:
+    """
+    Replaces the rewritten sections in place, and appends any newly cited link to the sources section.
+
+    Sections that were not rewritten keep their exact text.
+    """
+    spliced = [
+        replace(s, text=_normalize_rewrite(s, rewrites[s.id], last=i == len(sections) - 1)) if s.id in rewrites else s
+        for i, s in enumerate(sections)
+    ]
+
+    # Rewritten sections may cite new sources; we list them in the bibliography without another model call.
+    sources_index = next((i for i, s in enumerate(spliced) if s.is_sources), None)
+    if sources_index is not None:
+        sources = spliced[sources_index]
+        new_links = {}
+        for section in spliced:
+            if section.id in rewrites:
+                for title, url in _LINK_RE.findall(section.text):
+                    if url not in sources.text and url not in new_links:
+                        new_links[url] = title
+        if new_links:
+            trailing = sources.text[len(sources.text.rstrip("\n")):] or "\n"
+            additions = "".join(f"\n- [{title}]({url})" for url, title in new_links.items())
+            spliced[sources_index] = replace(sources, text=sources.text.rstrip("\n") + additions + trailing)
+
+    return spliced
@@ -0,0 +1,112 @@
+"""
+Delta-only knowledge base injection for draft refinement.
+
+The knowledge base only grows, so sending all of it to every 'refine_draft_report' call makes
+the largest prompt of the loop grow with every iteration, although most facts are already in
+the draft. We record which facts each draft version consumed (with a fingerprint of what the
+draft saw), and refine with only the new, changed and disputed facts in full, plus a compact
+digest of everything the draft already covers.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+from src.knowledge.fact_index import fact_sources
+
+if TYPE_CHECKING:
+    from src.states.supervisor_state import ConsumedFact, Fact
+
+
+# The digest lists at most this many already-incorporated facts, the most confident first...
+DIGEST_MAX_FACTS = 30
+# ...each shortened to its first few words, which is enough to remind the writer what is covered.
+DIGEST_WORDS = 12
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def fact_id(fact: "Fact") -> str:
+    """A stable ID for a fact, derived from its normalized content."""
+    return _hash(" ".join(fact.content.lower().split()))
+
+
+def fact_fingerprint(fact: "Fact") -> str:
+    """Changes whenever the draft would need to reflect the fact differently: new wording, new sources, or a dispute."""
+    return _hash(fact.content, *sorted(fact_sources(fact)), str(fact.is_disputed))
+
+
+@dataclass
+class FactDelta:
+    """The knowledge base split by what the current draft has already seen."""
+    new: List["Fact"] = field(default_factory=list)
+    changed: List["Fact"] = field(default_factory=list)
+    # Disputed facts that the draft already saw unchanged; they are still sent so the writer keeps hedging them.
+    disputed: List["Fact"] = field(default_factory=list)
+    consumed: List["Fact"] = field(default_factory=list)
+
+    @property
+    def updates(self) -> List["Fact"]:
+        """The facts the draft has not incorporated in their current form."""
+        return self.new + self.changed
+
+
+def split_facts(knowledge_base: Sequence["Fact"], consumed_facts: Dict[str, "ConsumedFact"]) -> FactDelta:
+    """Splits the knowledge base into new, changed, disputed and already consumed facts."""
+    delta = FactDelta()
+    for fact in knowledge_base:
+        consumed = consumed_facts.get(fact_id(fact))
+        if consumed is None:
+            delta.new.append(fact)
+        elif consumed["fingerprint"] != fact_fingerprint(fact):
+            delta.changed.append(fact)
+        elif fact.is_disputed:
+            delta.disputed.append(fact)
+        else:
+            delta.consumed.append(fact)
+    return delta
+
+
+def consume_facts(knowledge_base: Sequence["Fact"], consumed_facts: Dict[str, "ConsumedFact"], version: int) -> Dict[str, "ConsumedFact"]:
+    """Records that draft 'version' incorporates every fact of the knowledge base, as it is now."""
+    updated = dict(consumed_facts)
+    for fact in knowledge_base:
+        fingerprint = fact_fingerprint(fact)
+        previous = updated.get(fact_id(fact))
+        if previous is None or previous["fingerprint"] != fingerprint:
+            updated[fact_id(fact)] = {"version": version, "fingerprint": fingerprint}
+    return updated
+
+
+def _format_fact(fact: "Fact") -> str:
+    sources = ", ".join(fact_sources(fact))
+    disputed = " [DISPUTED]" if fact.is_disputed else ""
+    return f"- {fact.content}{disputed} (Confidence: {fact.confidence_score}; Sources: {sources})"
+
+
+def _shorten(content: str) -> str:
+    words = content.split()
+    return " ".join(words[:DIGEST_WORDS]) + ("..." if len(words) > DIGEST_WORDS else "")
+
+
+def format_fact_delta(delta: FactDelta) -> str:
+    """Formats the findings for a refinement: the delta in full, and a digest of what the draft already covers."""
+    parts = []
+    if delta.new:
+        parts.append("NEW CONFIRMED FACTS (not yet in the draft):\n" + "\n".join(map(_format_fact, delta.new)))
+    if delta.changed:
+        parts.append("UPDATED FACTS (new sources, wording or dispute status since the last draft):\n" + "\n".join(map(_format_fact, delta.changed)))
+    if delta.disputed:
+        parts.append("DISPUTED FACTS (conflicting evidence; present them with care):\n" + "\n".join(map(_format_fact, delta.disputed)))
+    if delta.consumed:
+        # The digest reminds the writer what the draft already covers, without repeating every fact and source.
+        ranked = sorted(delta.consumed, key=lambda f: f.confidence_score, reverse=True)
+        lines = [f"- {_shorten(f.content)}" for f in ranked[:DIGEST_MAX_FACTS]]
+        if len(ranked) > DIGEST_MAX_FACTS:
+            lines.append(f"- ... and {len(ranked) - DIGEST_MAX_FACTS} more.")
+        parts.append(
+            f"ALREADY IN THE DRAFT ({len(delta.consumed)} facts; keep them, their citations are already in place):\n" + "\n".join(lines)
+        )
+    return "\n\n".join(parts)
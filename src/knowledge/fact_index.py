@@ -0,0 +1,166 @@
+"""
+Incremental near-duplicate detection for the knowledge base.
+
+Every context-pruning pass extracts facts from new raw notes, and across iterations the
+same claim is extracted again and again from different pages. We index facts with MinHash
+signatures over word shingles and bucket them with locality-sensitive hashing, so finding
+the candidates for a new fact costs roughly constant time and indexing the whole knowledge
+base stays near-linear. Everything runs locally, with no embedding model or network calls.
+
+Near-duplicates are merged (keeping the most confident wording and every source URL), and
+similar facts that disagree on their numbers or their polarity are flagged as disputed.
+"""
+
+import hashlib
+import re
+import struct
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    # The state module uses 'merge_facts' as a reducer, so we only import 'Fact' for type checking.
+    from src.states.supervisor_state import Fact
+
+
+# MinHash parameters: NUM_BANDS * ROWS_PER_BAND permutations. With 16 bands of 4 rows,
+# pairs with a Jaccard similarity of about 0.5 or more collide in at least one band.
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+NUM_PERMUTATIONS = NUM_BANDS * ROWS_PER_BAND
+
+# Estimated Jaccard similarity above which two facts state the same thing.
+DUPLICATE_THRESHOLD = 0.7
+# Similarity above which two facts talk about the same thing, and may contradict each other.
+RELATED_THRESHOLD = 0.4
+
+# Each shingle is hashed once into NUM_PERMUTATIONS independent 32-bit values.
+_unpack_hashes = struct.Struct(f"<{NUM_PERMUTATIONS}I").unpack
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*%?")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*%?")
+_NEGATIONS = {"not", "no", "never", "none", "without", "neither", "nor", "cannot", "fails", "failed"}
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+@lru_cache(maxsize=262144)
+def _shingle_hashes(shingle: str) -> tuple:
+    return _unpack_hashes(hashlib.shake_128(shingle.encode("utf-8")).digest(4 * NUM_PERMUTATIONS))
+
+
+@lru_cache(maxsize=65536)
+def fact_signature(content: str) -> tuple:
+    """Computes the MinHash signature of a fact's content over its word shingles."""
+    words = _words(content)
+    # Word 2-grams capture phrasing; single words keep very short facts comparable.
+    shingles = set(words) | {" ".join(words[i:i + 2]) for i in range(len(words) - 1)}
+    rows = [_shingle_hashes(shingle) for shingle in shingles] or [_shingle_hashes("")]
+    # The signature keeps, for every hash function, the smallest value over all shingles.
+    return tuple(map(min, zip(*rows)))
+
+
+def estimate_similarity(sig_a: tuple, sig_b: tuple) -> float:
+    """Estimates the Jaccard similarity of two facts from their MinHash signatures."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERMUTATIONS
+
+
+def _numbers(content: str) -> set:
+    return {n.replace(",", "") for n in _NUMBER_RE.findall(content)}
+
+
+def _is_negated(content: str) -> bool:
+    return any(word in _NEGATIONS for word in _words(content)) or "n't" in content.lower()
+
+
+def facts_conflict(a: "Fact", b: "Fact") -> bool:
+    """Two related facts conflict when they report different figures or opposite polarity."""
+    # A fact that merely adds a figure (e.g. a year) is not a conflict; each side must report a figure the other lacks.
+    numbers_a, numbers_b = _numbers(a.content), _numbers(b.content)
+    if (numbers_a - numbers_b) and (numbers_b - numbers_a):
+        return True
+    return _is_negated(a.content) != _is_negated(b.content)
+
+
+def fact_sources(fact: "Fact") -> List[str]:
+    """Returns every source URL backing a fact, primary source first."""
+    return list(dict.fromkeys([fact.source_url] + list(fact.supporting_urls)))
+
+
+def merge_duplicate_facts(a: "Fact", b: "Fact") -> "Fact":
+    """Merges two statements of the same fact: the most confident wording wins, sources are unioned."""
+    best, other = (a, b) if a.confidence_score >= b.confidence_score else (b, a)
+    sources = fact_sources(best) + [url for url in fact_sources(other) if url not in fact_sources(best)]
+    return best.model_copy(update={
+        "supporting_urls": sources[1:],
+        "is_disputed": a.is_disputed or b.is_disputed,
+    })
+
+
+class FactIndex:
+    """An incremental LSH index over facts that merges duplicates and flags contradictions as they arrive."""
+
+    def __init__(self, facts: Optional[Iterable["Fact"]] = None):
+        self.facts: List["Fact"] = []
+        self._signatures: List[tuple] = []
+        self._buckets: dict[tuple, List[int]] = {}
+        self.merged = 0
+        self.disputed = 0
+        # Facts passed in here are already deduplicated (they come from the knowledge base), so we only index them.
+        for fact in facts or []:
+            self._insert(fact, fact_signature(fact.content))
+
+    def _bands(self, signature: tuple) -> Iterable[tuple]:
+        for band in range(NUM_BANDS):
+            yield (band,) + signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+
+    def _candidates(self, signature: tuple) -> set:
+        return {i for key in self._bands(signature) for i in self._buckets.get(key, [])}
+
+    def add(self, fact: "Fact") -> None:
+        """Adds a fact, merging it into an existing near-duplicate or flagging conflicts with related facts."""
+        signature = fact_signature(fact.content)
+
+        best_match, best_similarity = None, 0.0
+        for i in self._candidates(signature):
+            similarity = estimate_similarity(signature, self._signatures[i])
+            if similarity < RELATED_THRESHOLD:
+                continue
+            if facts_conflict(fact, self.facts[i]):
+                # Related facts that disagree are both kept, and both marked as disputed.
+                if not self.facts[i].is_disputed:
+                    self.facts[i] = self.facts[i].model_copy(update={"is_disputed": True})
+                    self.disputed += 1
+                if not fact.is_disputed:
+                    fact = fact.model_copy(update={"is_disputed": True})
+                    self.disputed += 1
+            elif similarity >= DUPLICATE_THRESHOLD and similarity > best_similarity:
+                best_match, best_similarity = i, similarity
+
+        if best_match is not None:
+            self.facts[best_match] = merge_duplicate_facts(self.facts[best_match], fact)
+            self.merged += 1
+            return
+
+        self._insert(fact, signature)
+
+    def _insert(self, fact: "Fact", signature: tuple) -> None:
+        index = len(self.facts)
+        self.facts.append(fact)
+        self._signatures.append(signature)
+        for key in self._bands(signature):
+            self._buckets.setdefault(key, []).append(index)
+
+
+def merge_facts(existing: List["Fact"], new: List["Fact"]) -> List["Fact"]:
+    """
+    The reducer for the 'knowledge_base' channel.
+
+    Instead of blindly appending, we fold the new facts into the existing ones: duplicates are merged
+    and contradictions are flagged. Signatures are cached by content, so re-indexing is cheap.
+    """
+    index = FactIndex(existing or [])
+    for fact in new or []:
+        index.add(fact)
+    return index.facts
@@ -0,0 +1,252 @@
+"""
+A persistent research memory shared across runs.
+
+Users ask overlapping questions (the same companies, the same regulations) many times a week,
+and every run used to start from zero. At the end of each run we remember its knowledge base
+facts, with the time they were observed and their sources, under the run's research brief. A
+new run recalls the still-fresh facts of earlier runs whose briefs are the same or closely
+related, and hands them to the Supervisor as leads to verify, so its researchers mostly confirm them
+and cover the gaps.
+
+Briefs are compared locally, with no embedding model or network calls. The cosine similarity of
+hashed bag-of-words vectors finds briefs worded alike, but briefs about different subjects are
+often worded alike too (two earnings briefs, two compliance briefs), so a related brief must
+also cover the new brief's rare terms and names, weighted by how few remembered briefs share
+them. Each of its facts must then itself mention a name or a rare term of the new brief. The
+recalled facts are unverified context for the Supervisor, never confirmed knowledge. Facts go
+stale after 'research_memory_max_age_seconds' and are then researched again.
+"""
+
+import hashlib
+import math
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.cache.sqlite_cache import SQLiteCache
+from src.config import settings
+from src.context.prefilter import bm25_terms
+from src.knowledge.fact_delta import fact_fingerprint, fact_id
+from src.knowledge.fact_index import fact_sources
+from src.states.supervisor_state import Fact
+
+
+# Words and word pairs are hashed into this many dimensions; collisions are rare at brief lengths.
+EMBEDDING_DIMENSIONS = 2 ** 20
+
+# Word pairs capture phrasing, but weigh less than the words themselves, so reworded briefs on a topic stay related.
+PAIR_WEIGHT = 0.5
+
+# Names (companies, regulations, products) decide what a brief is about, so they weigh this much more than other words.
+ENTITY_WEIGHT = 3.0
+
+# The share of the new brief's (IDF-weighted) names a related brief must also name.
+MIN_ENTITY_OVERLAP = 0.5
+
+_POSSESSIVE_RE = re.compile(r"['’]s\b", re.IGNORECASE)
+# Capitalized words and acronyms of at least two letters ("Tesla", "GDPR", "OpenAI"), not "Q3" or "I".
+_NAME_RE = re.compile(r"\b[A-Z][A-Za-z]*[A-Za-z][A-Za-z0-9&-]*\b")
+# Capitalized only because they open a sentence, as briefs and questions usually do.
+_SENTENCE_OPENERS = {
+    "analyze", "analyse", "assess", "can", "compare", "could", "describe", "determine", "do", "does", "evaluate",
+    "examine", "explain", "explore", "find", "give", "i", "identify", "in", "investigate", "is", "list", "my", "our",
+    "outline", "please", "provide", "research", "review", "should", "summarize", "summarise", "tell", "this",
+    "we", "when", "where", "who", "why", "write",
+}
+
+
+def normalize_brief(brief: str) -> str:
+    """Lowercases a brief and drops possessives, punctuation and stopwords, so trivially different phrasings share a key."""
+    return " ".join(bm25_terms(_POSSESSIVE_RE.sub("", brief)))
+
+
+def extract_entities(text: str) -> Set[str]:
+    """The names a text mentions: acronyms and capitalized words, except the usual openers of a sentence."""
+    text = _POSSESSIVE_RE.sub("", text)
+    entities: Set[str] = set()
+    for match in _NAME_RE.finditer(text):
+        preceding = text[max(0, match.start() - 20):match.start()].rstrip()
+        if match.group().lower() in _SENTENCE_OPENERS and (not preceding or preceding[-1] in ".!?:;"):
+            continue
+        entities.update(bm25_terms(match.group()))
+    return entities
+
+
+def brief_key(brief: str) -> str:
+    return hashlib.sha256(normalize_brief(brief).encode("utf-8")).hexdigest()[:32]
+
+
+def embed_brief(brief: str) -> Dict[str, float]:
+    """A sparse, L2-normalized vector of the brief's hashed words and word pairs (with sublinear term frequency)."""
+    words = normalize_brief(brief).split()
+    features = [(Counter(words), 1.0), (Counter(f"{a} {b}" for a, b in zip(words, words[1:])), PAIR_WEIGHT)]
+    # The keys are strings so the vector survives a JSON round trip unchanged.
+    vector: Dict[str, float] = {}
+    for counts, weight in features:
+        for feature, count in counts.items():
+            dimension = str(zlib.crc32(feature.encode("utf-8")) % EMBEDDING_DIMENSIONS)
+            vector[dimension] = vector.get(dimension, 0.0) + weight * (1.0 + math.log(count))
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {dimension: weight / norm for dimension, weight in vector.items()}
+
+
+def cosine_similarity(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(dimension, 0.0) for dimension, weight in a.items())
+
+
+class TermWeights:
+    """IDF weights of the terms of the remembered briefs, with names weighted up; terms no brief uses weigh the most."""
+
+    def __init__(self, briefs: List[Set[str]]):
+        self.briefs = len(briefs)
+        self.document_frequency = Counter(term for terms in briefs for term in terms)
+
+    def idf(self, term: str) -> float:
+        return math.log(1.0 + (self.briefs + 1) / (self.document_frequency[term] + 1))
+
+    def is_rare(self, term: str) -> bool:
+        # A term at most half the remembered briefs use tells briefs apart; "earnings" or "compliance" do not.
+        return self.document_frequency[term] <= max(1, self.briefs // 2)
+
+    def weight(self, term: str, entities: Set[str]) -> float:
+        return self.idf(term) * (ENTITY_WEIGHT if term in entities else 1.0)
+
+    def overlap(self, terms: Set[str], other: Set[str], entities: Set[str]) -> float:
+        """The (weighted) share of 'terms' that 'other' covers."""
+        total = sum(self.weight(term, entities) for term in terms)
+        return sum(self.weight(term, entities) for term in terms & other) / total if total else 0.0
+
+
+@dataclass(frozen=True)
+class RememberedFact:
+    """A fact recalled from an earlier run, with when it was observed, how related that run's brief is and how
+    much of the new brief the fact itself mentions."""
+    fact: Fact
+    observed_at: float
+    similarity: float
+    relevance: float = 0.0
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.observed_at)
+
+
+class ResearchMemory:
+    """Remembers the facts of every run under its brief, and recalls the fresh facts of related briefs."""
+
+    def __init__(self, path: str | Path, max_age_seconds: float, min_similarity: float, min_overlap: float,
+                 max_briefs: int = 5000, max_facts: int = 200000):
+        self.briefs = SQLiteCache(path, table="research_briefs", max_entries=max_briefs)
+        self.facts = SQLiteCache(path, table="research_facts", max_entries=max_facts)
+        self.max_age_seconds = max_age_seconds
+        self.min_similarity = min_similarity
+        self.min_overlap = min_overlap
+
+    def recall(self, brief: str, limit: int) -> List[RememberedFact]:
+        """Returns up to 'limit' fresh facts of related briefs that mention the brief's names or rare terms, those of
+        the most related briefs first."""
+        vector, terms, entities = embed_brief(brief), set(normalize_brief(brief).split()), extract_entities(brief)
+        entries = [entry for _, entry in self.briefs.items()]
+        weights = TermWeights([set(normalize_brief(entry["brief"]).split()) for entry in entries])
+        known_entities = set().union(*(extract_entities(entry["brief"]) for entry in entries)) if entries else set()
+        anchors = {term for term in terms if term in entities or weights.is_rare(term)}
+
+        now = time.time()
+        recalled: Dict[str, RememberedFact] = {}
+        for entry in entries:
+            # 1. A related brief is worded alike and covers most of the new brief's weight, names above all.
+            other_terms, other_entities = set(normalize_brief(entry["brief"]).split()), extract_entities(entry["brief"])
+            if cosine_similarity(vector, entry["vector"]) < self.min_similarity:
+                continue
+            if entities and weights.overlap(entities, other_entities, entities) < MIN_ENTITY_OVERLAP:
+                continue
+            similarity = weights.overlap(terms, other_terms, entities | other_entities)
+            if similarity < self.min_overlap:
+                continue
+
+            for key in entry["fact_ids"]:
+                # Stale facts have expired from the store, so they are simply missing here.
+                record = self.facts.get(key)
+                if record is None or now - record["observed_at"] > self.max_age_seconds:
+                    continue
+                # 2. Each fact must mention a name or a rare term of the new brief, and no other brief's subject alone.
+                fact = Fact(**record["fact"])
+                fact_terms, fact_entities = set(bm25_terms(_POSSESSIVE_RE.sub("", fact.content))), extract_entities(fact.content)
+                if not fact_terms & anchors or (fact_entities & known_entities and not fact_entities & entities):
+                    continue
+                relevance = sum(weights.weight(term, entities) for term in fact_terms & anchors)
+                if key not in recalled or recalled[key].similarity < similarity:
+                    recalled[key] = RememberedFact(fact, record["observed_at"], similarity, relevance)
+
+        ranked = sorted(recalled.values(), key=lambda r: (-r.similarity, -r.relevance, -r.fact.confidence_score, -r.observed_at))
+        return ranked[:limit]
+
+    def remember(self, brief: str, facts: Iterable[Fact]) -> int:
+        """Stores the facts of a finished run under its brief, and returns how many of them were newly observed."""
+        now = time.time()
+        fact_ids, observed = [], 0
+        for fact in facts:
+            key, fingerprint = fact_id(fact), fact_fingerprint(fact)
+            previous = self.facts.get(key)
+            # A fact carried over unchanged from an earlier run keeps its original timestamp, so it still goes stale;
+            # a fact that research confirmed again (new sources, new wording) is fresh from now on.
+            if previous is not None and previous["fingerprint"] == fingerprint:
+                observed_at = previous["observed_at"]
+            else:
+                observed_at = now
+                observed += 1
+            ttl = observed_at + self.max_age_seconds - now
+            self.facts.set(key, {"fact": fact.model_dump(), "fingerprint": fingerprint, "observed_at": observed_at}, ttl_seconds=ttl)
+            fact_ids.append(key)
+
+        # Facts an earlier run of the same brief found (and that are still fresh) stay attached to it.
+        previous_entry = self.briefs.get(brief_key(brief)) or {}
+        kept = [key for key in previous_entry.get("fact_ids", []) if self.facts.get(key) is not None]
+        entry = {"brief": brief, "vector": embed_brief(brief), "fact_ids": list(dict.fromkeys(kept + fact_ids)), "updated_at": now}
+        self.briefs.set(brief_key(brief), entry, ttl_seconds=self.max_age_seconds)
+        return observed
+
+    def stats(self) -> dict:
+        return {"briefs": len(self.briefs), "facts": len(self.facts), **self.facts.stats.as_dict()}
+
+
+def _format_age(seconds: float) -> str:
+    if seconds < 3600:
+        return "less than an hour ago"
+    if seconds < 2 * 24 * 3600:
+        return f"{seconds / 3600:.0f} hours ago"
+    return f"{seconds / (24 * 3600):.0f} days ago"
+
+
+def format_remembered_facts(remembered: List[RememberedFact]) -> str:
+    lines = []
+    for r in remembered:
+        disputed = " [DISPUTED]" if r.fact.is_disputed else ""
+        sources = ", ".join(fact_sources(r.fact))
+        lines.append(f"- {r.fact.content}{disputed} (Confidence: {r.fact.confidence_score}; Sources: {sources}; "
+                     f"researched {_format_age(r.age_seconds)})")
+    return "\n".join(lines)
+
+
+_research_memory: Optional[ResearchMemory] = None
+
+
+def get_research_memory() -> Optional[ResearchMemory]:
+    """Returns the process-wide research memory, or None when it is disabled."""
+    global _research_memory
+    if not settings.research_memory_enabled:
+        return None
+    if _research_memory is None:
+        _research_memory = ResearchMemory(
+            Path(settings.cache_dir) / "research_memory.sqlite",
+            max_age_seconds=settings.research_memory_max_age_seconds,
+            min_similarity=settings.research_memory_min_similarity,
+            min_overlap=settings.research_memory_min_overlap,
+        )
+    return _research_memory
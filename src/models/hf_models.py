@@ -1,14 +1,114 @@
-from langchain_huggingface import HuggingFaceEndpoint, ChatHuggingFace
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Hashable, Optional, Sequence, Type
+
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
+
+from src.runtime.rate_limiter import ProviderGuardMixin
+
+if TYPE_CHECKING:
+    from langchain_huggingface import ChatHuggingFace
+
+
+# A process-wide registry of model clients. Building a 'HuggingFaceEndpoint' sets up its HTTP clients
+# and resolves the model, so we build each distinct configuration once and share it across all agents.
+_model_registry: dict[Hashable, Any] = {}
+_registry_lock = threading.RLock()
+
+# An optional replacement for the HuggingFace client factory, e.g. local stand-ins for offline benchmarks.
+_model_factory: Optional[Callable[..., Any]] = None
+
+
+def _freeze(value: Any) -> Hashable:
+    """Turns a keyword argument value into something usable as part of a registry key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def _model_key(model_name: str, kwargs: dict) -> Hashable:
+    return (model_name, _freeze(kwargs))
+
+
+def _tool_name(tool: Any) -> str:
+    return getattr(tool, "name", None) or getattr(tool, "__name__", None) or repr(tool)
+
+
+def _get_or_create(key: Hashable, factory):
+    """Returns the registry entry for 'key', building it with 'factory' on first use."""
+    with _registry_lock:
+        if key not in _model_registry:
+            _model_registry[key] = factory()
+        return _model_registry[key]
+
+
+@lru_cache(maxsize=1)
+def _guarded_chat_class() -> type:
+    """Builds (once, lazily) the 'ChatHuggingFace' subclass whose calls go through the provider guard."""
+    from langchain_huggingface import ChatHuggingFace
+
+    class GuardedChatHuggingFace(ProviderGuardMixin, ChatHuggingFace):
+        pass
+
+    return GuardedChatHuggingFace
 
 
 # Initialize the HuggingFace model endpoint
-def get_hf_model(model_name: str = "Qwen/Qwen3-4B-Instruct-2507", **kwargs) -> ChatHuggingFace:
-    """A wrapper around the HuggingFace LLM endpoint for consistent usage across agents."""
-
-    llm = ChatHuggingFace(
-        llm=HuggingFaceEndpoint(
-            model=model_name,
-        ),
-        **kwargs
-    )
-    return llm
\ No newline at end of file
+def get_hf_model(model_name: str = "Qwen/Qwen3-4B-Instruct-2507", **kwargs) -> "ChatHuggingFace":
+    """A wrapper around the HuggingFace LLM endpoint for consistent usage across agents.
+
+    Clients are memoized by (model_name, kwargs), so repeated calls return the same instance
+    and reuse its underlying connection pools.
+    """
+    def build() -> "ChatHuggingFace":
+        if _model_factory is not None:
+            return _model_factory(model_name, **kwargs)
+
+        # We import the HuggingFace integration lazily so that merely importing the agent stays cheap.
+        from langchain_huggingface import HuggingFaceEndpoint
+
+        # Every call goes through the provider's guard: shared rate limits, retries with backoff and a circuit breaker.
+        llm = _guarded_chat_class()(
+            llm=HuggingFaceEndpoint(
+                model=model_name,
+            ),
+            **kwargs
+        )
+        # We tag the client with its model name so tracing and instrumentation can attribute every call.
+        llm.metadata = {**(llm.metadata or {}), "ls_model_name": model_name}
+        return llm
+
+    return _get_or_create(("chat",) + _model_key(model_name, kwargs), build)
+
+
+def get_structured_model(schema: Type[BaseModel], model_name: str = "Qwen/Qwen3-4B-Instruct-2507", **kwargs) -> Runnable:
+    """Returns the cached structured-output handle of a model for the given Pydantic schema."""
+    key = ("structured", schema) + _model_key(model_name, kwargs)
+    return _get_or_create(key, lambda: get_hf_model(model_name, **kwargs).with_structured_output(schema))
+
+
+def get_tool_model(tools: Sequence[Any], model_name: str = "Qwen/Qwen3-4B-Instruct-2507", **kwargs) -> Runnable:
+    """Returns the cached tool-bound handle of a model for the given tools."""
+    key = ("tools", tuple(_tool_name(t) for t in tools)) + _model_key(model_name, kwargs)
+    return _get_or_create(key, lambda: get_hf_model(model_name, **kwargs).bind_tools(tools))
+
+
+def set_model_factory(factory: Optional[Callable[..., Any]]) -> None:
+    """Replaces how chat models are built ('factory(model_name, **kwargs)'), or restores the default with None."""
+    global _model_factory
+    with _registry_lock:
+        _model_factory = factory
+        _model_registry.clear()
+
+
+def clear_model_registry() -> None:
+    """Drops every cached client, e.g. after changing credentials or endpoints."""
+    with _registry_lock:
+        _model_registry.clear()
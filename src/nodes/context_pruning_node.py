@@ -1,9 +1,13 @@
 from typing import List
 from pydantic import BaseModel
 
-from src.models.hf_models import get_hf_model
+from src.models.hf_models import get_structured_model
+from src.context.token_budget import truncate_to_tokens
+from src.config import settings
 from src.states.supervisor_state import Fact, SupervisorState
+from src.knowledge.fact_index import FactIndex
 from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.types import Overwrite
 
 
 class FactExtraction(BaseModel):
@@ -24,15 +28,15 @@ async def context_pruning_node(state: SupervisorState) -> dict:
     if not raw_notes:
         return {}
 
-    # 3. We combine all the new raw notes into a single block of text for processing.
-    text_block = "\n".join(raw_notes)
+    # 3. We combine all the new raw notes into a single block of text, bounded by our token budget.
+    text_block = truncate_to_tokens("\n".join(raw_notes), settings.pruning_input_tokens)
 
     # 4. We create a prompt that instructs the LLM to act as a Knowledge Graph Engineer.
     prompt = f"""
     You are a Knowledge Graph Engineer.
     
     New Raw Notes from a research agent:
-    {text_block[:20000]} 
+    {text_block} 
     
     Your task is to:
     1. Extract all atomic, verifiable facts from the New Raw Notes.
@@ -47,24 +51,37 @@ async def context_pruning_node(state: SupervisorState) -> dict:
 
         # 5. We invoke our structured output LLM to perform the extraction.
         # We'll use a fast, cheaper model for this routine extraction task.
-        compressor_model = get_hf_model(model_name="Qwen/Qwen3-4B-Instruct-2507")
-        structured_llm = compressor_model.with_structured_output(FactExtraction)
+        structured_llm = get_structured_model(FactExtraction, model_name="Qwen/Qwen3-4B-Instruct-2507")
         result = await structured_llm.ainvoke([HumanMessage(content=prompt)])
         new_facts = result.new_facts
         
-        # In a more advanced system, we would perform deduplication against the existing knowledge_base here.
-        message = f"[SYSTEM] Context Pruned. {len(new_facts)} new facts added to Knowledge Base. Raw notes buffer cleared."
+        # The 'knowledge_base' reducer deduplicates the new facts against the existing ones.
+        # We run the same index here only to report what the merge will do.
+        index = FactIndex(state.get("knowledge_base", []))
+        for fact in new_facts:
+            index.add(fact)
+        added = len(index.facts) - len(state.get("knowledge_base", []))
+        message = (
+            f"[SYSTEM] Context Pruned. {added} new facts added to Knowledge Base "
+            f"({index.merged} duplicates merged, {index.disputed} facts flagged as disputed). Raw notes buffer cleared."
+        )
     except Exception as e:
 
-        # If the extraction fails, we create a system message to log the error.
-        new_facts = []
-        message = f"[SYSTEM] Context Pruning failed: {str(e)}"
+        # If the extraction still fails after the provider guard's retries, we keep the raw notes buffer
+        # so the next pruning pass extracts these facts instead of losing them, and we log the error.
+        print(f"Context pruning failed: {str(e)}")
+        return {
+            "supervisor_messages": [
+                SystemMessage(content=f"[SYSTEM] Context Pruning failed: {str(e)}. Raw notes kept for the next pass.")
+            ]
+        }
     
     # 6. This is the most critical step. We return an update that CLEARS the 'raw_notes' buffer,
     #    appends the 'new_facts' to the permanent 'knowledge_base', and replaces the raw text in the
     #    Supervisor's history with a single, concise system message.
     return {
-        "raw_notes": [],   # Clear the raw notes buffer : important!
+        # The 'raw_notes' reducer appends, so clearing the buffer needs an explicit overwrite.
+        "raw_notes": Overwrite([]),   # Clear the raw notes buffer : important!
         "knowledge_base": new_facts,
         "supervisor_messages": [
             SystemMessage(content=message)
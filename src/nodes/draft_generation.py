@@ -1,11 +1,14 @@
+import asyncio
 from pydantic import BaseModel, Field
 from langgraph.types import Command
 from langchain_core.messages import HumanMessage
 
 from src.states.agent_state import AgentState
-from src.models.hf_models import get_hf_model
-from src.prompts import draft_report_generation_prompt
+from src.models.hf_models import get_structured_model
+from src.prompts import draft_report_generation_prompt, remembered_research_prompt
 from src.helpers import get_today_str
+from src.config import settings
+from src.knowledge.research_memory import get_research_memory, format_remembered_facts
 
 
 class DraftReport(BaseModel):
@@ -17,31 +20,42 @@ class DraftReport(BaseModel):
     )
 
 
-# Our creative model
-creative_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
-
-def write_draft_report(state: AgentState) -> dict:
+async def write_draft_report(state: AgentState) -> dict:
     """
-    This node takes the research brief and generates an initial, unresearched draft.
-    This serves as the "noisy" starting point for our diffusion process.
+    This node takes the research brief and generates an initial draft.
+    This serves as the "noisy" starting point for our diffusion process. When earlier runs researched
+    the same or a related brief, their still-fresh facts are handed on as leads for the Supervisor to verify.
     """
-    # 1. We use our 'creative_model' for this task and bind it to the 'DraftReport' schema.
-    structured_output_model = creative_model.with_structured_output(DraftReport)
+    # 1. We use our creative model for this task, bound to the 'DraftReport' schema.
+    structured_output_model = get_structured_model(DraftReport, model_name="moonshotai/Kimi-K2-Instruct")
     research_brief = state.get("research_brief", "")
-    
-    # 2. We format the prompt for the drafter, injecting the research brief and the current date.
+
+    # 2. We recall the fresh facts of earlier runs on related briefs (a local SQLite lookup, kept off the event loop).
+    memory = get_research_memory()
+    remembered = await asyncio.to_thread(memory.recall, research_brief, settings.research_memory_max_facts) if memory else []
+    remembered_research = ""
+    if remembered:
+        print(f"--- [MEMORY] Seeding the run with {len(remembered)} unverified facts from related briefs ---")
+        remembered_research = remembered_research_prompt.format(count=len(remembered), facts=format_remembered_facts(remembered))
+
+    # 3. We format the prompt for the drafter, injecting the research brief, the remembered facts and the current date.
     draft_report_prompt_formatted = draft_report_generation_prompt.format(
         research_brief=research_brief,
         date=get_today_str()
     )
+    if remembered_research:
+        draft_report_prompt_formatted += "\n" + remembered_research
 
-    # 3. We invoke the LLM to generate the initial "noisy" draft.
-    response = structured_output_model.invoke([HumanMessage(content=draft_report_prompt_formatted)])
+    # 4. We invoke the LLM to generate the initial "noisy" draft.
+    response = await structured_output_model.ainvoke([HumanMessage(content=draft_report_prompt_formatted)])
 
-    # 4. This node returns a simple dictionary update. This is the final output of the 'scope_research' sub-graph.
+    # 5. This node returns a simple dictionary update. This is the final output of the 'scope_research' sub-graph.
     #    The 'supervisor_messages' field is populated to "hand off" the initial state to the main Supervisor loop.
+    #    Remembered facts stay out of the knowledge base: the Supervisor gets them (next to the brief, which its history
+    #    always keeps) as leads, and only what its researchers confirm reaches the final notes.
+    brief_message = research_brief + ("\n\n" + remembered_research if remembered_research else "")
     return {
         "research_brief": research_brief,
-        "draft_report": response.draft_report, 
-        "supervisor_messages": ["Here is the draft report: " + response.draft_report, research_brief]
-    }
\ No newline at end of file
+        "draft_report": response.draft_report,
+        "supervisor_messages": ["Here is the draft report: " + response.draft_report, brief_message]
+    }
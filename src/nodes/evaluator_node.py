@@ -0,0 +1,64 @@
+from langchain_core.messages import SystemMessage, HumanMessage
+
+from src.states.supervisor_state import SupervisorState, QualityMetric, EvaluationResult
+from src.models.hf_models import get_structured_model
+
+
+async def evaluate_draft_quality(research_brief: str, draft_report: str) -> EvaluationResult:
+    """
+    This function implements the 'Self-Evolution' scoring mechanism. It acts as an
+    LLM-as-a-judge, programmatically evaluating the quality of a draft against the original brief.
+    """
+
+    # We create a prompt that asks the judge model to be an extremely critical Senior Research Editor.
+    eval_prompt = f"""
+    You are a Senior Research Editor. Your standards are exceptionally high. Evaluate this draft report against the research brief.
+
+    <Research Brief>
+    {research_brief}
+    </Research Brief>
+
+    <Draft Report>
+    {draft_report}
+    </Draft Report>
+
+    Be extremely critical. High scores (8+) should be reserved for truly excellent, comprehensive, and well-cited work.
+    Focus your evaluation on these key areas:
+    1. **Comprehensiveness:** Does the draft fully address all parts of the research brief? Are there significant gaps?
+    2. **Accuracy & Grounding:** Are the claims specific and well-supported? Look for vague statements that need citations.
+    3. **Coherence & Structure:** Is the report well-organized and easy to follow? Is the language clear and professional?
+
+    Provide specific, actionable critique for the researcher.
+    """
+
+    # We use our shared judge model, bound to our EvaluationResult schema.
+    structured_judge = get_structured_model(EvaluationResult, model_name="moonshotai/Kimi-K2-Instruct")
+
+    # We invoke the judge to get the structured quality score.
+    return await structured_judge.ainvoke([HumanMessage(content=eval_prompt)])
+
+
+async def evaluator_node(state: SupervisorState) -> dict:
+    """
+    This node represents the 'Evaluator' agent. It scores the freshly refined draft
+    in parallel with the Red Team and the Context Pruner, so judging the draft adds no extra round trip.
+    """
+
+    # 1. We get the new draft report, written by 'supervisor_tools' in the previous step.
+    draft = state.get("draft_report", "")
+    if not draft:
+        return {}
+
+    # 2. We run the Self-Evolution judge over the new draft.
+    eval_result = await evaluate_draft_quality(research_brief=state.get("research_brief", ""), draft_report=draft)
+    avg_score = (eval_result.comprehensiveness_score + eval_result.accuracy_score) / 2
+
+    # 3. We log the metric to our history, set the repair flag if the score is low,
+    #    and report the score to the Supervisor so it sees it on its next turn.
+    return {
+        "quality_history": [QualityMetric(score=avg_score, feedback=eval_result.specific_critique, iteration=state.get("research_iterations", 0))],
+        "needs_quality_repair": avg_score < 7.0,
+        "supervisor_messages": [
+            SystemMessage(content=f"[EVALUATOR] Draft Quality Score: {avg_score}/10.\nJudge Feedback: {eval_result.specific_critique}")
+        ]
+    }
@@ -6,24 +6,59 @@ This separation of concerns is important because the Supervisor loop is optimize
 and refinement, while this final node is optimized for high-quality, long-form generation.
 """
 
+import re
+import time
+
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import RunnableConfig
+
 from src.helpers import get_today_str
+from src.config import settings
+from src.context.token_budget import count_tokens
+from src.context.retrieval import evidence_run_id, get_evidence_index, passages_as_evidence, format_evidence
+from src.knowledge.draft_sections import parse_sections
 from src.prompts import final_report_generation_with_helpfulness_insightfulness_hit_citation_prompt
 from src.models.hf_models import get_hf_model
 from src.states.agent_state import AgentState
 from langchain_core.messages import HumanMessage
 
 
-# We use our most powerful writer model for this final, high-stakes generation task.
-writer_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct", max_tokens=40000) # Using a large max_tokens for comprehensive reports.
+# A markdown heading (levels 1-3) at the start of a line marks the beginning of a new report section.
+SECTION_HEADING = re.compile(r"\n(?=#{1,3} )")
+
+
+def retrieve_findings(notes: list[str], draft_report: str, run_id: str) -> str:
+    """Selects, for every section of the draft, the findings most relevant to it, within the findings budget."""
+    # The notes are what the writer would otherwise get in full, so we select among them (and only them). Adding is
+    # idempotent, so we always index them: facts the context pruner added after the Supervisor's last indexing, or a
+    # run resumed in a new process with an empty index, would otherwise be missing.
+    index = get_evidence_index(run_id)
+    index.add(passages_as_evidence(notes, "note"))
+
+    # Each section gets an equal share of the budget; a finding picked for one section is not repeated for the next.
+    sections = [s for s in parse_sections(draft_report) if not s.is_sources] or parse_sections(draft_report or " ")
+    per_section = settings.final_report_findings_tokens // max(len(sections), 1)
+    selected, seen = [], set()
+    for section in sections:
+        query = f"{section.heading} {section.text[:2000]}"
+        for evidence in index.search(query, k=2 * settings.retrieval_top_k, max_tokens=per_section, kinds=("note",), exclude=seen):
+            selected.append(evidence)
+            seen.add(evidence.id)
+    return format_evidence(selected)
+
 
-async def final_report_generation(state: AgentState):
+async def final_report_generation(state: AgentState, config: RunnableConfig):
     """
     The final node in our master graph. It takes all the curated artifacts from the
     Supervisor loop and generates the final, polished report.
     """
-    # 1. We retrieve the final, curated notes from the state.
+    # 1. We retrieve the final, curated notes from the state. When they outgrow their budget,
+    #    we keep the findings most relevant to each section of the draft instead of the whole pile.
     notes = state.get("notes", [])
     findings = "\n".join(notes)
+    if count_tokens(findings) > settings.final_report_findings_tokens:
+        run_id = evidence_run_id(config, state.get("research_brief", ""))
+        findings = retrieve_findings(notes, state.get("draft_report", ""), run_id)
 
     # 2. We format our master prompt with all the necessary context.
     final_report_prompt = final_report_generation_with_helpfulness_insightfulness_hit_citation_prompt.format(
@@ -34,11 +69,47 @@ async def final_report_generation(state: AgentState):
         user_request=state.get("messages", [HumanMessage(content="")])[-1].content # Pass the original user request for context
     )
 
-    # 3. We invoke our powerful writer model to generate the final report.
-    final_report = await writer_model.ainvoke([HumanMessage(content=final_report_prompt)])
+    # 3. We stream the report from our most powerful writer model. Tokens reach LangGraph's "messages"
+    #    stream as they are produced, and every completed section is also pushed to the "custom" stream.
+    writer_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct", max_tokens=40000) # Using a large max_tokens for comprehensive reports.
+    stream_writer = get_stream_writer()
+    started_at = time.perf_counter()
+    first_token_at = None
+    output_tokens = None
+    report, section_start = "", 0
+
+    async for chunk in writer_model.astream([HumanMessage(content=final_report_prompt)]):
+        if chunk.usage_metadata:
+            output_tokens = chunk.usage_metadata.get("output_tokens") or output_tokens
+        if not chunk.content:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        report += chunk.content
+
+        # A new heading means the previous section is complete, so we deliver it right away.
+        for match in SECTION_HEADING.finditer(report, section_start + 1):
+            stream_writer({"event": "final_report_section", "section": report[section_start:match.start()]})
+            section_start = match.start() + 1
+
+    if report[section_start:].strip():
+        stream_writer({"event": "final_report_section", "section": report[section_start:]})
+
+    # 4. We record time-to-first-token and generation throughput for this report.
+    finished_at = time.perf_counter()
+    output_tokens = output_tokens or count_tokens(report)
+    generation_seconds = finished_at - (first_token_at or started_at)
+    metrics = {
+        "time_to_first_token_seconds": round((first_token_at or finished_at) - started_at, 3),
+        "total_seconds": round(finished_at - started_at, 3),
+        "output_tokens": output_tokens,
+        "tokens_per_second": round(output_tokens / generation_seconds, 2) if generation_seconds > 0 else None,
+    }
+    stream_writer({"event": "final_report_metrics", **metrics})
 
-    # 4. We update the state with the final_report and a user-facing message.
+    # 5. We update the state with the final_report, its metrics and a user-facing message.
     return {
-        "final_report": final_report.content, 
-        "messages": ["Here is the final report: " + final_report.content],
+        "final_report": report, 
+        "final_report_metrics": metrics,
+        "messages": ["Here is the final report: " + report],
     }
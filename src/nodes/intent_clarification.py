@@ -5,7 +5,7 @@ from langchain_core.output_parsers import JsonOutputParser
 from typing import Literal
 
 from src.states.agent_state import AgentState
-from src.models.hf_models import get_hf_model
+from src.models.hf_models import get_structured_model
 from src.prompts import clarify_with_user_instructions
 from src.helpers import get_today_str
 
@@ -29,7 +29,7 @@ class ClarifyWithUser(BaseModel):
     )
 
 
-def clarify_with_user(state: AgentState) -> Command[Literal["write_research_brief", END]]:
+async def clarify_with_user(state: AgentState) -> Command[Literal["write_research_brief", END]]:
     """
     This node acts as a gatekeeper. It determines if the user's request has enough detail to proceed.
     If not, it HALTS the graph and asks a clarifying question. If yes, it proceeds to the next step.
@@ -40,12 +40,11 @@ def clarify_with_user(state: AgentState) -> Command[Literal["write_research_brie
     current_date = get_today_str()
 
     # 2. We bind our 'ClarifyWithUser' Pydantic schema to the model. This forces a structured JSON output.
-    model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
     # output_parser = JsonOutputParser(pydantic_object=ClarifyWithUser)
-    structured_output_model = model.with_structured_output(ClarifyWithUser)
+    structured_output_model = get_structured_model(ClarifyWithUser, model_name="moonshotai/Kimi-K2-Instruct")
 
     # 3. We invoke the LLM with our detailed 'clarify_with_user_instructions' prompt.
-    response = structured_output_model.invoke([
+    response = await structured_output_model.ainvoke([
         HumanMessage(content=clarify_with_user_instructions.format(
             messages=messages_text, 
             date=current_date
@@ -3,9 +3,7 @@ from langchain_core.messages import SystemMessage, HumanMessage
 from src.states.supervisor_state import SupervisorState, Critique
 from src.models.hf_models import get_hf_model
 
-# We define a specialized, powerful model for our critic.
-# In a real system, you might use a model specifically fine-tuned for critical analysis.
-critic_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
+
 async def red_team_node(state: SupervisorState) -> dict:
     """
     This node represents the 'Red Team' agent. It runs in parallel to other steps,
@@ -16,8 +14,9 @@ async def red_team_node(state: SupervisorState) -> dict:
     draft = state.get("draft_report", "")
     
     # 2. We add a guardrail: the Red Team only activates if the draft is substantial enough to critique.
+    #    A draft it did not review has not passed, so an earlier PASS never counts for the current draft.
     if not draft or len(draft) < 50:
-        return {} 
+        return {"red_team_passed": False}
 
     # 3. This is the adversarial prompt. It explicitly instructs the model to be "NOT helpful"
     #    and to focus on specific types of errors like missing citations and logical leaps.
@@ -38,13 +37,15 @@ async def red_team_node(state: SupervisorState) -> dict:
     If there are issues, output a specific, harsh, and actionable critique describing the errors.
     """
 
-    # 4. We invoke our powerful critic model.
+    # 4. We invoke our specialized, powerful critic model.
+    # In a real system, you might use a model specifically fine-tuned for critical analysis.
+    critic_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
     response = await critic_model.ainvoke([HumanMessage(content=prompt)])
     content = response.content
 
-    # 5. If the model outputs "PASS", no critique is needed, and this node returns an empty update.
+    # 5. If the model outputs "PASS", no critique is needed; we only record the verdict for the convergence check.
     if "PASS" in content and len(content) < 20:
-        return {}
+        return {"red_team_passed": True}
 
     # 6. If a flaw is found, we create a structured 'Critique' object.
     critique = Critique(
@@ -58,6 +59,7 @@ async def red_team_node(state: SupervisorState) -> dict:
     #    and we also inject a high-priority SystemMessage directly into the Supervisor's message history.
     return {
         "active_critiques": [critique],
+        "red_team_passed": False,
         "supervisor_messages": [
             SystemMessage(content=f"⚠️ ADVERSARIAL FEEDBACK DETECTED: {content}")
         ]
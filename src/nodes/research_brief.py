@@ -4,7 +4,7 @@ from langchain_core.messages import HumanMessage, get_buffer_string
 from typing import Literal
 
 from src.states.agent_state import AgentState
-from src.models.hf_models import get_hf_model
+from src.models.hf_models import get_structured_model
 from src.prompts import transform_messages_into_research_topic_human_msg_prompt
 from src.helpers import get_today_str
 
@@ -18,17 +18,16 @@ class ResearchQuestion(BaseModel):
     )
 
 
-def write_research_brief(state: AgentState) -> Command[Literal["write_draft_report"]]:
+async def write_research_brief(state: AgentState) -> Command[Literal["write_draft_report"]]:
     """
     This node transforms the confirmed conversation history into a single, comprehensive research brief.
     """
     # 1. We bind our 'ResearchQuestion' Pydantic schema to the model to ensure structured output.
-    model = get_hf_model()
-    structured_output_model = model.with_structured_output(ResearchQuestion)
+    structured_output_model = get_structured_model(ResearchQuestion)
 
 
     # 2. We invoke the LLM with our specialized 'transform_messages...' prompt and the conversation history.
-    response = structured_output_model.invoke([
+    response = await structured_output_model.ainvoke([
         HumanMessage(content=transform_messages_into_research_topic_human_msg_prompt.format(
             messages=get_buffer_string(state.get("messages", [])),
             date=get_today_str()
@@ -1,9 +1,13 @@
+import asyncio
+import time
 from langchain_core.messages import SystemMessage, ToolMessage, HumanMessage, filter_messages
 from pydantic import BaseModel, Field
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import merge_configs
 from typing import Literal, List
 
 from src.states.researcher_state import ResearcherState
-from src.models.hf_models import get_hf_model
+from src.models.hf_models import get_hf_model, get_tool_model
 from src.prompts import (
     research_agent_prompt, 
     summarize_webpage_prompt, 
@@ -11,39 +15,78 @@ from src.prompts import (
     compress_research_human_message
 )
 from src.helpers import get_today_str   
-from src.tools.researcher_tools import tavily_search
+from src.context.token_budget import ContextBudget, count_message_tokens
+from src.context.retrieval import EvidenceIndex, search_results_as_evidence, format_evidence
+from src.config import settings
+from src.tools.researcher_tools import tavily_search, tavily_search_batch, batch_queries
+from src.runtime.budgets import ResearcherBudget, TokenUsageCounter, budget_usage
 
 
-# We set up our tool-enabled model for the researcher agent.
-model_with_tools = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct").bind_tools([tavily_search])
+# The tools available to the researcher agent. The batch search covers several queries in a single ReAct turn.
+researcher_tools = [tavily_search, tavily_search_batch]
 
-def llm_call(state: ResearcherState):
+
+def get_researcher_model():
+    """Returns our tool-enabled model for the researcher agent (shared through the model registry)."""
+    return get_tool_model(researcher_tools, model_name="moonshotai/Kimi-K2-Instruct")
+
+
+async def llm_call(state: ResearcherState):
     """The 'brain' of the researcher: analyzes the current state and decides on the next action (call a tool or finish)."""
 
     # This node invokes our tool-bound model with the specific research_agent_prompt and the current message history for this sub-task.
+    # The researcher's clock starts with its first call, and every call's tokens count against its budget.
+    started_at = state.get("started_at") or time.monotonic()
+    model_with_tools = get_researcher_model()
+    response = await model_with_tools.ainvoke(
+        [SystemMessage(content=research_agent_prompt.format(date=get_today_str()))] + state["researcher_messages"]
+    )
+    usage = response.usage_metadata or {}
     return {
-        "researcher_messages": [
-            model_with_tools.invoke(
-                [SystemMessage(content=research_agent_prompt.format(date=get_today_str()))] + state["researcher_messages"]
-            )
-        ]
+        "researcher_messages": [response],
+        "tokens_used": state.get("tokens_used", 0) + usage.get("total_tokens", 0),
+        "started_at": started_at,
     }
 
 
-def tool_node(state: ResearcherState):
+async def tool_node(state: ResearcherState, config: RunnableConfig):
     """The 'hands' of the researcher: executes all tool calls from the previous LLM response."""
 
     # We get the most recent message from the state, which should contain the tool calls.
     tool_calls = state["researcher_messages"][-1].tool_calls
-    tools_by_name = {tool.name: tool for tool in model_with_tools.tools}
+    tools_by_name = {tool.name: tool for tool in researcher_tools}
 
-    # We execute all the planned tool calls.
-    observations = []
-    for tool_call in tool_calls:
+    # We enforce the search budget query by query: a batch is trimmed to the searches that are left,
+    # and calls beyond the budget are answered without running them.
+    remaining = ResearcherBudget.from_settings().remaining_searches(state)
+    searches = 0
+
+    # The summarization calls a search triggers count against the researcher's token budget, so we attach a
+    # counter to the tool calls (next to the run's own callbacks, which they keep).
+    usage = TokenUsageCounter()
+    tool_config = merge_configs(config, {"callbacks": [usage]})
+
+    async def run(tool_call: dict) -> str:
+        return await tools_by_name[tool_call["name"]].ainvoke(tool_call["args"], tool_config)
 
-        # We look up the correct tool function by its name.
-        tool = tools_by_name[tool_call["name"]]
-        observations.append(tool.invoke(tool_call["args"]))
+    async def skipped() -> str:
+        return "Search budget exhausted: this search was not run. Write up what you have found so far."
+
+    planned = []
+    for tool_call in tool_calls:
+        queries = batch_queries(tool_call["args"].get("queries", [])) if tool_call["name"] == "tavily_search_batch" else [tool_call["args"].get("query", "")]
+        if remaining is not None:
+            queries = queries[:max(0, remaining - searches)]
+        if not queries:
+            planned.append(skipped())
+            continue
+        searches += len(queries)
+        if tool_call["name"] == "tavily_search_batch":
+            tool_call = {**tool_call, "args": {**tool_call["args"], "queries": queries}}
+        planned.append(run(tool_call))
+
+    # We execute all the planned tool calls concurrently; 'asyncio.gather' keeps them aligned with 'tool_calls'.
+    observations = await asyncio.gather(*planned)
 
     # We format the results of the tool calls into 'ToolMessage' objects.
     # This is the standard way to return tool results to the LLM in LangGraph.
@@ -55,8 +98,13 @@ def tool_node(state: ResearcherState):
         ) for observation, tool_call in zip(observations, tool_calls)
     ]
 
-    # We return the tool outputs to be added to the message history.
-    return {"researcher_messages": tool_outputs}
+    # We return the tool outputs to be added to the message history, and count this round against the budget.
+    return {
+        "researcher_messages": tool_outputs,
+        "tool_call_iterations": state.get("tool_call_iterations", 0) + 1,
+        "search_count": state.get("search_count", 0) + searches,
+        "tokens_used": state.get("tokens_used", 0) + usage.total_tokens,
+    }
 
 
 def should_continue(state: ResearcherState) -> Literal["tool_node", "compress_research"]:
@@ -64,29 +112,50 @@ def should_continue(state: ResearcherState) -> Literal["tool_node", "compress_re
     messages = state["researcher_messages"]
     last_message = messages[-1]
 
-    # If the last message from the LLM contains tool calls, we continue the loop.
+    # If the last message from the LLM contains tool calls, we continue the loop, unless the researcher has used up
+    # one of its budgets; then it hands what it has found so far to the compression step.
     if last_message.tool_calls:
+        exceeded = ResearcherBudget.from_settings().exceeded(state)
+        if exceeded:
+            print(f"--- [BUDGET] Researcher stopping early: {exceeded} used up ---")
+            return "compress_research"
         return "tool_node"
 
     # If there are no tool calls, the agent has decided its research is complete, and we proceed to the compression step.
     return "compress_research"  
 
 
-def compress_research(state: ResearcherState) -> dict:
+async def compress_research(state: ResearcherState) -> dict:
     """The final node in the research sub-graph: it compresses all findings from the ReAct loop into a clean, cited summary."""
     # 1. We format the system and human messages for our compression model.
-    system_message = compress_research_system_prompt.format(date=get_today_str())
-
-    # The full message history of the ReAct loop is passed as context.
-    messages = [
-        SystemMessage(content=system_message)] + \
-            state.get("researcher_messages", []) + \
-                [HumanMessage(content=compress_research_human_message.format(research_topic=state['research_topic']))]
+    #    A researcher stopped by its budget leaves tool calls that never ran; we drop them and say the findings are partial.
+    researcher_messages = list(state.get("researcher_messages", []))
+    stopped_by = None
+    if researcher_messages and getattr(researcher_messages[-1], "tool_calls", None):
+        stopped_by = ResearcherBudget.from_settings().exceeded(state) or "budget"
+        researcher_messages = researcher_messages[:-1]
+    instructions = compress_research_human_message.format(research_topic=state['research_topic'])
+    if stopped_by:
+        instructions += f"\n\nNote: the research stopped early because its {stopped_by} was used up. Clean up what was found so far."
+
+    budget = ContextBudget(settings.compress_context_tokens)
+    system_message = budget.allocate_text("system", compress_research_system_prompt.format(date=get_today_str()))
+    human_message = budget.allocate_text("instructions", instructions)
+
+    # The message history of the ReAct loop is passed as context. If it does not fit the remaining budget,
+    # we pass the search results most relevant to the topic instead of dropping the oldest turns wholesale.
+    if sum(count_message_tokens(m) for m in researcher_messages) > budget.remaining:
+        index = EvidenceIndex()
+        index.add(search_results_as_evidence(str(m.content) for m in researcher_messages if isinstance(m, ToolMessage)))
+        evidence = index.search(state["research_topic"], k=len(index), max_tokens=budget.remaining * 9 // 10)
+        researcher_messages = researcher_messages[:1] + [HumanMessage(content="Most relevant search results collected:\n" + format_evidence(evidence))]
+    history = budget.allocate_messages("history", researcher_messages, keep_first=1)
+    messages = [SystemMessage(content=system_message)] + history + [HumanMessage(content=human_message)]
     
     # 2. We invoke our powerful 'compress_model'.
     # Compress model
     compress_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct", max_tokens=32000)
-    response = compress_model.invoke(messages)
+    response = await compress_model.ainvoke(messages)
 
     # 3. We also extract the raw, unprocessed notes from the tool and AI messages.
     #    This is for archival purposes and can be used by the Supervisor for deeper analysis if needed.
@@ -97,8 +166,10 @@ def compress_research(state: ResearcherState) -> dict:
         )
     ]
 
-    # 4. This node returns the final, clean outputs that will be passed out of the sub-graph.
+    # 4. This node returns the final, clean outputs that will be passed out of the sub-graph,
+    #    with the budget report for the Supervisor.
     return {
         "compressed_research": str(response.content),
-        "raw_notes": ["\n".join(raw_notes)]
+        "raw_notes": ["\n".join(raw_notes)],
+        "budget_usage": budget_usage(state, stopped_by),
     }
\ No newline at end of file
@@ -1,15 +1,25 @@
+import asyncio
 from typing import Literal
 from langgraph.types import Command
 from langgraph.graph import END
-import asyncio
 from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 
-from src.states.supervisor_state import SupervisorState, QualityMetric, EvaluationResult
-from src.models.hf_models import get_hf_model
+from src.states.supervisor_state import SupervisorState
+from src.models.hf_models import get_tool_model
 from src.prompts import lead_researcher_with_multiple_steps_diffusion_double_check_prompt
 from src.helpers import get_today_str, get_notes_from_tool_calls
-from src.tools.supervisor_tools import think_tool, refine_draft_report, ConductResearch, ResearchComplete
-from src.graphs.researcher_graph import researcher_agent
+from src.context.token_budget import ContextBudget
+from src.config import settings
+from src.tools.supervisor_tools import think_tool, refine_draft_report, refine_draft_sections, ConductResearch, ResearchComplete
+from src.graphs.researcher_graph import build_researcher_agent
+from src.runtime.scheduler import get_researcher_scheduler
+from src.cache.researcher_results import get_researcher_result_store
+from src.knowledge.fact_delta import split_facts, consume_facts, format_fact_delta
+from src.runtime.convergence import CONTINUE, ConvergenceController
+from src.runtime.budgets import format_budget_usage
+from src.knowledge.research_memory import get_research_memory
+from src.context.retrieval import evidence_run_id, get_evidence_index, facts_as_evidence, passages_as_evidence, format_evidence
 
 
 
@@ -22,8 +32,10 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
     The 'Brain' of the diffusion process. This node analyzes the current state,
     including any critical feedback, and decides on the next set of actions (tool calls).
     """
-    # 1. We get the current message history for the supervisor.
+    # 1. We get the current message history for the supervisor, and a token budget for the whole prompt.
+    #    Sections are allocated in priority order, so the history is the first thing to be trimmed.
     supervisor_messages = state.get("supervisor_messages", [])
+    budget = ContextBudget(settings.supervisor_context_tokens)
     
     # 2. We format the main system prompt with the diffusion algorithm instructions.
     system_message = lead_researcher_with_multiple_steps_diffusion_double_check_prompt.format(
@@ -31,7 +43,8 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
         max_concurrent_research_units=max_concurrent_researchers,
         max_researcher_iterations=max_researcher_iterations
     )
-    messages = [SystemMessage(content=system_message)] + supervisor_messages
+    system_message = budget.allocate_text("system", system_message)
+    injected_messages = []
 
     # 3. DYNAMIC CONTEXT INJECTION: We check for and inject any unaddressed adversarial feedback.
     # This is a critical self-correction mechanism.
@@ -39,6 +52,7 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
     unaddressed = [c for c in critiques if not c.addressed]
     if unaddressed:
         critique_text = "\n".join([f"- {c.author} says: {c.concern}" for c in unaddressed])
+        critique_text = budget.allocate_text("critiques", critique_text, max_tokens=budget.total_tokens // 4)
         intervention = SystemMessage(content=f"""
         CRITICAL INTERVENTION REQUIRED.
         The following issues were detected by the Adversarial Team in your draft:
@@ -48,15 +62,20 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
         If the critique says citations are missing, call 'ConductResearch' to find them.
         If the critique says logic is flawed, call 'think_tool' to plan a fix.
         """)
-        messages.append(intervention)
+        injected_messages.append(intervention)
 
     # 4. We also inject a warning if the programmatic quality score was low in the last iteration.
     if state.get("needs_quality_repair"):
-        messages.append(SystemMessage(content="PREVIOUS DRAFT QUALITY WAS LOW (Score < 7/10). Focus on finding new sources and citing them."))
+        warning = "PREVIOUS DRAFT QUALITY WAS LOW (Score < 7/10). Focus on finding new sources and citing them."
+        injected_messages.append(SystemMessage(content=budget.allocate_text("quality_warning", warning)))
+
+    # The history gets the remaining budget. We always keep the first two messages (the initial draft and the brief).
+    history = budget.allocate_messages("history", supervisor_messages, keep_first=2)
+    messages = [SystemMessage(content=system_message)] + history + injected_messages
 
     # 5. We invoke the tool-bound supervisor model to get its next plan.
     tools = [think_tool, refine_draft_report, ConductResearch, ResearchComplete]  # Add relevant tools here
-    supervisor_model_with_tools = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct").bind_tools(tools=tools) # Add relevant tools here
+    supervisor_model_with_tools = get_tool_model(tools, model_name="moonshotai/Kimi-K2-Instruct")
     response = await supervisor_model_with_tools.ainvoke(messages)
 
     # 6. We return a Command to proceed to the 'supervisor_tools' node to execute the plan.
@@ -70,7 +89,7 @@ async def supervisor(state: SupervisorState) -> Command[Literal["supervisor_tool
     )
 
 
-async def supervisor_tools(state: SupervisorState) -> Command[Literal["red_team", "context_pruner", "__end__"]]:
+async def supervisor_tools(state: SupervisorState, config: RunnableConfig) -> Command[Literal["evaluator", "red_team", "context_pruner", "__end__"]]:
     """
     The 'Hands' of the Supervisor. This node executes the planned tool calls, including
     fanning out to parallel research sub-graphs and running the denoising step.
@@ -84,14 +103,30 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["red_team"
     no_tool_calls = not most_recent_message.tool_calls
     research_complete = any(tc["name"] == "ResearchComplete" for tc in most_recent_message.tool_calls)
 
+    # We also stop (or skip the research wave) once the draft has converged: its scores plateaued, the Red Team
+    # passed it, and research stopped producing facts the draft has not seen.
+    convergence = CONTINUE
+    if settings.convergence_enabled and not (exceeded_iterations or no_tool_calls or research_complete):
+        new_facts = split_facts(state.get("knowledge_base", []), state.get("consumed_facts", {})).updates
+        convergence = ConvergenceController.from_settings().decide(
+            state.get("quality_history", []), state.get("red_team_passed", False), len(new_facts), state.get("research_iterations", 0)
+        )
+        if convergence.action != "continue":
+            print(f"--- [CONVERGENCE] {convergence.action}: {convergence.reason} ---")
 
-    if exceeded_iterations or no_tool_calls or research_complete:
+    if exceeded_iterations or no_tool_calls or research_complete or convergence.action == "stop":
 
         # If exiting, we prepare the final, curated notes for the report writer.
         # We prioritize the structured Knowledge Base, but fall back to raw notes if it's empty.
         kb_notes = [f"{f.content} (Confidence: {f.confidence_score})" for f in state.get("knowledge_base", [])]
         if not kb_notes: kb_notes = get_notes_from_tool_calls(state.get("supervisor_messages", []))
 
+        # We remember the knowledge base under the brief, so later runs on the same or related briefs start from it.
+        memory = get_research_memory()
+        if memory and state.get("knowledge_base"):
+            observed = await asyncio.to_thread(memory.remember, state.get("research_brief", ""), state["knowledge_base"])
+            print(f"--- [MEMORY] Remembered {len(state['knowledge_base'])} facts ({observed} newly observed) ---")
+
         # We return a Command to END this sub-graph and pass the final notes up to the main graph.
         return Command(goto=END, update={"notes": kb_notes, "research_brief": state.get("research_brief", "")})
 
@@ -105,85 +140,113 @@ async def supervisor_tools(state: SupervisorState) -> Command[Literal["red_team"
     draft_report = state.get("draft_report", "")
     updates = {}
 
-    # 4. Handle 'think_tool' calls synchronously.
+    # The run's evidence index lets each prompt pull only the findings it needs. On a resumed run the
+    # in-memory index starts empty, so we first re-index the findings already in the message history.
+    evidence_index = get_evidence_index(evidence_run_id(config, state.get("research_brief", "")))
+    if not len(evidence_index):
+        evidence_index.add(passages_as_evidence(get_notes_from_tool_calls(state.get("supervisor_messages", [])), "finding"))
+
+    # 4. Handle 'think_tool' calls inline; they only echo the reflection back, so they never block the event loop.
     for tool_call in think_calls:
         observation = think_tool.invoke(tool_call["args"])
         tool_messages.append(ToolMessage(content=observation, name="think_tool", tool_call_id=tool_call["id"]))
 
-    # 5. Handle 'ConductResearch' calls by fanning out to our research sub-graph in parallel.
-    if conduct_research_calls:
+    # 5. Handle 'ConductResearch' calls by fanning out to our research sub-graph in parallel,
+    #    unless the convergence check decided that another research wave would not change the report.
+    if conduct_research_calls and convergence.action == "skip_research":
+        for tool_call in conduct_research_calls:
+            tool_messages.append(ToolMessage(content=f"Research skipped: {convergence.reason}.", name=tool_call["name"], tool_call_id=tool_call["id"]))
+        conduct_research_calls = []
 
-        # We create a list of coroutines, one for each research task.
-        coros = [researcher_agent.ainvoke({"researcher_messages": [HumanMessage(content=tc["args"]["research_topic"])], "research_topic": tc["args"]["research_topic"]}) for tc in conduct_research_calls]
+    if conduct_research_calls:
 
-        # 'asyncio.gather' runs all the research sub-graphs concurrently.
-        results = await asyncio.gather(*coros)
+        # We create one job per research task. If this step is being resumed, researchers that already
+        # completed are replayed from the researcher result store instead of being run again.
+        researcher_agent = build_researcher_agent()
+        result_store = get_researcher_result_store()
+        thread_id = config.get("configurable", {}).get("thread_id")
+        iteration = state.get("research_iterations", 0)
+
+        async def run_researcher(tool_call: dict) -> dict:
+            topic = tool_call["args"]["research_topic"]
+            if result_store is not None and thread_id:
+                stored = await asyncio.to_thread(result_store.get, thread_id, iteration, tool_call["id"], topic)
+                if stored is not None:
+                    return stored
+            result = await researcher_agent.ainvoke({"researcher_messages": [HumanMessage(content=topic)], "research_topic": topic})
+            if result_store is not None and thread_id:
+                await asyncio.to_thread(result_store.set, thread_id, iteration, tool_call["id"], topic, result)
+            return result
+
+        jobs = [lambda tc=tc: run_researcher(tc) for tc in conduct_research_calls]
+
+        # The scheduler runs at most 'max_concurrent_researchers' sub-graphs at once, highest priority first,
+        # and backs off when the providers start rate limiting us. Results keep the order of the tool calls.
+        scheduler = get_researcher_scheduler(max_concurrent_researchers, evidence_run_id(config, state.get("research_brief", "")))
+        results = await scheduler.map(jobs, [tc["args"].get("priority", 0) for tc in conduct_research_calls])
         for result, tool_call in zip(results, conduct_research_calls):
 
-            # We append the clean, compressed research as a ToolMessage for the Supervisor's context.
-            tool_messages.append(ToolMessage(content=result.get("compressed_research", ""), name=tool_call["name"], tool_call_id=tool_call["id"]))
+            # A failed researcher should not sink the whole iteration; we report the failure to the Supervisor instead.
+            if isinstance(result, Exception):
+                tool_messages.append(ToolMessage(content=f"Research failed: {result}", name=tool_call["name"], tool_call_id=tool_call["id"]))
+                continue
+
+            # We append the clean, compressed research as a ToolMessage for the Supervisor's context,
+            # with what the researcher consumed, so the Supervisor can tell a thorough answer from a cut-short one.
+            content = result.get("compressed_research", "")
+            evidence_index.add(passages_as_evidence([content], "finding"))
+            if result.get("budget_usage"):
+                content += "\n\n" + format_budget_usage(result["budget_usage"])
+            tool_messages.append(ToolMessage(content=content, name=tool_call["name"], tool_call_id=tool_call["id"]))
 
             # We also collect the raw, uncompressed notes to be processed by our context pruner.
             all_raw_notes.extend(result.get("raw_notes", []))
 
-    # 6. Handle 'refine_draft_report' calls. This is the core denoising and self-evaluation step.
+    # 6. Handle 'refine_draft_report' calls. This is the core denoising step.
+    #    Only the facts the draft has not consumed yet are sent in full. When the draft already incorporates most
+    #    of the knowledge base, only the sections touched by them or by new critiques are rewritten; otherwise
+    #    the whole draft is regenerated. The new draft is scored by the 'evaluator' node in the fan-out below.
+    kb = state.get("knowledge_base", [])
+    evidence_index.add(facts_as_evidence(kb))
+    critiques = state.get("active_critiques", [])
+    consumed_facts = state.get("consumed_facts", {})
+    draft_version = state.get("draft_version", 0)
+    refined_critiques = state.get("refined_critiques", 0)
+    draft_changed = False
     for tool_call in refine_report_calls:
-        kb = state.get("knowledge_base", [])
-        kb_str = "CONFIRMED FACTS:\n" + "\n".join([f"- {f.content}" for f in kb]) if kb else "\n".join(get_notes_from_tool_calls(state.get("supervisor_messages", [])))
-        new_draft = refine_draft_report.invoke({"research_brief": state.get("research_brief", ""), "findings": kb_str, "draft_report": state.get("draft_report", "")})
-        
-        # --- CRITICAL STEP: The Self-Evolution Evaluation ---
-        eval_result = evaluate_draft_quality(research_brief=state.get("research_brief", ""), draft_report=new_draft)
-        avg_score = (eval_result.comprehensiveness_score + eval_result.accuracy_score) / 2
-        
-        # We include the quality score directly in the tool message, so the Supervisor sees it.
-        tool_messages.append(ToolMessage(content=f"Draft Updated.\nQuality Score: {avg_score}/10.\nJudge Feedback: {eval_result.specific_critique}", name=tool_call["name"], tool_call_id=tool_call["id"]))
-        draft_report = new_draft
-        
-        # We log the metric to our history and set the repair flag if the score is low.
-        updates["quality_history"] = [QualityMetric(score=avg_score, feedback=eval_result.specific_critique, iteration=state.get("research_iterations", 0))]
-        if avg_score < 7.0: updates["needs_quality_repair"] = True
+        delta = split_facts(kb, consumed_facts)
+        new_facts = delta.updates
+        new_critiques = critiques[refined_critiques:]
+        if kb and draft_report and not new_facts and not new_critiques:
+            tool_messages.append(ToolMessage(content="Draft unchanged: there are no new facts or critiques since the last refinement.", name=tool_call["name"], tool_call_id=tool_call["id"]))
+            continue
+
+        new_draft = None
+        if kb and draft_report and settings.section_refinement_enabled:
+            new_draft = await refine_draft_sections(state.get("research_brief", ""), draft_report, new_facts, new_critiques, evidence_index)
+        if new_draft is None:
+            # Before the knowledge base has facts, we refine with the researchers' findings most relevant to the brief.
+            kb_str = format_fact_delta(delta) if kb else format_evidence(evidence_index.search(
+                state.get("research_brief", ""), k=4 * settings.retrieval_top_k, max_tokens=settings.refine_context_tokens // 2, kinds=("finding",)
+            ))
+            new_draft = await refine_draft_report.ainvoke({"research_brief": state.get("research_brief", ""), "findings": kb_str, "draft_report": draft_report})
+        tool_messages.append(ToolMessage(content="Draft Updated. The Evaluator's quality score follows.", name=tool_call["name"], tool_call_id=tool_call["id"]))
+        draft_report, draft_changed = new_draft, True
+        draft_version += 1
+        consumed_facts = consume_facts(kb, consumed_facts, draft_version)
+        refined_critiques = len(critiques)
+        print(f"--- [REFINE] Draft v{draft_version}: {len(delta.new)} new, {len(delta.changed)} updated, {len(delta.disputed)} disputed, {len(delta.consumed)} already incorporated facts ---")
 
     # 7. Prepare the final state updates for this iteration.
     updates["supervisor_messages"] = tool_messages
     updates["raw_notes"] = all_raw_notes
     updates["draft_report"] = draft_report
+    updates["draft_version"] = draft_version
+    updates["consumed_facts"] = consumed_facts
+    updates["refined_critiques"] = refined_critiques
     
-    # 8. FAN OUT to the self-correction nodes (Red Team and Context Pruner) in parallel.
-    return Command(goto=["red_team", "context_pruner"], update=updates)
-
-
-def evaluate_draft_quality(research_brief: str, draft_report: str) -> EvaluationResult:
-    """
-    This function implements the 'Self-Evolution' scoring mechanism. It acts as an
-    LLM-as-a-judge, programmatically evaluating the quality of a draft against the original brief.
-    """
-
-    # We create a prompt that asks the judge model to be an extremely critical Senior Research Editor.
-    eval_prompt = f"""
-    You are a Senior Research Editor. Your standards are exceptionally high. Evaluate this draft report against the research brief.
-    
-    <Research Brief>
-    {research_brief}
-    </Research Brief>
-    
-    <Draft Report>
-    {draft_report}
-    </Draft Report>
-    
-    Be extremely critical. High scores (8+) should be reserved for truly excellent, comprehensive, and well-cited work. 
-    Focus your evaluation on these key areas:
-    1. **Comprehensiveness:** Does the draft fully address all parts of the research brief? Are there significant gaps?
-    2. **Accuracy & Grounding:** Are the claims specific and well-supported? Look for vague statements that need citations.
-    3. **Coherence & Structure:** Is the report well-organized and easy to follow? Is the language clear and professional?
-    
-    Provide specific, actionable critique for the researcher.
-    """
-    
-    # We bind our EvaluationResult schema to our judge model.
-    # Our judge model
-    judge_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
-    structured_judge = judge_model.with_structured_output(EvaluationResult)
+    # 8. FAN OUT to the self-correction nodes in parallel: the Evaluator (only if the draft changed),
+    #    the Red Team and the Context Pruner all run in one step, and their results are merged before the next Supervisor turn.
+    goto = (["evaluator"] if draft_changed else []) + ["red_team", "context_pruner"]
+    return Command(goto=goto, update=updates)
 
-    # We invoke the judge to get the structured quality score.
-    return structured_judge.invoke([HumanMessage(content=eval_prompt)])
\ No newline at end of file
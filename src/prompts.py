@@ -178,10 +178,12 @@ You can use any of the tools provided to you to find resources that can help ans
 </Task>
 
 <Available Tools>
-You have access to two main tools:
-1. **tavily_search**: For conducting web searches to gather information
-2. **think_tool**: For reflection and strategic planning during research
+You have access to these main tools:
+1. **tavily_search_batch**: For running several web searches at once (up to 5 queries); results are deduplicated and summarized together
+2. **tavily_search**: For a single, narrowly targeted follow-up search
+3. **think_tool**: For reflection and strategic planning during research
 
+**Prefer tavily_search_batch**: whenever you have more than one query in mind, put them all in one batch call instead of searching one query per turn.
 **CRITICAL: Use think_tool after each search to reflect on results and plan next steps**
 </Available Tools>
 
@@ -189,7 +191,7 @@ You have access to two main tools:
 Think like a human researcher with limited time. Follow these steps:
 
 1. **Read the question carefully** - What specific information does the user need?
-2. **Start with broader searches** - Use broad, comprehensive queries first
+2. **Start with broader searches** - Use one batch of broad, comprehensive queries covering different angles first
 3. **After each search, pause and assess** - Do I have enough to answer? What's still missing?
 4. **Execute narrower searches as you gather information** - Fill in the gaps
 5. **Stop when you can answer confidently** - Don't keep searching for perfection
@@ -200,6 +202,7 @@ Think like a human researcher with limited time. Follow these steps:
 - **Simple queries**: Use 2-3 search tool calls maximum
 - **Complex queries**: Use up to 5 search tool calls maximum
 - **Always stop**: After 5 search tool calls if you cannot find the right sources
+- A batch search counts as one search tool call, but never put more than 5 queries in one batch
 
 **Stop Immediately When**:
 - You can answer the user's question comprehensively
@@ -595,4 +598,57 @@ Format the report in clear markdown with proper structure and include source ref
   [2] Source Title: URL
 - Citations are extremely important. Make sure to include these, and pay a lot of attention to getting these right. Users will often use these citations to look into more information.
 </Citation Rules>
-"""
\ No newline at end of file
+"""
+
+section_refinement_prompt = """You are revising ONE section of a research report draft. The rest of the report stays as it is, so only improve this section.
+<Research Brief>
+{research_brief}
+</Research Brief>
+
+CRITICAL: Write in the same language as the existing draft.
+
+Today's date is {date}.
+
+For context, this is the outline of the whole report:
+<Outline>
+{outline}
+</Outline>
+
+Here is the section to revise:
+<Section To Revise>
+{section}
+</Section To Revise>
+
+Here are the new findings that belong in this section:
+<New Findings>
+{findings}
+</New Findings>
+
+Here are the critiques of the draft that concern this section:
+<Critiques>
+{critiques}
+</Critiques>
+
+Here is previously collected evidence relevant to this section, to ground and cite its claims:
+<Supporting Evidence>
+{evidence}
+</Supporting Evidence>
+
+Please revise the section so that it:
+1. Integrates the new findings as specific facts, citing each one with its source in [Title](URL) format
+2. Fixes the issues raised in the critiques
+3. Keeps every existing point that is still correct, and stays within the scope of this section (the other sections of the outline cover their own topics)
+4. Keeps the exact same heading line, and uses ### for any subsections
+
+Return ONLY the revised section in markdown, starting with its heading line. Do not write any other section, preamble or commentary.
+"""
+
+
+# This block hands the facts remembered from earlier runs on related briefs to the drafter and the Supervisor.
+remembered_research_prompt = """Earlier research runs on a related brief found the following facts ({count} facts, each still fresh). They are UNVERIFIED leads, not part of your knowledge base: the earlier brief may have been about a different subject, and they enter the final report only once this run's research confirms them:
+<Remembered Research>
+{facts}
+</Remembered Research>
+
+Use them to direct the research: have researchers confirm (or correct) the ones that bear on this brief, cheaply, from their sources, and drop the ones that do not. Spend the rest of the research on what they leave unanswered, what has likely changed since, and what is marked as disputed.
+"""
@@ -0,0 +1,256 @@
+"""
+Batch mode: many research queries through one process.
+
+Running one process per query pays the startup cost (imports, graph compilation, tokenizer)
+every time, and throws away the caches and model clients a previous query warmed up. The batch
+runner reads queries from a JSONL file and runs the deep research agent on them concurrently,
+in one event loop, so every run shares the compiled agent, the model clients, the provider rate
+limits, the search and summary caches, the research memory and one checkpointer connection.
+Each run keeps its own pool of researchers; the provider guards throttle all of them together:
+
+    python -m src.runtime.batch queries.jsonl --out results.jsonl --concurrency 4 --token-budget 20000000
+
+Each input line is {"query": "..."} with an optional "id". Each finished run appends one line
+with its report and metrics to the output file. Progress is durable: on a restart, completed
+queries are skipped and interrupted ones resume from their last checkpoint (each query runs on
+the thread 'batch_<id>'). Once the batch has spent its token budget, no new runs are started;
+the queries left out are recorded as skipped and run on the next invocation.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_core.messages import HumanMessage
+
+from src.config import settings
+from src.context.retrieval import drop_evidence_index
+from src.runtime.scheduler import drop_researcher_scheduler
+from src.runtime.checkpointing import open_checkpointer, resumable_steps, with_checkpointer
+from src.runtime.instrumentation import RunInstrumentation
+
+
+@dataclass(frozen=True)
+class BatchQuery:
+    """One query of a batch; its id names the run's thread, so the same id always resumes the same run."""
+    id: str
+    query: str
+
+    @property
+    def thread_id(self) -> str:
+        return f"batch_{self.id}"
+
+
+@dataclass
+class BatchResult:
+    """One line of the output file: the outcome of a query and what its run consumed."""
+    id: str
+    query: str
+    thread_id: str
+    status: str  # "completed", "needs_clarification", "failed" or "skipped"
+    final_report: str = ""
+    message: str = ""  # The clarifying question, the error or the reason the query was skipped
+    resumed: bool = False
+    wall_seconds: float = 0.0
+    llm_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    finished_at: float = 0.0
+
+
+def read_queries(path: str | Path) -> List[BatchQuery]:
+    """Reads the queries of a JSONL file; queries without an id are identified by a hash of their text."""
+    queries, seen = [], set()
+    with Path(path).open(encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("query"):
+                raise ValueError(f"{path}:{line_number}: every line needs a 'query'")
+            query_id = str(record.get("id") or hashlib.sha256(record["query"].encode("utf-8")).hexdigest()[:16])
+            if query_id in seen:
+                print(f"--- [BATCH] Skipping duplicate query id '{query_id}' ({path}:{line_number}) ---")
+                continue
+            seen.add(query_id)
+            queries.append(BatchQuery(query_id, record["query"]))
+    return queries
+
+
+def completed_ids(path: str | Path) -> set:
+    """The ids of the queries an earlier invocation already completed, read from its output file."""
+    path = Path(path)
+    if not path.exists():
+        return set()
+    completed = set()
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("status") in ("completed", "needs_clarification"):
+                    completed.add(record["id"])
+    return completed
+
+
+class BatchRunner:
+    """Runs queries concurrently under a global limit on concurrent runs and on the tokens the whole batch may spend."""
+
+    def __init__(self, output_path: str | Path, max_concurrent_runs: int, token_budget: int = 0):
+        self.output_path = Path(output_path)
+        self.max_concurrent_runs = max_concurrent_runs
+        # 0 disables the token budget, like the researcher budgets.
+        self.token_budget = token_budget
+        # Finished runs only leave their token count behind; the spans of running ones are counted live.
+        self._finished_tokens = 0
+        self._running: List[RunInstrumentation] = []
+
+    def tokens_used(self) -> int:
+        """Tokens spent so far by every run of the batch, finished or still running."""
+        return self._finished_tokens + sum(
+            span.input_tokens + span.output_tokens
+            for instrumentation in self._running
+            for span in list(instrumentation.spans.values()) if span.kind == "llm"
+        )
+
+    def _budget_exhausted(self) -> bool:
+        return bool(self.token_budget) and self.tokens_used() >= self.token_budget
+
+    def _write(self, result: BatchResult) -> None:
+        # One line per finished query, flushed at once, so the file is the batch's progress log.
+        result.finished_at = time.time()
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.output_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+
+    async def _run_one(self, agent, checkpointer, query: BatchQuery) -> BatchResult:
+        instrumentation = RunInstrumentation()
+        self._running.append(instrumentation)
+        config = {"configurable": {"thread_id": query.thread_id}, "callbacks": [instrumentation]}
+        result = BatchResult(query.id, query.query, query.thread_id, status="failed")
+
+        # 1. A query whose thread has checkpoints was interrupted by an earlier invocation, so we resume it.
+        inputs = {"messages": [HumanMessage(content=query.query)]}
+        if checkpointer is not None and await resumable_steps(agent, config):
+            inputs, result.resumed = None, True
+
+        # 2. We run the agent; one failing query must not take the rest of the batch down.
+        start = time.perf_counter()
+        try:
+            state = await agent.ainvoke(inputs, config=config)
+            if state.get("final_report"):
+                result.status, result.final_report = "completed", state["final_report"]
+            else:
+                # Without a human to answer, a query that needs clarification ends with the question.
+                result.status, result.message = "needs_clarification", state["messages"][-1].content
+        except Exception as exc:
+            result.message = f"{type(exc).__name__}: {exc}"
+        finally:
+            # The run's evidence index and researcher scheduler live in process-wide registries (keyed by its
+            # thread), so we release them; over hundreds of queries they would otherwise pile up.
+            drop_evidence_index(query.thread_id)
+            drop_researcher_scheduler(query.thread_id)
+        result.wall_seconds = round(time.perf_counter() - start, 3)
+
+        # 3. We record what the run consumed.
+        llm_spans = [s for s in instrumentation.spans.values() if s.kind == "llm"]
+        result.llm_calls = len(llm_spans)
+        result.input_tokens = sum(s.input_tokens for s in llm_spans)
+        result.output_tokens = sum(s.output_tokens for s in llm_spans)
+        result.cost_usd = round(sum(s.cost_usd for s in llm_spans), 6)
+        self._running.remove(instrumentation)
+        self._finished_tokens += result.input_tokens + result.output_tokens
+        return result
+
+    async def run(self, queries: List[BatchQuery]) -> List[BatchResult]:
+        """Runs every query not completed yet, and returns the results of this invocation."""
+        from src.graphs.deep_research_graph import build_deep_research_agent
+
+        done = completed_ids(self.output_path)
+        pending = [q for q in queries if q.id not in done]
+        print(f"--- [BATCH] {len(pending)} queries to run ({len(queries) - len(pending)} already completed), "
+              f"{self.max_concurrent_runs} at a time ---")
+
+        results: List[BatchResult] = []
+        queue: asyncio.Queue = asyncio.Queue()
+        for query in pending:
+            queue.put_nowait(query)
+
+        async with open_checkpointer() as checkpointer:
+            # The agent is compiled once, and every run shares it (and the one checkpointer connection).
+            agent = with_checkpointer(build_deep_research_agent(), checkpointer)
+
+            async def worker() -> None:
+                while not queue.empty():
+                    query = queue.get_nowait()
+                    # We check the budget before starting a run; runs already going are allowed to finish.
+                    if self._budget_exhausted():
+                        result = BatchResult(query.id, query.query, query.thread_id, status="skipped",
+                                             message=f"batch token budget ({self.token_budget:,}) exhausted")
+                    else:
+                        result = await self._run_one(agent, checkpointer, query)
+                        print(f"--- [BATCH] {query.id}: {result.status} in {result.wall_seconds:.1f}s "
+                              f"({result.input_tokens + result.output_tokens:,} tokens) ---")
+                    self._write(result)
+                    results.append(result)
+
+            await asyncio.gather(*(worker() for _ in range(min(self.max_concurrent_runs, len(pending)))))
+        return results
+
+
+def summarize(results: List[BatchResult], tokens_used: int) -> dict:
+    """Batch-level metrics: outcomes, tokens, cost and run times."""
+    statuses = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    run_times = sorted(r.wall_seconds for r in results if r.status != "skipped")
+    return {
+        "queries": len(results),
+        "statuses": statuses,
+        "tokens": tokens_used,
+        "cost_usd": round(sum(r.cost_usd for r in results), 4),
+        "median_run_seconds": run_times[len(run_times) // 2] if run_times else 0.0,
+        "max_run_seconds": run_times[-1] if run_times else 0.0,
+    }
+
+
+async def run_batch(input_path: str | Path, output_path: str | Path, max_concurrent_runs: Optional[int] = None,
+                    token_budget: Optional[int] = None) -> dict:
+    """Runs the queries of 'input_path', appending results to 'output_path', and returns the batch metrics."""
+    runner = BatchRunner(
+        output_path,
+        max_concurrent_runs=max_concurrent_runs or settings.batch_max_concurrent_runs,
+        token_budget=settings.batch_token_budget if token_budget is None else token_budget,
+    )
+    start = time.perf_counter()
+    results = await runner.run(read_queries(input_path))
+    return {**summarize(results, runner.tokens_used()), "wall_seconds": round(time.perf_counter() - start, 3)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one {\"query\": ..., \"id\": ...} object per line.")
+    parser.add_argument("--out", required=True, help="JSONL file the results are appended to (also used to skip completed queries).")
+    parser.add_argument("--concurrency", type=int, help="Runs in flight at once (default: batch_max_concurrent_runs).")
+    parser.add_argument("--token-budget", type=int, help="Stop starting runs once the batch has used this many tokens (0: no limit).")
+    parser.add_argument("--metrics-out", help="Write the batch metrics to this JSON file.")
+    args = parser.parse_args()
+
+    metrics = asyncio.run(run_batch(args.input, args.out, args.concurrency, args.token_budget))
+
+    print("=== Batch ===")
+    print(json.dumps(metrics, indent=2))
+    if args.metrics_out:
+        Path(args.metrics_out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.metrics_out).write_text(json.dumps(metrics, indent=2))
+    return 1 if metrics["statuses"].get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
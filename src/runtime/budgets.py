@@ -0,0 +1,106 @@
+"""
+Per-researcher budgets for the ReAct loop.
+
+A researcher keeps searching for as long as its model emits tool calls, so one runaway sub-agent
+can hold up a whole supervisor iteration (every researcher of a wave must finish before the
+supervisor continues). 'ResearcherBudget' caps each researcher's tool iterations, searches,
+model tokens and wall-clock time. When any cap is hit, the researcher hands what it has found so
+far to 'compress_research' instead of starting another round, and reports what it consumed.
+
+The token budget covers the researcher's own ReAct calls and the summarization calls its searches
+trigger (most of its spend): 'TokenUsageCounter' is passed in the config of its tool calls, so it
+sees every model call made under them.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.config import settings
+
+
+@dataclass(frozen=True)
+class ResearcherBudget:
+    """The limits of one researcher run; a limit of 0 disables that check."""
+    max_tool_iterations: int = 6
+    max_searches: int = 15
+    max_tokens: int = 300_000
+    max_seconds: float = 300.0
+
+    @classmethod
+    def from_settings(cls) -> "ResearcherBudget":
+        return cls(
+            max_tool_iterations=settings.researcher_max_tool_iterations,
+            max_searches=settings.researcher_max_searches,
+            max_tokens=settings.researcher_max_tokens,
+            max_seconds=settings.researcher_max_seconds,
+        )
+
+    def remaining_searches(self, state: dict) -> Optional[int]:
+        """How many more searches the researcher may run, or None when searches are not limited."""
+        if not self.max_searches:
+            return None
+        return max(0, self.max_searches - state.get("search_count", 0))
+
+    def exceeded(self, state: dict) -> Optional[str]:
+        """Returns which budget the researcher has used up, or None while it may keep going."""
+        if self.max_tool_iterations and state.get("tool_call_iterations", 0) >= self.max_tool_iterations:
+            return f"tool iteration budget ({self.max_tool_iterations})"
+        if self.max_searches and state.get("search_count", 0) >= self.max_searches:
+            return f"search budget ({self.max_searches})"
+        if self.max_tokens and state.get("tokens_used", 0) >= self.max_tokens:
+            return f"token budget ({self.max_tokens})"
+        if self.max_seconds and elapsed_seconds(state) >= self.max_seconds:
+            return f"time budget ({self.max_seconds:.0f}s)"
+        return None
+
+
+class TokenUsageCounter(BaseCallbackHandler):
+    """Sums the tokens providers report for every model call made under the runs it is attached to."""
+
+    # We count inline, as calls end, so the total is complete as soon as the tool calls return.
+    run_inline = True
+
+    def __init__(self):
+        self.total_tokens = 0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        tokens = usage.get("total_tokens") or 0
+        if not tokens:
+            for generation in (g for batch in response.generations for g in batch):
+                usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                tokens += usage_metadata.get("total_tokens", 0)
+        with self._lock:
+            self.total_tokens += tokens
+
+
+def elapsed_seconds(state: dict) -> float:
+    """Seconds since the researcher started."""
+    started_at = state.get("started_at")
+    return time.monotonic() - started_at if started_at else 0.0
+
+
+def budget_usage(state: dict, stopped_by: Optional[str]) -> dict:
+    """Summarizes what a researcher consumed, for the Supervisor."""
+    return {
+        "tool_iterations": state.get("tool_call_iterations", 0),
+        "searches": state.get("search_count", 0),
+        "tokens": state.get("tokens_used", 0),
+        "seconds": round(elapsed_seconds(state), 1),
+        "stopped_by": stopped_by or "",
+    }
+
+
+def format_budget_usage(usage: dict) -> str:
+    """A one-line report of a researcher's budget usage."""
+    line = (f"[Researcher budget used: {usage['tool_iterations']} tool iterations, {usage['searches']} searches, "
+            f"{usage['tokens']:,} tokens, {usage['seconds']}s")
+    if usage.get("stopped_by"):
+        line += f"; stopped early by the {usage['stopped_by']}, so findings may be incomplete"
+    return line + "]"
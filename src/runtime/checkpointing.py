@@ -0,0 +1,60 @@
+"""
+Durable checkpoints for resumable runs.
+
+The deep research agent is compiled without a checkpointer (compiled graphs are shared
+process-wide, while an SQLite connection belongs to one event loop). A run attaches a local
+SQLite checkpointer with 'with_checkpointer'; the supervisor sub-graph inherits it, so every
+completed super-step of the diffusion loop is saved, and a run that dies can be resumed
+from the last completed step by invoking the agent again with the same 'thread_id' and no input.
+"""
+
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from src.config import settings
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.base import BaseCheckpointSaver
+
+
+# Our own types stored in the graph state, which the checkpoint serializer is allowed to restore.
+CHECKPOINT_TYPES = [
+    ("src.states.supervisor_state", "Fact"),
+    ("src.states.supervisor_state", "Critique"),
+]
+
+
+def default_checkpoint_path() -> Path:
+    return Path(settings.cache_dir) / "checkpoints.sqlite"
+
+
+@asynccontextmanager
+async def open_checkpointer(path: Optional[str | Path] = None) -> AsyncIterator[Optional["BaseCheckpointSaver"]]:
+    """Opens the SQLite checkpointer for the current event loop, or yields None when checkpointing is disabled."""
+    if not settings.checkpointing_enabled:
+        yield None
+        return
+
+    # We import the SQLite saver lazily so importing the agent stays cheap.
+    import aiosqlite
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    path = Path(path or default_checkpoint_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    async with aiosqlite.connect(str(path)) as conn:
+        yield AsyncSqliteSaver(conn, serde=JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES))
+
+
+def with_checkpointer(agent, checkpointer: Optional["BaseCheckpointSaver"]):
+    """Returns a copy of a compiled graph that saves its checkpoints (and its sub-graphs') to 'checkpointer'."""
+    if checkpointer is None:
+        return agent
+    return agent.copy(update={"checkpointer": checkpointer})
+
+
+async def resumable_steps(agent, config: dict) -> tuple:
+    """Returns the nodes a thread would run next if resumed; empty when there is nothing to resume."""
+    state = await agent.aget_state(config)
+    return state.next
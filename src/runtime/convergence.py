@@ -0,0 +1,76 @@
+"""
+Early termination of the supervisor loop on quality convergence.
+
+Left alone, the supervisor keeps delegating research until it calls 'ResearchComplete' or runs
+out of iterations, and it routinely spends whole iterations that no longer change the report.
+The controller reads the signals the loop already produces (the Evaluator's scores, the Red
+Team's verdict, and whether new facts reached the knowledge base) and decides, before each
+iteration's tool calls run, whether to continue, to skip the research wave, or to stop.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal, Optional, Sequence
+
+from src.config import settings
+
+if TYPE_CHECKING:
+    from src.states.supervisor_state import QualityMetric
+
+
+@dataclass(frozen=True)
+class ConvergenceDecision:
+    """What the supervisor loop should do next, and why."""
+    action: Literal["continue", "skip_research", "stop"]
+    reason: str = ""
+
+
+CONTINUE = ConvergenceDecision("continue")
+
+
+class ConvergenceController:
+    """Decides from the quality history, the Red Team verdict and the fact flow whether more iterations pay off."""
+
+    def __init__(self, window: int = 2, min_delta: float = 0.5, target_score: float = 7.0, min_iterations: int = 2):
+        # The scores have plateaued when the last 'window' drafts' scores all lie within 'min_delta' of each other.
+        self.window = window
+        self.min_delta = min_delta
+        self.target_score = target_score
+        self.min_iterations = min_iterations
+
+    @classmethod
+    def from_settings(cls) -> "ConvergenceController":
+        return cls(
+            window=settings.convergence_window,
+            min_delta=settings.convergence_min_delta,
+            target_score=settings.convergence_target_score,
+            min_iterations=settings.convergence_min_iterations,
+        )
+
+    def plateau(self, quality_history: Sequence["QualityMetric"]) -> Optional[float]:
+        """Returns the latest score if the recent scores have plateaued, otherwise None."""
+        scores = [metric["score"] for metric in quality_history][-self.window:]
+        if len(scores) < max(self.window, 2) or max(scores) - min(scores) > self.min_delta:
+            return None
+        return scores[-1]
+
+    def decide(self, quality_history: Sequence["QualityMetric"], red_team_passed: bool, new_facts: int, iteration: int) -> ConvergenceDecision:
+        """
+        Stops when the scores plateau on a draft that is good enough (it meets the target score or passed the Red
+        Team) and research stopped producing new facts, or when the draft meets the target score, passed the Red Team
+        and nothing new arrived. Skips the research wave when the scores plateau and the Red Team passed, but some
+        facts are still waiting to be incorporated. A low plateau with open critiques keeps going: more research is
+        the only way out of it.
+        """
+        if iteration < self.min_iterations or not quality_history:
+            return CONTINUE
+
+        latest = quality_history[-1]["score"]
+        plateau = self.plateau(quality_history)
+        good_enough = latest >= self.target_score or red_team_passed
+        if plateau is not None and new_facts == 0 and good_enough:
+            return ConvergenceDecision("stop", f"quality plateaued at {plateau}/10 over the last {self.window} drafts and no new facts arrived")
+        if red_team_passed and new_facts == 0 and latest >= self.target_score:
+            return ConvergenceDecision("stop", f"the draft scored {latest}/10 (target {self.target_score}), passed the Red Team, and no new facts arrived")
+        if plateau is not None and red_team_passed:
+            return ConvergenceDecision("skip_research", f"quality plateaued at {plateau}/10 and the Red Team passed, so more research is unlikely to help ({new_facts} facts still to incorporate)")
+        return CONTINUE
@@ -0,0 +1,312 @@
+"""
+Built-in latency, token and cost instrumentation.
+
+'RunInstrumentation' is a LangChain callback handler. Passed in a run's config, it is
+inherited by every graph, sub-graph, node, model call and tool call in the run, so it sees
+the whole execution tree without any changes to the nodes themselves. For every span it
+records wall time, time spent queued (waiting on semaphores or rate limiters), input and
+output tokens and an estimated cost.
+
+The recorded tree can be exported as plain JSON, summarized per node, or exported as an
+OpenTelemetry (OTLP/JSON) span tree for any OTel-compatible backend, without LangSmith.
+
+    instrumentation = RunInstrumentation()
+    result = await agent.ainvoke(inputs, config={"callbacks": [instrumentation]})
+    instrumentation.write_json("trace.json")
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import var_child_runnable_config
+
+from src.context.token_budget import count_tokens
+
+
+# Estimated prices in USD per million tokens (input, output). These are estimates for capacity
+# planning only; override or extend them to match your provider's actual pricing.
+MODEL_PRICING = {
+    "moonshotai/Kimi-K2-Instruct": (0.60, 2.50),
+    "Qwen/Qwen3-4B-Instruct-2507": (0.05, 0.20),
+}
+
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICING.get(model or "", (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+@dataclass
+class Span:
+    """A single timed operation in the execution tree: a graph, a node, a model call or a tool call."""
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str
+    start_time: float
+    end_time: Optional[float] = None
+    queue_seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+    model: Optional[str] = None
+    error: Optional[str] = None
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_time or time.time()) - self.start_time
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "duration_seconds": round(self.duration_seconds, 6)}
+
+
+class RunInstrumentation(BaseCallbackHandler):
+    """Records a span tree for one (or several) agent runs from LangChain callback events."""
+
+    # We record events inline, in the order they happen, rather than on a background executor.
+    run_inline = True
+
+    def __init__(self):
+        self.spans: dict[str, Span] = {}
+        # Internal runnables (sequences, channel writes, ...) are not recorded; we map each of
+        # them to its nearest recorded ancestor so the exported tree stays readable.
+        self._aliases: dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    # --- span bookkeeping -------------------------------------------------------------------
+
+    def _resolve(self, run_id: Optional[UUID]) -> Optional[str]:
+        key = str(run_id) if run_id else None
+        while key is not None and key not in self.spans:
+            key = self._aliases.get(key)
+        return key
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **fields) -> None:
+        with self._lock:
+            self.spans[str(run_id)] = Span(
+                span_id=str(run_id), parent_id=self._resolve(parent_run_id),
+                name=name, kind=kind, start_time=time.time(), **fields
+            )
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> Optional[Span]:
+        with self._lock:
+            span = self.spans.get(str(run_id))
+            if span is not None:
+                span.end_time = time.time()
+                if error is not None:
+                    span.error = f"{type(error).__name__}: {error}"
+            return span
+
+    def add_queue_time(self, run_id: Optional[UUID], seconds: float) -> None:
+        """Attributes time spent waiting for a shared resource to the span of 'run_id' (or its ancestor)."""
+        with self._lock:
+            span_id = self._resolve(run_id)
+            if span_id is not None:
+                self.spans[span_id].queue_seconds += seconds
+
+    # --- chains: graphs and nodes ---------------------------------------------------------------
+
+    def on_chain_start(self, serialized: Optional[dict], inputs: Any, *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chain"
+        if name == metadata.get("langgraph_node"):
+            attributes = {k: metadata[k] for k in ("langgraph_step", "langgraph_checkpoint_ns") if k in metadata}
+            self._start(run_id, parent_run_id, name, "node", attributes=attributes)
+        elif parent_run_id is None or name == "LangGraph":
+            self._start(run_id, parent_run_id, name, "graph")
+        else:
+            with self._lock:
+                self._aliases[str(run_id)] = str(parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # LangGraph signals control flow (e.g. Command/goto, interrupts) with exceptions we don't count as errors.
+        self._end(run_id, None if type(error).__name__ in ("GraphInterrupt", "ParentCommand") else error)
+
+    # --- model calls -------------------------------------------------------------------------
+
+    def on_chat_model_start(self, serialized: Optional[dict], messages: list, *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        prompt_text = "".join(str(m.content) for batch in messages for m in batch)
+        self._start_llm(run_id, parent_run_id, serialized, metadata, prompt_text)
+
+    def on_llm_start(self, serialized: Optional[dict], prompts: list, *, run_id: UUID,
+                     parent_run_id: Optional[UUID] = None, metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        self._start_llm(run_id, parent_run_id, serialized, metadata, "".join(prompts))
+
+    def _start_llm(self, run_id, parent_run_id, serialized, metadata, prompt_text: str) -> None:
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name")
+        self._start(run_id, parent_run_id, model or "llm", "llm", model=model,
+                    attributes={"estimated_input_tokens": count_tokens(prompt_text)})
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._end(run_id)
+        if span is None:
+            return
+
+        # We prefer the provider's reported usage and fall back to counting tokens locally.
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens") or usage.get("input_tokens")
+        output_tokens = usage.get("completion_tokens") or usage.get("output_tokens")
+        for generation in (g for batch in response.generations for g in batch):
+            usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            input_tokens = input_tokens or usage_metadata.get("input_tokens")
+            output_tokens = output_tokens or usage_metadata.get("output_tokens")
+        if input_tokens is None:
+            input_tokens = span.attributes["estimated_input_tokens"]
+        if output_tokens is None:
+            output_tokens = sum(count_tokens(g.text) for batch in response.generations for g in batch)
+
+        with self._lock:
+            span.input_tokens, span.output_tokens = int(input_tokens), int(output_tokens)
+            span.cost_usd = estimate_cost(span.model, span.input_tokens, span.output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    # --- tool calls --------------------------------------------------------------------------
+
+    def on_tool_start(self, serialized: Optional[dict], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, name, "tool")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    # --- reporting ---------------------------------------------------------------------------
+
+    def _rollup(self) -> dict[str, dict]:
+        """Sums tokens and cost of every span into all of its ancestors."""
+        totals = {sid: {"input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0} for sid in self.spans}
+        for span in self.spans.values():
+            sid = span.span_id
+            while sid is not None:
+                totals[sid]["input_tokens"] += span.input_tokens
+                totals[sid]["output_tokens"] += span.output_tokens
+                totals[sid]["cost_usd"] += span.cost_usd
+                sid = self.spans[sid].parent_id
+        return totals
+
+    def to_json(self) -> list[dict]:
+        """Exports the recorded runs as a nested JSON tree, with token and cost totals per subtree."""
+        with self._lock:
+            totals = self._rollup()
+            nodes = {sid: {**span.as_dict(), "totals": totals[sid], "children": []} for sid, span in self.spans.items()}
+            roots = []
+            for node in sorted(nodes.values(), key=lambda n: n["start_time"]):
+                parent = nodes.get(node["parent_id"]) if node["parent_id"] else None
+                (parent["children"] if parent else roots).append(node)
+        return roots
+
+    def summary(self) -> dict[str, dict]:
+        """Aggregates spans by kind and name: call count, wall time, queue time, tokens and cost."""
+        summary: dict[str, dict] = {}
+        with self._lock:
+            for span in self.spans.values():
+                entry = summary.setdefault(f"{span.kind}:{span.name}", {
+                    "calls": 0, "wall_seconds": 0.0, "queue_seconds": 0.0,
+                    "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "errors": 0,
+                })
+                entry["calls"] += 1
+                entry["wall_seconds"] += span.duration_seconds
+                entry["queue_seconds"] += span.queue_seconds
+                entry["input_tokens"] += span.input_tokens
+                entry["output_tokens"] += span.output_tokens
+                entry["cost_usd"] += span.cost_usd
+                entry["errors"] += span.error is not None
+        return dict(sorted(summary.items(), key=lambda item: -item[1]["wall_seconds"]))
+
+    def to_otlp(self, service_name: str = "deep-research-agent") -> dict:
+        """Exports the spans in the OpenTelemetry OTLP/JSON format (one trace per root run)."""
+        def hex_id(uuid_str: str, length: int) -> str:
+            return uuid_str.replace("-", "")[-length:]
+
+        def attribute(key: str, value: Any) -> dict:
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        with self._lock:
+            spans = list(self.spans.values())
+
+        def root_of(span: Span) -> str:
+            while span.parent_id is not None:
+                span = self.spans[span.parent_id]
+            return span.span_id
+
+        otlp_spans = []
+        for span in spans:
+            attributes = {
+                "span.kind": span.kind, "queue.seconds": span.queue_seconds,
+                "llm.input_tokens": span.input_tokens, "llm.output_tokens": span.output_tokens,
+                "llm.cost_usd": span.cost_usd, **span.attributes,
+            }
+            if span.model:
+                attributes["llm.model"] = span.model
+            otlp_spans.append({
+                "traceId": hex_id(root_of(span), 32),
+                "spanId": hex_id(span.span_id, 16),
+                "parentSpanId": hex_id(span.parent_id, 16) if span.parent_id else "",
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(int(span.start_time * 1e9)),
+                "endTimeUnixNano": str(int((span.end_time or time.time()) * 1e9)),
+                "attributes": [attribute(k, v) for k, v in attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [attribute("service.name", service_name), attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": "src.runtime.instrumentation"}, "spans": otlp_spans}],
+        }]}
+
+    def write_json(self, path: str | Path) -> None:
+        """Writes the span tree, the per-node summary and the OTLP export to one JSON file."""
+        Path(path).write_text(json.dumps(
+            {"spans": self.to_json(), "summary": self.summary(), "otlp": self.to_otlp()}, indent=2, default=str
+        ))
+
+
+def record_queue_time(seconds: float) -> None:
+    """
+    Attributes 'seconds' of waiting to the operation that is currently running.
+
+    This works from anywhere inside a node, model call or tool call: we find the active
+    instrumentation handler and the current run through LangChain's runnable context.
+    """
+    config = var_child_runnable_config.get() or {}
+    callback_manager = config.get("callbacks")
+    # Outside a running node (or with a plain list of handlers) there is no current run to attribute to.
+    handlers = getattr(callback_manager, "handlers", None) or []
+    for handler in handlers:
+        if isinstance(handler, RunInstrumentation):
+            handler.add_queue_time(callback_manager.parent_run_id, seconds)
+
+
+@asynccontextmanager
+async def queued(resource):
+    """Acquires an async resource (a semaphore, a limiter) and records how long we waited for it."""
+    started_at = time.perf_counter()
+    async with resource:
+        record_queue_time(time.perf_counter() - started_at)
+        yield
@@ -0,0 +1,332 @@
+"""
+Provider-aware rate limiting, retries and circuit breaking.
+
+Every researcher, judge and summarizer shares the same few endpoints (the Kimi and Qwen
+inference endpoints and Tavily). Each provider gets one process-wide 'ProviderGuard' that
+every call goes through:
+
+1. Token buckets keep the combined request rate (requests/min) and token rate (tokens/min)
+   of all concurrent agents under the provider's quota, so we wait briefly instead of
+   collecting 429s.
+2. Transient failures (429, 5xx, timeouts, dropped connections) are retried with jittered
+   exponential backoff, honouring Retry-After. A retry budget caps retries at a fraction of
+   the traffic, so a struggling provider is not hit by a retry storm.
+3. A circuit breaker fails fast while a provider is down, and lets a single trial call
+   through after a cooldown to find out whether it has recovered.
+
+'ProviderGuardMixin' applies the guard to a LangChain chat model, so 'get_hf_model' (and
+every structured or tool-bound handle built from it) is covered without touching call sites.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from src.config import settings
+from src.context.token_budget import count_message_tokens
+from src.runtime.instrumentation import record_queue_time
+
+
+T = TypeVar("T")
+
+# Buckets hold this many seconds worth of capacity, so short bursts go out immediately.
+BURST_SECONDS = 10.0
+
+# Even without any traffic to earn retries from, we allow this many retries per second per provider.
+MIN_RETRIES_PER_SECOND = 0.1
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for source in (error, getattr(error, "response", None)):
+        status = getattr(source, "status_code", None) or getattr(source, "status", None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Recognizes HTTP 429 / rate-limit errors across the HTTP clients our providers use."""
+    if _status_code(error) == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "too many requests" in message
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Transient failures worth retrying: rate limits, server errors, timeouts and dropped connections."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if is_rate_limit_error(error) or isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status >= 500
+    return any(word in type(error).__name__ for word in ("Timeout", "Connection", "ServerError"))
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """A thread-safe token bucket. Reservations may overdraw it; the caller then waits for the deficit to refill."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """Takes 'amount' tokens and returns how long to wait until they are actually available."""
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate_per_second)
+
+    def try_take(self, amount: float = 1.0) -> bool:
+        """Takes 'amount' tokens only if they are available right now."""
+        with self._lock:
+            self._refill()
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+    def deposit(self, amount: float) -> None:
+        """Returns tokens to the bucket (or, with a negative amount, charges extra ones)."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class CircuitBreaker:
+    """Opens after consecutive transient failures, and lets one trial call through once the cooldown has passed."""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.opens = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self, provider: str) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown_seconds or self._trial_in_flight:
+                raise CircuitOpenError(f"Circuit breaker for '{provider}' is open after {self.consecutive_failures} failures")
+            # Half-open: this call is the trial that decides whether the provider has recovered.
+            self._trial_in_flight = True
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._trial_in_flight or (self.opened_at is None and self.consecutive_failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.opens += 1
+            self._trial_in_flight = False
+
+
+class ProviderGuard:
+    """Rate limits, retries and circuit breaking for every call to one provider."""
+
+    def __init__(self, provider: str, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.provider = provider
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute / 60 * BURST_SECONDS) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 60 * BURST_SECONDS) if tokens_per_minute else None
+        self.retry_budget = TokenBucket(MIN_RETRIES_PER_SECOND, max(settings.retry_max_attempts, 1) * 2)
+        self.breaker = CircuitBreaker(settings.circuit_breaker_failure_threshold, settings.circuit_breaker_cooldown_seconds)
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "rate_limited": 0, "rejected": 0, "throttled_seconds": 0.0}
+
+    def estimate_tokens(self, messages: list[BaseMessage]) -> int:
+        """Estimates the prompt tokens of a call; only needed when the provider has a token rate limit."""
+        return sum(count_message_tokens(m) for m in messages) if self.tokens is not None else 0
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Charges the difference between the reported token usage and what we reserved up front."""
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.deposit(estimated_tokens - actual_tokens)
+
+    def _admit(self, tokens: int) -> float:
+        """Checks the circuit breaker and reserves capacity; returns how long to wait before calling."""
+        try:
+            self.breaker.before_call(self.provider)
+        except CircuitOpenError:
+            self.stats["rejected"] += 1
+            raise
+        self.stats["calls"] += 1
+        # Every first attempt earns a fraction of a retry, so retries stay proportional to real traffic.
+        self.retry_budget.deposit(settings.retry_budget_ratio)
+        delays = [bucket.reserve(amount) for bucket, amount in ((self.requests, 1), (self.tokens, tokens)) if bucket and amount]
+        delay = max(delays, default=0.0)
+        self.stats["throttled_seconds"] += delay
+        return delay
+
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Returns how long to back off before retrying 'error', or None if it should be raised."""
+        if not is_retryable_error(error):
+            return None
+        self.breaker.on_failure()
+        self.stats["failures"] += 1
+        # Rate-limit responses are counted apart: they are the overload signal the researcher scheduler backs off on.
+        self.stats["rate_limited"] += is_rate_limit_error(error)
+        if attempt + 1 >= settings.retry_max_attempts or not self.retry_budget.try_take():
+            return None
+        self.stats["retries"] += 1
+        # "Full jitter": a random delay up to the exponential cap spreads retries of concurrent callers apart.
+        backoff = random.uniform(0, min(settings.retry_max_delay_seconds, settings.retry_base_delay_seconds * 2 ** attempt))
+        return max(backoff, _retry_after_seconds(error) or 0.0)
+
+    async def acall(self, call: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Runs an async call under the provider's limits, retrying transient failures."""
+        attempt = 0
+        while True:
+            delay = self._admit(tokens)
+            if delay:
+                await asyncio.sleep(delay)
+                record_queue_time(delay)
+            try:
+                result = await call()
+            except Exception as error:
+                retry_delay = self._retry_delay(error, attempt)
+                if retry_delay is None:
+                    raise
+                print(f"--- [RETRY] {self.provider} failed ({type(error).__name__}); retrying in {retry_delay:.1f}s ---")
+                await asyncio.sleep(retry_delay)
+                attempt += 1
+                continue
+            self.breaker.on_success()
+            return result
+
+    def call(self, call: Callable[[], T], tokens: int = 0) -> T:
+        """The blocking counterpart of 'acall', for synchronous code paths."""
+        attempt = 0
+        while True:
+            delay = self._admit(tokens)
+            if delay:
+                time.sleep(delay)
+                record_queue_time(delay)
+            try:
+                result = call()
+            except Exception as error:
+                retry_delay = self._retry_delay(error, attempt)
+                if retry_delay is None:
+                    raise
+                print(f"--- [RETRY] {self.provider} failed ({type(error).__name__}); retrying in {retry_delay:.1f}s ---")
+                time.sleep(retry_delay)
+                attempt += 1
+                continue
+            self.breaker.on_success()
+            return result
+
+
+_guards: dict[str, ProviderGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_provider_guard(provider: str) -> ProviderGuard:
+    """Returns the process-wide guard of a provider (a model name or 'tavily')."""
+    with _guards_lock:
+        if provider not in _guards:
+            limits = settings.provider_rate_limits.get(provider, {})
+            _guards[provider] = ProviderGuard(provider, limits.get("requests_per_minute"), limits.get("tokens_per_minute"))
+        return _guards[provider]
+
+
+def provider_stats() -> dict[str, dict]:
+    """Reports calls, retries, failures, fail-fast rejections and throttling per provider."""
+    with _guards_lock:
+        return {provider: {**guard.stats, "circuit_opens": guard.breaker.opens} for provider, guard in _guards.items()}
+
+
+def rate_limited_calls() -> int:
+    """The number of rate-limit responses (HTTP 429) every provider has returned so far, retried ones included."""
+    with _guards_lock:
+        return sum(guard.stats["rate_limited"] for guard in _guards.values())
+
+
+def clear_provider_guards() -> None:
+    """Drops every guard, e.g. after changing the configured limits."""
+    with _guards_lock:
+        _guards.clear()
+
+
+def _total_tokens(result: ChatResult) -> Optional[int]:
+    usage = getattr(result.generations[0].message, "usage_metadata", None) if result.generations else None
+    return usage.get("total_tokens") if usage else None
+
+
+class ProviderGuardMixin:
+    """
+    Routes a chat model's calls through the guard of its provider.
+
+    The provider is the model's 'ls_model_name' metadata. Streams are retried only until the
+    first chunk arrives; after that a failure is raised, since tokens were already emitted.
+    """
+
+    def _provider_guard(self) -> ProviderGuard:
+        return get_provider_guard((self.metadata or {}).get("ls_model_name", type(self).__name__))
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        guard = self._provider_guard()
+        tokens = guard.estimate_tokens(messages)
+        generate = super()._generate
+        result = guard.call(lambda: generate(messages, stop=stop, run_manager=run_manager, **kwargs), tokens=tokens)
+        guard.record_usage(tokens, _total_tokens(result))
+        return result
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        guard = self._provider_guard()
+        tokens = guard.estimate_tokens(messages)
+        agenerate = super()._agenerate
+        result = await guard.acall(lambda: agenerate(messages, stop=stop, run_manager=run_manager, **kwargs), tokens=tokens)
+        guard.record_usage(tokens, _total_tokens(result))
+        return result
+
+    async def _astream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator:
+        guard = self._provider_guard()
+        tokens = guard.estimate_tokens(messages)
+        astream = super()._astream
+        chunks = None
+
+        async def open_stream():
+            # Opening the stream and receiving its first chunk is the part we can safely retry.
+            nonlocal chunks
+            chunks = astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return await anext(chunks, None)
+
+        chunk = await guard.acall(open_stream, tokens=tokens)
+        while chunk is not None:
+            yield chunk
+            usage = getattr(chunk.message, "usage_metadata", None)
+            if usage:
+                guard.record_usage(tokens, usage.get("total_tokens"))
+            chunk = await anext(chunks, None)
@@ -0,0 +1,144 @@
+"""
+Adaptive scheduling of research sub-agents.
+
+The supervisor may delegate more topics in one turn than the endpoints can serve at once.
+'ResearcherScheduler' queues them by priority and runs them on a bounded pool of workers,
+whose effective size is steered by an AIMD controller (as in TCP congestion control): every
+healthy completion raises the limit a little, and a rate-limit response (HTTP 429) from any
+provider cuts it in half. Under load we converge on the concurrency the providers can sustain,
+instead of flooding them and paying for it in throttling and retries. The decrease is driven by
+the provider guards, which see every model and search call, and not by how long researchers
+take: that depends on the topic and the researcher budgets, not on provider load.
+"""
+
+import asyncio
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+from src.runtime.instrumentation import queued
+from src.runtime.rate_limiter import is_rate_limit_error, rate_limited_calls
+
+
+class AdaptiveConcurrency:
+    """An async concurrency limit that adapts with additive increase and multiplicative decrease."""
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1, initial: Optional[int] = None,
+                 decrease_factor: float = 0.5, ewma_alpha: float = 0.2):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(initial or max_concurrency)
+        self.decrease_factor = decrease_factor
+        self.ewma_alpha = ewma_alpha
+        self.baseline_latency: Optional[float] = None
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._rate_limited_seen = rate_limited_calls()
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        # Before admitting a job, we back off if a provider has rate-limited a call since we last looked.
+        self.poll_providers()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        """Grows the limit by about one slot per window of healthy completions."""
+        self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        # The typical job latency only spaces out decreases (see 'on_overload'); it never triggers one.
+        if self.baseline_latency is None:
+            self.baseline_latency = latency
+        else:
+            self.baseline_latency += self.ewma_alpha * (latency - self.baseline_latency)
+
+    def on_overload(self) -> None:
+        """Halves the limit, at most once per baseline latency, so a burst of 429s counts as one signal."""
+        now = time.monotonic()
+        if now - self._last_decrease < (self.baseline_latency or 0.0):
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+        self.decreases += 1
+
+    def poll_providers(self) -> bool:
+        """Backs off if any provider guard saw a rate-limit response since the last poll; returns whether it did."""
+        current = rate_limited_calls()
+        # The guards are dropped (and their counters reset) when the configured limits change.
+        overloaded = current > self._rate_limited_seen
+        self._rate_limited_seen = current
+        if overloaded:
+            self.on_overload()
+        return overloaded
+
+    def record(self, latency: float, error: Optional[BaseException] = None) -> None:
+        """Feeds the outcome of one job, and the providers' rate-limit responses during it, back into the limit."""
+        if self.poll_providers():
+            return
+        if error is None:
+            self.on_success(latency)
+        elif is_rate_limit_error(error):
+            self.on_overload()
+
+
+class ResearcherScheduler:
+    """Runs queued jobs by priority on a bounded, adaptively sized worker pool."""
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self.concurrency = AdaptiveConcurrency(max_concurrency, min_concurrency)
+
+    async def map(self, jobs: Sequence[Callable[[], Awaitable[Any]]], priorities: Optional[Sequence[int]] = None) -> list:
+        """
+        Runs every job and returns their results in job order; a failed job yields its exception.
+
+        Higher priorities start first, and equal priorities keep their submission order.
+        """
+        priorities = priorities or [0] * len(jobs)
+        queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        for index, (job, priority) in enumerate(zip(jobs, priorities)):
+            queue.put_nowait((-priority, index, job))
+        results: list = [None] * len(jobs)
+
+        async def worker() -> None:
+            while not queue.empty():
+                # We take a slot before taking a job, so whichever worker gets the next slot runs the highest priority left.
+                async with queued(self.concurrency):
+                    if queue.empty():
+                        return
+                    _, index, job = queue.get_nowait()
+                    started_at, error = time.monotonic(), None
+                    try:
+                        results[index] = await job()
+                    except Exception as exc:
+                        results[index] = error = exc
+                    self.concurrency.record(time.monotonic() - started_at, error)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.max_concurrency, len(jobs)))))
+        return results
+
+
+# Asyncio primitives belong to one event loop, so each loop keeps its own schedulers, one per run. Runs sharing a
+# process (a batch) then each get their full pool of researchers; the provider guards throttle them globally.
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, ResearcherScheduler]]" = weakref.WeakKeyDictionary()
+
+
+def get_researcher_scheduler(max_concurrency: int, run_id: str = "") -> ResearcherScheduler:
+    """Returns the scheduler of a run on the current event loop."""
+    schedulers = _schedulers.setdefault(asyncio.get_running_loop(), {})
+    scheduler = schedulers.get(run_id)
+    if scheduler is None or scheduler.max_concurrency != max_concurrency:
+        scheduler = schedulers[run_id] = ResearcherScheduler(max_concurrency)
+    return scheduler
+
+
+def drop_researcher_scheduler(run_id: str) -> None:
+    """Forgets a finished run's scheduler."""
+    _schedulers.get(asyncio.get_running_loop(), {}).pop(run_id, None)
@@ -20,4 +20,5 @@ class AgentState(MessagesState):
     notes: Annotated[List[str], operator.add] = [] # The final, curated notes for the writer.
     draft_report: str
     final_report: str
+    final_report_metrics: dict # Time-to-first-token and throughput of the final report generation.
     
\ No newline at end of file
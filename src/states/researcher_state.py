@@ -11,15 +11,25 @@ class ResearcherState(TypedDict):
     tool_call_iterations: int
     research_topic: str
 
+    # What this worker has consumed so far, checked against its budget before every new round of tool calls.
+    search_count: int
+    tokens_used: int
+    started_at: float
+
     # The final, cleaned-up output of a research run.
     compressed_research: str
 
     # The temporary buffer of raw search results for this specific worker.
     raw_notes: Annotated[List[str], operator.add]
 
+    # The budget report produced when the worker finishes.
+    budget_usage: dict
+
 
 # A specialized state defining the output of the research agent sub-graph.
 class ResearcherOutputState(TypedDict):
     compressed_research: str
+    # What the worker consumed, and which budget (if any) stopped it early; reported to the Supervisor.
+    budget_usage: dict
     raw_notes: Annotated[List[str], operator.add]
     researcher_messages: Annotated[Sequence[BaseMessage], add_messages]
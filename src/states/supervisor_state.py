@@ -1,9 +1,11 @@
 from langchain_core.messages import BaseMessage
 from pydantic import BaseModel, Field
-from typing import Sequence, Annotated, List, Literal, Optional, TypedDict
+from typing import Sequence, Annotated, Dict, List, Literal, Optional, TypedDict
 import operator
 from langgraph.graph.message import add_messages
 
+from src.knowledge.fact_index import merge_facts
+
 
 class Fact(BaseModel):
     """
@@ -16,6 +18,9 @@ class Fact(BaseModel):
     # We must track the provenance of every fact for traceability and citations in the final report.
     source_url: str = Field(description="Where this fact came from")
 
+    # When the same fact is found on several pages, the knowledge base merges them and keeps every extra source here.
+    supporting_urls: List[str] = Field(default_factory=list, description="Other sources that state the same fact")
+
     # A confidence score allows the system to weigh more credible sources higher during synthesis.
     confidence_score: int = Field(description="1-100 confidence score based on source credibility")
 
@@ -52,6 +57,14 @@ class QualityMetric(TypedDict):
     iteration: int
 
 
+class ConsumedFact(TypedDict):
+    """A TypedDict recording which draft version incorporated a knowledge base fact, and in what form."""
+    # The draft version that incorporated the fact.
+    version: int
+    # A fingerprint of the fact as that draft saw it; a different fingerprint means the fact changed since.
+    fingerprint: str
+
+
 class SupervisorState(TypedDict):
     """
     The advanced, hierarchical state for the main Supervisor agent, 
@@ -63,11 +76,18 @@ class SupervisorState(TypedDict):
     # These are the core artifacts of the research process that the Supervisor manages.
     research_brief: str
     draft_report: str
+
+    # What the current draft already incorporates: the facts each draft version consumed (keyed by fact ID),
+    # and how many critiques had been raised by then. Refinement only sends, and rewrites for, anything newer.
+    draft_version: int
+    consumed_facts: Dict[str, ConsumedFact]
+    refined_critiques: int
     
     # This is a key memory management design. 'raw_notes' is a temporary, high-volume buffer
-    # for unprocessed search results. 'knowledge_base' is the permanent, structured, and pruned storage.
+    # for unprocessed search results. 'knowledge_base' is the permanent, structured, and pruned storage:
+    # its reducer merges near-duplicate facts and flags contradictions instead of blindly appending.
     raw_notes: Annotated[List[str], operator.add] 
-    knowledge_base: Annotated[List[Fact], operator.add]
+    knowledge_base: Annotated[List[Fact], merge_facts]
     
     # A simple counter to prevent infinite loops in our iterative process.
     research_iterations: int
@@ -79,6 +99,9 @@ class SupervisorState(TypedDict):
     # A boolean flag that the Evaluator can set to signal to the Supervisor 
     # that the draft quality is unacceptably low.
     needs_quality_repair: bool
+
+    # Whether the Red Team's last review of the draft came back "PASS", one of the convergence signals.
+    red_team_passed: bool
     
 
 class EvaluationResult(BaseModel):
@@ -1,21 +1,46 @@
-from tavily import TavilyClient
-from typing import List, Literal, Annotated
+import asyncio
+from typing import TYPE_CHECKING, List, Literal, Annotated, Optional
 from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool, InjectedToolArg
 
 from src.helpers import get_today_str
 from src.prompts import summarize_webpage_prompt
-from src.models.hf_models import get_hf_model
+from src.models.hf_models import get_structured_model
+from src.cache.search_cache import get_search_cache
+from src.cache.summary_cache import get_summary_cache, summary_cache_key
+from src.context.prefilter import prefilter_content
 
 from src.config import settings
+from src.runtime.instrumentation import queued
+from src.runtime.rate_limiter import get_provider_guard
 
+if TYPE_CHECKING:
+    from tavily import AsyncTavilyClient
 
-# We initialize the Tavily client.
-tavily_client = TavilyClient(api_key=settings.tavily_api_key)
+
+# The Tavily client is shared by every researcher so searches reuse one client instead of building their own.
+tavily_client: Optional["AsyncTavilyClient"] = None
 MAX_CONTEXT_LENGTH = 250000
 
-def tavily_search_multiple(
+# The most queries one batch search may run, which bounds the summaries a single tool call can fan out to.
+MAX_BATCH_QUERIES = 5
+
+# Summaries currently being generated, keyed like the summary cache, so concurrent researchers share them.
+inflight_summaries: dict[str, asyncio.Future] = {}
+
+
+def get_tavily_client() -> "AsyncTavilyClient":
+    """Returns the process-wide async Tavily client, creating it on first use."""
+    global tavily_client
+    if tavily_client is None:
+        # We import the client lazily so importing the tools doesn't pay for the HTTP stack.
+        from tavily import AsyncTavilyClient
+        tavily_client = AsyncTavilyClient(api_key=settings.tavily_api_key)
+    return tavily_client
+
+
+async def tavily_search_multiple(
     search_queries: List[str], 
     max_results: int = 3, 
     topic: Literal["general", "news", "finance"] = "general", 
@@ -24,18 +49,33 @@ def tavily_search_multiple(
     """A helper function to perform a search using the Tavily API for a list of queries."""
 
     print(f"--- [TOOL] Executing Tavily search for queries: {search_queries} ---")
-    search_docs = []
+    cache = get_search_cache()
 
-    # We execute the searches for each query.
-    for query in search_queries:
-        result = tavily_client.search(
+    async def search(query: str) -> dict:
+        # We serve repeated queries from the local cache before going to the network. SQLite calls block, so they
+        # run in a worker thread, like every cache access on an async path.
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, query, topic, max_results, include_raw_content)
+            if cached is not None:
+                return cached
+            if cache.offline:
+                print(f"--- [TOOL] Offline search cache miss for query: {query} ---")
+                return {"query": query, "results": []}
+
+        # Every researcher shares Tavily's guard: its rate limit, retries with backoff and its circuit breaker.
+        result = await get_provider_guard("tavily").acall(lambda: get_tavily_client().search(
             query,
             max_results=max_results,
             include_raw_content=include_raw_content,
             topic=topic
-        )
-        search_docs.append(result)
-    return search_docs
+        ))
+        if cache is not None:
+            await asyncio.to_thread(cache.set, query, topic, max_results, include_raw_content, result)
+        return result
+
+    # We execute the searches for all queries concurrently; results keep the order of the queries.
+    search_docs = await asyncio.gather(*(search(query) for query in search_queries))
+    return list(search_docs)
 
 def deduplicate_search_results(search_results: List[dict]) -> dict:
     """Deduplicates a list of search results based on the URL."""
@@ -65,18 +105,58 @@ def format_search_output(summarized_results: dict) -> str:
     return formatted_output
 
 
-def process_search_results(unique_results: dict) -> dict:
-    """Processes a dictionary of unique search results by summarizing their raw content."""
-    summarized_results = {}
-    for url, result in unique_results.items():
+async def process_search_results(unique_results: dict, query: str = "") -> dict:
+    """
+    Processes a dictionary of unique search results by summarizing their raw content concurrently.
+
+    Before summarization, each page that is not in the summary cache is cut down to its passages most relevant to 'query'.
+    """
+    # We bound the number of summaries in flight so a large result set doesn't flood the summarization endpoint.
+    semaphore = asyncio.Semaphore(settings.summarization_max_concurrency)
+
+    async def summarize_result(result: dict) -> str:
         # If raw_content is available, we summarize it.
-        if result.get("raw_content"):
-            content = summarize_webpage_content(result['raw_content'][:MAX_CONTEXT_LENGTH])
-        else:
+        if not result.get("raw_content"):
             # Otherwise, we just use the short snippet provided by the search API.
-            content = result['content']
-        summarized_results[url] = {'title': result['title'], 'content': content}
-    return summarized_results
+            return result['content']
+
+        raw_content = result['raw_content'][:MAX_CONTEXT_LENGTH]
+
+        # If another researcher is already summarizing this exact page, we wait for its result instead.
+        # The key is the unfiltered content, so it does not depend on the query the page was found with.
+        key = summary_cache_key(result['url'], raw_content)
+        if key in inflight_summaries:
+            return await asyncio.shield(inflight_summaries[key])
+
+        async def summarize() -> str:
+            async with queued(semaphore):
+                try:
+                    return await asyncio.wait_for(
+                        summarize_webpage_content(raw_content, url=result['url'], query=query),
+                        timeout=settings.summarization_timeout_seconds
+                    )
+                except asyncio.TimeoutError:
+                    # A slow page must not hold up the whole search, so we fall back to truncation.
+                    print(f"Summarization timed out for {result['url']}")
+                    return truncate_webpage_content(raw_content)
+
+        inflight_summaries[key] = asyncio.ensure_future(summarize())
+        try:
+            return await asyncio.shield(inflight_summaries[key])
+        finally:
+            inflight_summaries.pop(key, None)
+
+    # 'asyncio.gather' preserves the input order, so the output follows the original ranking of the results.
+    contents = await asyncio.gather(*(summarize_result(result) for result in unique_results.values()))
+    return {
+        url: {'title': result['title'], 'content': content}
+        for (url, result), content in zip(unique_results.items(), contents)
+    }
+
+
+def truncate_webpage_content(webpage_content: str) -> str:
+    """A simple truncation fallback used when a webpage cannot be summarized."""
+    return webpage_content[:1000] + "..." if len(webpage_content) > 1000 else webpage_content
 
 
 class Summary(BaseModel):
@@ -89,17 +169,33 @@ class Summary(BaseModel):
     key_excerpts: str = Field(description="Important quotes and excerpts from the content")
 
 
-def summarize_webpage_content(webpage_content: str) -> str:
-    """Summarizes a single piece of webpage content using our configured summarization model."""
-    try:
-        # We bind our 'Summary' Pydantic schema to the summarization model.
-        # Summarization model
-        summarization_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
-        structured_model = summarization_model.with_structured_output(Summary)
+async def summarize_webpage_content(webpage_content: str, url: Optional[str] = None, query: str = "") -> str:
+    """
+    Summarizes a single piece of webpage content using our configured summarization model.
 
+    When a 'query' is given, the page is first cut down to its passages most relevant to it. The summary is cached
+    under the unfiltered content: the summarization prompt does not depend on the query, so a page found again by
+    another query is served from the cache (with the summary of whichever filtered view was summarized first).
+    """
+    # A page we have already summarized with identical content is served from the summary cache.
+    cache = get_summary_cache() if url else None
+    if cache is not None:
+        cached_summary = await asyncio.to_thread(cache.get, url, webpage_content)
+        if cached_summary is not None:
+            return cached_summary
+    cache_content = webpage_content
+
+    # On a miss, we strip the boilerplate and keep only the passages relevant to the query. This is pure CPU work
+    # on up to MAX_CONTEXT_LENGTH characters, so it runs in a worker thread to keep the event loop responsive.
+    if settings.prefilter_enabled and query:
+        webpage_content = await asyncio.to_thread(prefilter_content, webpage_content, query, settings.prefilter_max_tokens)
+
+    try:
+        # We use the shared summarization model, bound to our 'Summary' Pydantic schema.
+        structured_model = get_structured_model(Summary, model_name="moonshotai/Kimi-K2-Instruct")
 
         # We invoke the LLM with our detailed summarization prompt.
-        summary_result = structured_model.invoke([
+        summary_result = await structured_model.ainvoke([
             HumanMessage(content=summarize_webpage_prompt.format(
                 webpage_content=webpage_content, 
                 date=get_today_str()
@@ -111,16 +207,20 @@ def summarize_webpage_content(webpage_content: str) -> str:
             f"<summary>\n{summary_result.summary}\n</summary>\n\n"
             f"<key_excerpts>\n{summary_result.key_excerpts}\n</key_excerpts>"
         )
+
+        # We only cache real summaries, never the truncation fallback below.
+        if cache is not None:
+            await asyncio.to_thread(cache.set, url, cache_content, formatted_summary)
         return formatted_summary
     except Exception as e:
 
         # If summarization fails, we fall back to a simple truncation of the raw content.
         print(f"Failed to summarize webpage: {str(e)}")
-        return webpage_content[:1000] + "..." if len(webpage_content) > 1000 else webpage_content
+        return truncate_webpage_content(webpage_content)
 
 
 @tool(parse_docstring=True)
-def tavily_search(
+async def tavily_search(
     query: str,
     max_results: Annotated[int, InjectedToolArg] = 3,
     topic: Annotated[Literal["general", "news", "finance"], InjectedToolArg] = "general",
@@ -137,14 +237,45 @@ def tavily_search(
         str: A formatted string of the deduplicated and summarized search results.
     """
 
-    # 1. Execute the search.
-    search_results = tavily_search_multiple([query], max_results=max_results, topic=topic, include_raw_content=True)
+    return await search_and_summarize([query], max_results=max_results, topic=topic)
+
+
+@tool(parse_docstring=True)
+async def tavily_search_batch(
+    queries: List[str],
+    max_results: Annotated[int, InjectedToolArg] = 3,
+    topic: Annotated[Literal["general", "news", "finance"], InjectedToolArg] = "general",
+    ) -> str:
+    """
+    A tool that runs several Tavily searches at once and summarizes the combined, deduplicated results.
+
+    Args:
+        queries (List[str]): Up to 5 distinct, specific search queries covering different angles of the topic.
+        max_results (int): The maximum number of results to return per query.
+        topic (Literal["general", "news", "finance"]): The topic to filter results by ('general', 'news', 'finance').
+
+    Returns:
+        str: A formatted string of the deduplicated and summarized search results for all queries.
+    """
+    return await search_and_summarize(batch_queries(queries), max_results=max_results, topic=topic)
+
+
+def batch_queries(queries: List[str]) -> List[str]:
+    """The queries a batch search actually runs: repeats would only produce duplicate results, so we drop them (keeping their order) and cap the batch."""
+    return list(dict.fromkeys(q.strip() for q in queries if q.strip()))[:MAX_BATCH_QUERIES]
+
+
+async def search_and_summarize(queries: List[str], max_results: int, topic: Literal["general", "news", "finance"]) -> str:
+    """The search pipeline behind both search tools: search every query, deduplicate, summarize once, format."""
+
+    # 1. Execute the searches concurrently.
+    search_results = await tavily_search_multiple(queries, max_results=max_results, topic=topic, include_raw_content=True)
 
-    # 2. Deduplicate the results.
+    # 2. Deduplicate the results across all queries, so a page found by several queries is summarized only once.
     unique_results = deduplicate_search_results(search_results)
 
-    # 3. Process and summarize the content.
-    summarized_results = process_search_results(unique_results)
+    # 3. Process and summarize the content, pre-filtered to the passages relevant to the queries.
+    summarized_results = await process_search_results(unique_results, query=" ".join(queries))
 
     # 4. Format the final output.
     return format_search_output(summarized_results)
\ No newline at end of file
@@ -1,12 +1,20 @@
+import asyncio
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated, Optional, Sequence
 
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import InjectedToolArg
-from src.prompts import report_generation_with_draft_insight_prompt
+from src.prompts import report_generation_with_draft_insight_prompt, section_refinement_prompt
 from src.helpers import get_today_str
 from src.models.hf_models import get_hf_model
+from src.context.token_budget import ContextBudget
+from src.config import settings
+from src.knowledge.draft_sections import DraftSection, parse_sections, render_sections, route_updates, splice_sections
+from src.context.retrieval import EvidenceIndex, evidence_id, format_evidence
+
+if TYPE_CHECKING:
+    from src.states.supervisor_state import Critique, Fact
 
 
 @tool
@@ -19,6 +27,11 @@ class ConductResearch(BaseModel):
     research_topic: str = Field(
         description="The topic to research. Should be a single, self-contained topic described in high detail.",
     )
+    # When more topics are delegated than can run at once, higher priorities are researched first.
+    priority: int = Field(
+        default=0,
+        description="Optional priority of this topic; higher values are researched first when researchers are busy.",
+    )
 
 
 @tool
@@ -50,7 +63,7 @@ def think_tool(reflection: str) -> str:
 
 
 @tool(parse_docstring=True)
-def refine_draft_report(
+async def refine_draft_report(
     research_brief: Annotated[str, InjectedToolArg], 
     findings: Annotated[str, InjectedToolArg], 
     draft_report: Annotated[str, InjectedToolArg]
@@ -66,6 +79,16 @@ def refine_draft_report(
         The refined draft report content.
     """
 
+    # We fit the brief, the current draft and the findings into our token budget.
+    # The template itself is reserved first; the draft may use at most half of what is left, and the findings get the rest.
+    budget = ContextBudget(settings.refine_context_tokens)
+    budget.allocate_text("template", report_generation_with_draft_insight_prompt.format(
+        research_brief="", findings="", draft_report="", date=get_today_str()
+    ))
+    research_brief = budget.allocate_text("research_brief", research_brief, max_tokens=budget.remaining // 4)
+    draft_report = budget.allocate_text("draft_report", draft_report, max_tokens=budget.remaining // 2)
+    findings = budget.allocate_text("findings", findings)
+
     # We format the detailed prompt with the brief, the current draft, and the new findings.
     draft_report_prompt = report_generation_with_draft_insight_prompt.format(
         research_brief=research_brief,
@@ -76,5 +99,64 @@ def refine_draft_report(
     # Writer model
     writer_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
     # We invoke our powerful 'writer_model' to generate the new, "denoised" draft.
-    draft_report_response = writer_model.invoke([HumanMessage(content=draft_report_prompt)])
+    draft_report_response = await writer_model.ainvoke([HumanMessage(content=draft_report_prompt)])
     return draft_report_response.content
+
+
+async def refine_draft_sections(
+    research_brief: str,
+    draft_report: str,
+    new_facts: Sequence["Fact"],
+    new_critiques: Sequence["Critique"],
+    evidence_index: Optional[EvidenceIndex] = None,
+) -> Optional[str]:
+    """
+    Refines only the sections of the draft that the new facts and critiques concern, and splices them back.
+
+    Returns None when an incremental refinement does not pay off (a draft without sections, updates that match
+    no section, or updates that touch most of it), so that the caller falls back to one full rewrite with 'refine_draft_report'.
+    """
+
+    # 1. We parse the draft into sections and route each new fact and critique to the sections it is about.
+    sections = parse_sections(draft_report)
+    routed = route_updates(sections, new_facts, new_critiques)
+    if len(sections) < 2 or not routed or len(routed) > settings.section_refinement_max_fraction * len(sections):
+        return None
+
+    # 2. Every rewrite sees the outline, so each section stays within its own scope.
+    outline = "\n".join(f"- {s.heading or '(introduction)'}" for s in sections)
+    writer_model = get_hf_model(model_name="moonshotai/Kimi-K2-Instruct")
+
+    async def rewrite(section: DraftSection) -> str:
+        facts, critiques = routed[section.id]
+
+        # We pull the collected evidence most relevant to this section and what is changing in it,
+        # leaving out the new facts themselves (they are listed in full below).
+        evidence = []
+        if evidence_index is not None:
+            query = " ".join([section.heading, section.text[:2000]] + [f.content for f in facts] + [c.concern for c in critiques])
+            exclude = [evidence_id("fact", f.content) for f in facts]
+            evidence = evidence_index.search(query, k=settings.retrieval_top_k, max_tokens=settings.retrieval_max_tokens, exclude=exclude)
+
+        # The section itself comes first in the budget; the critiques, the findings and the evidence share what is left.
+        budget = ContextBudget(settings.section_refine_context_tokens)
+        budget.allocate_text("template", section_refinement_prompt.format(
+            research_brief="", outline=outline, section="", findings="", critiques="", evidence="", date=get_today_str()
+        ))
+        brief = budget.allocate_text("research_brief", research_brief, max_tokens=budget.remaining // 8)
+        section_text = budget.allocate_text("section", section.text, max_tokens=budget.remaining // 2)
+        critique_text = budget.allocate_text("critiques", "\n".join(f"- {c.author} says: {c.concern}" for c in critiques) or "None.", max_tokens=budget.remaining // 3)
+        findings_text = budget.allocate_text("findings", "\n".join(f"- {f.content} (Source: {f.source_url})" for f in facts) or "None.", max_tokens=budget.remaining * 2 // 3)
+        evidence_text = budget.allocate_text("evidence", format_evidence(evidence) or "None.")
+        prompt = section_refinement_prompt.format(
+            research_brief=brief, outline=outline, section=section_text,
+            findings=findings_text, critiques=critique_text, evidence=evidence_text, date=get_today_str()
+        )
+        response = await writer_model.ainvoke([HumanMessage(content=prompt)])
+        return response.content
+
+    # 3. The touched sections are rewritten concurrently; the rest of the draft is kept as it is.
+    touched = [s for s in sections if s.id in routed]
+    rewritten = await asyncio.gather(*(rewrite(s) for s in touched))
+    print(f"--- [REFINE] Rewrote {len(touched)} of {len(sections)} sections: {', '.join(s.id for s in touched)} ---")
+    return render_sections(splice_sections(sections, {s.id: text for s, text in zip(touched, rewritten)}))
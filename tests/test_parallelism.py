@@ -0,0 +1,17 @@
+"""
+The researchers a supervisor step launches together must overlap in time.
+
+A blocking call on an async path ('.invoke' instead of '.ainvoke', sync I/O) silently
+serializes them; this runs the smoke scenario of the offline benchmark and fails on it.
+"""
+
+import asyncio
+
+from src.benchmarks.harness import check_parallelism, run_benchmark
+
+
+def test_researchers_run_concurrently_without_blocking_the_event_loop():
+    report = asyncio.run(run_benchmark("smoke"))
+
+    assert report.max_concurrent_researchers > 1
+    assert check_parallelism(report) == []